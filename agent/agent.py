@@ -1,16 +1,16 @@
 # agent/agent.py
 from __future__ import annotations
-from dotenv import load_dotenv
 from livekit import agents
 from livekit.agents import AgentSession, Agent, RoomInputOptions, RunContext, AudioConfig
 from livekit.plugins import openai, deepgram
 from shared.prompts import get_agent_instructions
+from .config import MODEL_NAME, RESPONSE_CACHE, RESPONSE_CACHE_MAX_USER_TURNS
+from .response_cache import get_response_cache, cacheable_question, cached_llm_stream, normalize_question, prompt_hash
 import json
 import os
 import logging
 from typing import Any
 
-load_dotenv()
 logger = logging.getLogger("call_assistant")
 
 class CallAgent(Agent):
@@ -20,6 +20,11 @@ class CallAgent(Agent):
         self.name = name
         self.dial_info = dial_info or {}
         self.participant = None
+        # Answers depend on the prompt, the model and the topic the greeting raised
+        self.response_cache = get_response_cache() if RESPONSE_CACHE else None
+        self.response_scope = prompt_hash(
+            instructions, MODEL_NAME, normalize_question(self.dial_info.get("query", "") or "")
+        )
         logger.info(f"Assistant initialized with name: {name}")
 
     def set_participant(self, participant):
@@ -33,16 +38,38 @@ class CallAgent(Agent):
         customer_query = self.dial_info.get("query", "")
         
         return get_welcome_message(customer_name, customer_query)
+
+    def create_greeting_parts(self) -> tuple:
+        """Greeting split into (name part, body part) for the audio cache"""
+        from shared.prompts import get_welcome_message_parts
+
+        customer_name = self.dial_info.get("name", "")
+        customer_query = self.dial_info.get("query", "")
+
+        return get_welcome_message_parts(customer_name, customer_query)
         
+    def llm_node(self, chat_ctx, tools, model_settings):
+        """The LLM step, answered from the response cache when possible"""
+        if self.response_cache is None:
+            return Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        return cached_llm_stream(
+            self.response_cache,
+            self.response_scope,
+            cacheable_question(chat_ctx, RESPONSE_CACHE_MAX_USER_TURNS),
+            lambda: Agent.default.llm_node(self, chat_ctx, tools, model_settings),
+            name=self.dial_info.get("name", "") or "",
+            phone=self.dial_info.get("phone_number", "") or "",
+        )
+
     async def on_session_started(self, ctx: RunContext) -> None:
         """Called when the session starts"""
         logger.info("Session started, preparing welcome message...")
         
         try:
-            # Greeting will be handled by the session.generate_reply in the entry point
+            # Greeting is played by the entry point (cached audio, or generate_reply as a fallback)
             greeting = self.create_greeting()
             logger.info(f"Generated greeting: {greeting}")
         except Exception as e:
             logger.error(f"Error generating welcome speech: {e}")
             import traceback
-            traceback.print_exc()
\ No newline at end of file
+            traceback.print_exc()
\ No newline at end of file
@@ -1,21 +1,81 @@
 # agent/config.py
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from shared.config import env, DB_PATH, CALL_EVENTS_SECRET
 
 # Agent configuration
-AGENT_NAME = os.getenv("AGENT_NAME", "AI_Assistant")
-MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o")
-TTS_MODEL = os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
-TTS_VOICE = os.getenv("TTS_VOICE", "ash")
+AGENT_NAME = env.str("AGENT_NAME", "AI_Assistant")
+MODEL_NAME = env.str("MODEL_NAME", "gpt-4o")
+TTS_MODEL = env.str("TTS_MODEL", "gpt-4o-mini-tts")
+TTS_VOICE = env.str("TTS_VOICE", "ash")
+STT_MODEL = env.str("STT_MODEL", "nova-2")
 
 # LiveKit configuration
-LIVEKIT_URL = os.getenv("LIVEKIT_URL")
-LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
-SIP_OUTBOUND_TRUNK_ID = os.getenv("SIP_OUTBOUND_TRUNK_ID")
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+LIVEKIT_URL = env.str("LIVEKIT_URL")
+LIVEKIT_API_KEY = env.str("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = env.str("LIVEKIT_API_SECRET")
+SIP_OUTBOUND_TRUNK_ID = env.str("SIP_OUTBOUND_TRUNK_ID")
+DEEPGRAM_API_KEY = env.str("DEEPGRAM_API_KEY")
+
+# Settings the worker cannot start without (checked in agent.entrypoint's main)
+REQUIRED_SETTINGS = ("LIVEKIT_URL", "LIVEKIT_API_KEY", "LIVEKIT_API_SECRET", "SIP_OUTBOUND_TRUNK_ID")
 
 # Default settings
-DEFAULT_PHONE_NUMBER = os.getenv("DEFAULT_PHONE_NUMBER", "")
\ No newline at end of file
+DEFAULT_PHONE_NUMBER = env.str("DEFAULT_PHONE_NUMBER", "")
+
+# Pre-synthesized greeting audio cache
+GREETING_AUDIO_CACHE = env.bool("GREETING_AUDIO_CACHE", True)
+GREETING_CACHE_DIR = env.str("GREETING_CACHE_DIR", "cache/greetings")
+GREETING_CACHE_MAX_ENTRIES = env.int("GREETING_CACHE_MAX_ENTRIES", 256, minimum=0)
+GREETING_CACHE_MAX_DISK_ENTRIES = env.int("GREETING_CACHE_MAX_DISK_ENTRIES", 5000, minimum=0)
+
+# LLM response cache: answers to a call's opening questions, reused for the
+# same (normalised) question under the same prompt. Off by default.
+# RESPONSE_CACHE_PATH is a SQLite file shared by the worker processes on a
+# host (empty keeps the cache in memory); RESPONSE_CACHE_SIMILARITY is the
+# word-overlap (Jaccard) score a different wording must reach to reuse an
+# answer (0 accepts exact matches only)
+RESPONSE_CACHE = env.bool("RESPONSE_CACHE", False)
+RESPONSE_CACHE_PATH = env.str("RESPONSE_CACHE_PATH", "cache/responses.sqlite")
+RESPONSE_CACHE_TTL = env.float("RESPONSE_CACHE_TTL", 86400.0, minimum=1)
+RESPONSE_CACHE_MAX_ENTRIES = env.int("RESPONSE_CACHE_MAX_ENTRIES", 512, minimum=0)
+RESPONSE_CACHE_MAX_DISK_ENTRIES = env.int("RESPONSE_CACHE_MAX_DISK_ENTRIES", 10000, minimum=0)
+RESPONSE_CACHE_MAX_USER_TURNS = env.int("RESPONSE_CACHE_MAX_USER_TURNS", 1, minimum=1)
+RESPONSE_CACHE_SIMILARITY = env.float("RESPONSE_CACHE_SIMILARITY", 0.0, minimum=0)
+
+# Worker settings
+# "process" runs each call in its own prewarmed process; "thread" hosts many
+# calls in one process, sharing its loaded config and greeting cache
+AGENT_JOB_EXECUTOR = env.choice("AGENT_JOB_EXECUTOR", "process", ("process", "thread"))
+AGENT_NUM_IDLE_PROCESSES = env.int("AGENT_NUM_IDLE_PROCESSES", 2, minimum=0)
+
+# Worker load: jobs are declined (and routed by LiveKit to another worker)
+# once this worker runs AGENT_MAX_CALLS calls, its event loop lags by
+# AGENT_MAX_LOOP_LAG seconds or CPU reaches AGENT_MAX_CPU percent (0 turns a
+# limit off). AGENT_LOAD_THRESHOLD is the fraction of those limits that
+# counts as full. The load is written to AGENT_LOAD_METRICS_FILE (Prometheus
+# text format, for node_exporter's textfile collector) and, with
+# AGENT_PROMETHEUS_PORT, served by LiveKit's own metrics endpoint
+AGENT_MAX_CALLS = env.int("AGENT_MAX_CALLS", 10, minimum=0)
+AGENT_MAX_LOOP_LAG = env.float("AGENT_MAX_LOOP_LAG", 0.2, minimum=0)
+AGENT_MAX_CPU = env.float("AGENT_MAX_CPU", 80.0, minimum=0)
+AGENT_LOAD_THRESHOLD = env.float("AGENT_LOAD_THRESHOLD", 1.0, minimum=0.05)
+AGENT_LOAD_METRICS_FILE = env.str("AGENT_LOAD_METRICS_FILE", "")
+AGENT_PROMETHEUS_PORT = env.int("AGENT_PROMETHEUS_PORT", 0, minimum=0)
+
+# Call data written by the agent (shared with the web service's database)
+CALL_TIMELINE_STORE = env.bool("CALL_TIMELINE_STORE", True)
+
+# Outbound dial retries: only carrier congestion (503, 480, ...) is retried,
+# with exponential backoff; busy or rejected numbers fail straight away
+DIAL_MAX_RETRIES = env.int("DIAL_MAX_RETRIES", 3, minimum=0)
+DIAL_RETRY_BASE_DELAY = env.float("DIAL_RETRY_BASE_DELAY", 1.0, minimum=0)
+
+# Web service endpoint that receives signed answered / sip_failed / hangup
+# events, e.g. https://calls.example.com/events/agent (empty disables them)
+CALL_EVENTS_URL = env.str("CALL_EVENTS_URL", "")
+
+# Transcript segments are buffered and inserted in batches while the call runs
+TRANSCRIPT_STORE = env.bool("TRANSCRIPT_STORE", True)
+TRANSCRIPT_BATCH_SIZE = env.int("TRANSCRIPT_BATCH_SIZE", 20, minimum=1)
+TRANSCRIPT_FLUSH_INTERVAL = env.float("TRANSCRIPT_FLUSH_INTERVAL", 5.0, minimum=0)
+
+env.validate()
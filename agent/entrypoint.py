@@ -1,68 +1,111 @@
 # agent/entrypoint.py
-from dotenv import load_dotenv
 from livekit import agents, api, rtc
 from .agent import CallAgent
-from livekit.plugins import openai, deepgram
+from .config import (
+    AGENT_NAME, SIP_OUTBOUND_TRUNK_ID, DEFAULT_PHONE_NUMBER, GREETING_AUDIO_CACHE,
+    AGENT_JOB_EXECUTOR, AGENT_NUM_IDLE_PROCESSES, AGENT_PROMETHEUS_PORT, CALL_TIMELINE_STORE,
+    DIAL_MAX_RETRIES, DIAL_RETRY_BASE_DELAY, TRANSCRIPT_STORE, REQUIRED_SETTINGS, env
+)
+from .greeting_cache import get_greeting_cache, iter_frames
+from .prewarm import prewarm, borrow_plugins
+from .timeline import CallTimeline, latency_snapshot
+from .storage import save_timeline
+from .transcript import TranscriptRecorder
+from .events import CallEventPublisher
+from .load import get_worker_load
+from shared.admission import classify_sip_status
+from shared.call_events import ANSWERED, SIP_FAILED, HANGUP
+from shared.logging_config import ContextFilter, bind_log_context, configure_logging
 from livekit.agents import AgentSession, RoomInputOptions
 import json
-import os
 import logging
 import asyncio
+import random
 
-load_dotenv()
 logger = logging.getLogger("call_assistant")
+# Stamp the bound call context on records here, in the job process, before
+# they are forwarded to the worker process that writes them
+logger.addFilter(ContextFilter())
 
 async def entrypoint(ctx: agents.JobContext):
+    bind_log_context(room=ctx.job.room.name, job=ctx.job.id)
+    timeline = CallTimeline(ctx.job.room.name)
+    ctx.add_shutdown_callback(lambda: _finish_timeline(timeline))
+    call_events = CallEventPublisher(ctx.job.room.name)
+    ctx.add_shutdown_callback(lambda: _finish_call_events(call_events))
+
     await ctx.connect()
+    timeline.mark("connected")
+    plugins = borrow_plugins(ctx)
     
     # Parse metadata
     try:
         if ctx.job.metadata:
             dial_info = json.loads(ctx.job.metadata)
-            logger.info(f"Parsed dial info: {dial_info}")
+            logger.debug("Parsed dial info with fields: %s", sorted(dial_info))
         else:
-            dial_info = {"phone_number": os.getenv("DEFAULT_PHONE_NUMBER")}
+            dial_info = {"phone_number": DEFAULT_PHONE_NUMBER}
             logger.warning("No metadata provided, using default dial info")
 
     except json.JSONDecodeError as e:
-        logger.error(f"Error parsing metadata: {e}")
-        logger.error(f"Raw metadata: '{ctx.job.metadata}'")
-        dial_info = {"phone_number": os.getenv("DEFAULT_PHONE_NUMBER")}
+        logger.error("Error parsing metadata: %s", e)
+        logger.error("Raw metadata: '%s'", ctx.job.metadata)
+        dial_info = {"phone_number": DEFAULT_PHONE_NUMBER}
     
     # Create agent with dial info
     agent = CallAgent(
-        name=os.getenv("AGENT_NAME", "AI_Assistant"),
+        name=AGENT_NAME,
         dial_info=dial_info
     )
+    if agent.response_cache is not None:
+        # Let answers generated on this call reach the shared disk cache
+        ctx.add_shutdown_callback(agent.response_cache.drain)
     
-    # Create session
+    # Create session on the prewarmed plugin clients
+    tts = plugins.tts
     session = AgentSession(
-        stt = deepgram.STT(api_key=os.getenv("DEEPGRAM_API_KEY"), model="nova-2"),
-        llm = openai.LLM(model=os.getenv("MODEL_NAME", "gpt-4o")),
-        tts = openai.TTS(model=os.getenv("TTS_MODEL", "gpt-4o-mini-tts"), voice=os.getenv("TTS_VOICE", "ash"))
+        stt = plugins.stt,
+        llm = plugins.llm,
+        tts = tts
+    )
+    session.on("metrics_collected", lambda ev: timeline.on_metrics(ev.metrics))
+    session.on(
+        "agent_state_changed",
+        lambda ev: ev.new_state == "speaking" and timeline.mark("first_greeting_audio")
     )
+    if TRANSCRIPT_STORE:
+        transcript = TranscriptRecorder(ctx.room.name)
+        session.on("conversation_item_added", transcript.on_conversation_item)
+        ctx.add_shutdown_callback(transcript.aclose)
+
+    # Synthesize the greeting while the phone rings so it can play on pickup
+    greeting_parts = agent.create_greeting_parts()
+    greeting_audio_task = None
+    if GREETING_AUDIO_CACHE:
+        greeting_audio_task = asyncio.create_task(get_greeting_cache().load(greeting_parts, tts))
     
     # Handle SIP participant creation and start session
     try:
         phone_number = dial_info["phone_number"]
-        logger.info(f"Dialing phone number: {phone_number}")
+        logger.info("Dialing phone number: %s", phone_number)
 
         participant_identity = dial_info.get("name", "customer")
         
         # Make the outbound call
-        await ctx.api.sip.create_sip_participant(
-            api.CreateSIPParticipantRequest(
-                room_name=ctx.room.name,
-                sip_trunk_id=os.getenv("SIP_OUTBOUND_TRUNK_ID"),
-                sip_call_to=phone_number,
-                participant_identity=participant_identity,
-                krisp_enabled=True
-            )
-        )
+        await _dial(ctx, api.CreateSIPParticipantRequest(
+            room_name=ctx.room.name,
+            sip_trunk_id=SIP_OUTBOUND_TRUNK_ID,
+            sip_call_to=phone_number,
+            participant_identity=participant_identity,
+            krisp_enabled=True
+        ))
+        timeline.mark("sip_participant_created")
 
         # Wait for participant to join and set it as the agent's participant
         participant = await ctx.wait_for_participant(identity=participant_identity)
+        timeline.mark("participant_joined")
         agent.set_participant(participant)
+        _report_call_status(ctx, participant, call_events)
         logger.info("Call picked up successfully")
 
         # Start the session
@@ -71,14 +114,100 @@ async def entrypoint(ctx: agents.JobContext):
             agent=agent,
             room_input_options=RoomInputOptions(),
         )
+        timeline.mark("session_started")
 
-        # Generate initial greeting
-        greeting = agent.create_greeting()
-        await session.generate_reply(instructions=f"Greet the user and say '{greeting}'")
+        # Play the greeting straight from cached audio, skipping the LLM. The text
+        # comes from the same parts as the audio, even if the hour turned meanwhile
+        greeting = " ".join(greeting_parts)
+        greeting_audio = await greeting_audio_task if greeting_audio_task else None
+        if greeting_audio:
+            await session.say(greeting, audio=iter_frames(greeting_audio))
+        else:
+            await session.generate_reply(instructions=f"Greet the user and say '{greeting}'")
 
     except api.TwirpError as e:
-        logger.error(f"Error creating SIP participant: {e.message}, "
-                    f"SIP status: {e.metadata.get('sip_status_code')} "
-                    f"{e.metadata.get('sip_status')}")
+        logger.error("Error creating SIP participant: %s, SIP status: %s %s",
+                     e.message, e.metadata.get('sip_status_code'), e.metadata.get('sip_status'))
+        call_events.emit(SIP_FAILED, sip_status=e.metadata.get('sip_status_code'))
         ctx.shutdown()
-        return
\ No newline at end of file
+        return
+
+    finally:
+        # Still synthesizing if the call failed (or the job was cancelled) before the greeting
+        if greeting_audio_task and not greeting_audio_task.done():
+            greeting_audio_task.cancel()
+
+async def _dial(ctx: agents.JobContext, request: api.CreateSIPParticipantRequest):
+    """create_sip_participant, backing off and retrying while the carrier is congested"""
+    for attempt in range(DIAL_MAX_RETRIES + 1):
+        try:
+            return await ctx.api.sip.create_sip_participant(request)
+        except api.TwirpError as e:
+            outcome = classify_sip_status(e.metadata.get('sip_status_code'))
+            if outcome != "congestion" or attempt == DIAL_MAX_RETRIES:
+                raise
+            delay = DIAL_RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning("Trunk congested (SIP %s), retrying dial in %.1fs",
+                           e.metadata.get('sip_status_code'), delay)
+            await asyncio.sleep(delay)
+
+def _report_call_status(ctx: agents.JobContext, participant: rtc.RemoteParticipant, call_events: CallEventPublisher):
+    """Emit `answered` once the callee picks up and `hangup` when they leave
+
+    The SIP participant joins the room while the phone is still ringing;
+    its `sip.callStatus` attribute turns "active" on pickup.
+    """
+    def check_answered():
+        if participant.attributes.get("sip.callStatus") == "active":
+            call_events.emit(ANSWERED)
+
+    ctx.room.on(
+        "participant_attributes_changed",
+        lambda changed, p: p.identity == participant.identity and check_answered()
+    )
+    ctx.room.on(
+        "participant_disconnected",
+        lambda p: p.identity == participant.identity and call_events.emit(HANGUP)
+    )
+    check_answered()
+
+async def _finish_call_events(call_events: CallEventPublisher):
+    """A call the agent ended itself still needs its hangup reported"""
+    if call_events.sent(ANSWERED):
+        call_events.emit(HANGUP)
+    await call_events.aclose()
+
+async def _finish_timeline(timeline: CallTimeline):
+    """Persist the call's latency timeline and log this process's percentiles"""
+    logger.info("Call timeline for %s: %s", timeline.room_name, timeline.stages)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Process latency percentiles: %s", latency_snapshot())
+    if CALL_TIMELINE_STORE:
+        try:
+            await asyncio.to_thread(save_timeline, timeline.room_name, timeline.stages, timeline.turns)
+        except Exception as e:
+            logger.error("Could not store call timeline for %s: %s", timeline.room_name, e)
+
+def worker_options() -> agents.WorkerOptions:
+    """Worker options for this agent: prewarmed executors, explicit dispatch by name, load-aware acceptance"""
+    executor = (
+        agents.JobExecutorType.THREAD if AGENT_JOB_EXECUTOR == "thread"
+        else agents.JobExecutorType.PROCESS
+    )
+    load = get_worker_load()
+    return agents.WorkerOptions(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        agent_name=AGENT_NAME,
+        job_executor_type=executor,
+        num_idle_processes=AGENT_NUM_IDLE_PROCESSES,
+        load_fnc=load.load_fnc,
+        load_threshold=load.threshold,
+        request_fnc=load.request_fnc,
+        **({"prometheus_port": AGENT_PROMETHEUS_PORT} if AGENT_PROMETHEUS_PORT else {}),
+    )
+
+if __name__ == "__main__":
+    env.require(*REQUIRED_SETTINGS)
+    configure_logging("agent", logger_name="call_assistant")
+    agents.cli.run_app(worker_options())
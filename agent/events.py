@@ -0,0 +1,78 @@
+# agent/events.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+import aiohttp
+from shared.call_events import sign
+from .config import CALL_EVENTS_URL, CALL_EVENTS_SECRET
+
+logger = logging.getLogger("call_assistant")
+
+class CallEventPublisher:
+    """Reports one call's lifecycle (answered / sip_failed / hangup) to the web service
+
+    `emit()` never blocks the call: each event is posted, signed with
+    CALL_EVENTS_SECRET, from a background task and retried a few times on
+    connection errors or 5xx answers. Every kind is sent at most once.
+    Does nothing when CALL_EVENTS_URL is not set.
+    """
+
+    def __init__(self, room_name: str, *, url: str = CALL_EVENTS_URL, secret: str | None = CALL_EVENTS_SECRET,
+                 attempts: int = 3, timeout: float = 5.0):
+        self.room_name = room_name
+        self.url = url
+        self.secret = secret
+        self.attempts = attempts
+        self.timeout = timeout
+        self._sent: set[str] = set()
+        self._posts: set[asyncio.Task] = set()
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url and self.secret)
+
+    def sent(self, kind: str) -> bool:
+        return kind in self._sent
+
+    def emit(self, kind: str, **fields) -> None:
+        """Queue `kind` for this room, stamped with the current time"""
+        if kind in self._sent:
+            return
+        self._sent.add(kind)
+        if not self.enabled:
+            return
+        event = {"room_name": self.room_name, "event": kind, "at": time.time(), **fields}
+        task = asyncio.get_running_loop().create_task(self._post(event))
+        self._posts.add(task)
+        task.add_done_callback(self._posts.discard)
+
+    async def _post(self, event: dict) -> None:
+        body = json.dumps(event).encode()
+        for attempt in range(self.attempts):
+            try:
+                if self._session is None:
+                    self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+                headers = {"Content-Type": "application/json", **sign(self.secret, body)}
+                async with self._session.post(self.url, data=body, headers=headers) as response:
+                    if response.status < 500:
+                        if response.status >= 400:
+                            logger.error("Call event %s for %s refused: HTTP %d",
+                                         event["event"], self.room_name, response.status)
+                        return
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt + 1 < self.attempts:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        logger.error("Could not send call event %s for %s: %s", event["event"], self.room_name, error)
+
+    async def aclose(self) -> None:
+        """Wait for events still being posted, then close the HTTP session"""
+        if self._posts:
+            await asyncio.wait(set(self._posts), timeout=self.timeout * self.attempts)
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
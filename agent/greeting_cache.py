@@ -0,0 +1,231 @@
+# agent/greeting_cache.py
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import wave
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable
+
+from livekit import rtc
+
+logger = logging.getLogger("call_assistant")
+
+# Cached audio is replayed in 20ms frames, the same size the room publishes
+FRAME_DURATION_MS = 20
+
+@dataclass
+class CachedAudio:
+    """Raw 16-bit PCM for one synthesized text fragment"""
+    pcm: bytes
+    sample_rate: int
+    num_channels: int
+
+    def frames(self) -> Iterable[rtc.AudioFrame]:
+        samples_per_frame = self.sample_rate * FRAME_DURATION_MS // 1000
+        bytes_per_frame = samples_per_frame * self.num_channels * 2
+        for offset in range(0, len(self.pcm), bytes_per_frame):
+            chunk = self.pcm[offset:offset + bytes_per_frame]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+class GreetingAudioCache:
+    """Two-level (memory LRU + on-disk WAV) cache of synthesized greeting audio
+
+    Works with any TTS whose `synthesize(text)` yields events carrying an
+    `rtc.AudioFrame` in `.frame`, so tests can pass a stub TTS. Concurrent
+    requests for the same fragment share a single synthesis.
+    """
+
+    def __init__(self, *, voice_key: str, cache_dir: str | None = None,
+                 max_entries: int = 256, max_disk_entries: int = 5000):
+        self.voice_key = voice_key
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[str, CachedAudio] = OrderedDict()
+        self._memory_lock = threading.Lock()
+        # In-flight syntheses per event loop (thread executors run a loop per job)
+        self._inflight = weakref.WeakKeyDictionary()
+        self._fixed_parts_warmed = False
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.voice_key}|{text}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _remember(self, key: str, audio: CachedAudio) -> None:
+        with self._memory_lock:
+            self._memory[key] = audio
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str) -> CachedAudio | None:
+        with self._memory_lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+            return audio
+
+    async def get_audio(self, text: str, tts) -> CachedAudio:
+        """Return audio for `text`, synthesizing it with `tts` only on a miss"""
+        key = self._key(text)
+        audio = self._recall(key)
+        if audio is not None:
+            return audio
+
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        future = inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load_or_synthesize(key, text, tts))
+            inflight[key] = future
+            future.add_done_callback(lambda _: inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _load_or_synthesize(self, key: str, text: str, tts) -> CachedAudio:
+        audio = None
+        if self.cache_dir:
+            audio = await asyncio.to_thread(self._read_disk, key)
+        if audio is None:
+            audio = await synthesize_audio(tts, text)
+            if self.cache_dir:
+                await asyncio.to_thread(self._write_disk, key, audio)
+        self._remember(key, audio)
+        return audio
+
+    async def prefetch(self, texts: Iterable[str], tts) -> None:
+        """Synthesize (or load) every fragment ahead of time, ignoring failures"""
+        results = await asyncio.gather(
+            *(self.get_audio(text, tts) for text in texts), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Greeting audio prefetch failed: {result}")
+
+    @staticmethod
+    def fixed_parts() -> list[str]:
+        """The query-less greeting bodies, one per time-of-day bucket"""
+        from shared.prompts import TIME_GREETINGS, get_welcome_message_parts
+        return [get_welcome_message_parts("", None, greeting)[1] for greeting in TIME_GREETINGS]
+
+    def load_fixed_parts_from_disk(self) -> None:
+        """Pull any fixed parts already on disk into memory (synchronous, for prewarm)"""
+        if not self.cache_dir:
+            return
+        for text in self.fixed_parts():
+            key = self._key(text)
+            if self._recall(key) is None:
+                audio = self._read_disk(key)
+                if audio is not None:
+                    self._remember(key, audio)
+
+    async def warm_fixed_parts(self, tts) -> None:
+        """Pre-synthesize the query-less greeting body for every time-of-day bucket"""
+        if self._fixed_parts_warmed:
+            return
+        self._fixed_parts_warmed = True
+        await self.prefetch(self.fixed_parts(), tts)
+
+    async def load(self, texts: Iterable[str], tts) -> list[CachedAudio] | None:
+        """Audio for every fragment in order, or None if any of them failed"""
+        try:
+            return list(await asyncio.gather(*(self.get_audio(text, tts) for text in texts)))
+        except Exception as e:
+            logger.warning(f"Greeting audio unavailable: {e}")
+            return None
+
+    def _read_disk(self, key: str) -> CachedAudio | None:
+        path = self._path(key)
+        try:
+            with wave.open(path, "rb") as wav:
+                audio = CachedAudio(
+                    pcm=wav.readframes(wav.getnframes()),
+                    sample_rate=wav.getframerate(),
+                    num_channels=wav.getnchannels(),
+                )
+            os.utime(path)  # mark as recently used for disk eviction
+            return audio
+        except FileNotFoundError:
+            return None
+        except (wave.Error, EOFError) as e:
+            logger.warning(f"Discarding unreadable cached greeting {path}: {e}")
+            os.remove(path)
+            return None
+
+    def _write_disk(self, key: str, audio: CachedAudio) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as wav:
+            wav.setnchannels(audio.num_channels)
+            wav.setsampwidth(2)
+            wav.setframerate(audio.sample_rate)
+            wav.writeframes(audio.pcm)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".wav")]
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+async def iter_frames(audios: Iterable[CachedAudio]) -> AsyncIterator[rtc.AudioFrame]:
+    """Replay cached fragments back to back, ready for AgentSession.say()"""
+    for audio in audios:
+        for frame in audio.frames():
+            yield frame
+
+async def synthesize_audio(tts, text: str) -> CachedAudio:
+    """Run a full (non-streaming) synthesis and collect the PCM"""
+    chunks = []
+    sample_rate = num_channels = None
+    stream = tts.synthesize(text)
+    try:
+        async for event in stream:
+            frame = event.frame
+            sample_rate, num_channels = frame.sample_rate, frame.num_channels
+            chunks.append(bytes(frame.data))
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    if sample_rate is None:
+        raise RuntimeError(f"TTS returned no audio for greeting fragment: {text!r}")
+    return CachedAudio(pcm=b"".join(chunks), sample_rate=sample_rate, num_channels=num_channels)
+
+_greeting_cache: GreetingAudioCache | None = None
+
+def get_greeting_cache() -> GreetingAudioCache:
+    """Process-wide greeting cache, shared by every job in this worker"""
+    global _greeting_cache
+    if _greeting_cache is None:
+        from .config import (
+            TTS_MODEL, TTS_VOICE, GREETING_CACHE_DIR,
+            GREETING_CACHE_MAX_ENTRIES, GREETING_CACHE_MAX_DISK_ENTRIES
+        )
+        _greeting_cache = GreetingAudioCache(
+            voice_key=f"openai|{TTS_MODEL}|{TTS_VOICE}",
+            cache_dir=GREETING_CACHE_DIR or None,
+            max_entries=GREETING_CACHE_MAX_ENTRIES,
+            max_disk_entries=GREETING_CACHE_MAX_DISK_ENTRIES,
+        )
+    return _greeting_cache
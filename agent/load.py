@@ -0,0 +1,226 @@
+# agent/load.py
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # CPU falls back to the load average
+    psutil = None
+
+logger = logging.getLogger("call_assistant")
+
+# How often the event loop probe wakes up
+LAG_PROBE_INTERVAL = 0.25
+# Weight of the newest sample in the lag and CPU moving averages
+SMOOTHING = 0.3
+# An accepted job that LiveKit has not assigned to us by then never will be
+ACCEPTED_JOB_TIMEOUT = 30.0
+
+def _cpu_percent() -> float | None:
+    """System CPU use since the previous call, or the 1-minute load average per core"""
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None)
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1) * 100
+    except (AttributeError, OSError):
+        return None
+
+class WorkerLoad:
+    """Load of this agent worker, for LiveKit's job routing and for autoscaling
+
+    The load is the highest of three ratios, each 1.0 at its limit:
+
+    - calls on this worker (running, or accepted and not yet running) / `max_calls`;
+    - event loop lag / `max_loop_lag` (the lag of the worker's own loop, which
+      job threads share the interpreter with);
+    - CPU use / `max_cpu`.
+
+    `load_fnc` reports it to LiveKit, which stops offering jobs to a worker at
+    or above the load threshold. `request_fnc` also declines jobs, without
+    terminating them, when any limit is already reached, so LiveKit retries
+    them on another worker. A limit of 0 switches that signal off.
+
+    When `metrics_file` is set, the signals are written there in the
+    Prometheus text format (for node_exporter's textfile collector).
+    """
+
+    def __init__(self, *, max_calls: int = 10, max_loop_lag: float = 0.2, max_cpu: float = 80.0,
+                 threshold: float = 1.0, metrics_file: str | None = None, export_interval: float = 5.0):
+        self.max_calls = max_calls
+        self.max_loop_lag = max_loop_lag
+        self.max_cpu = max_cpu
+        self.threshold = threshold
+        self.metrics_file = metrics_file
+        self.export_interval = export_interval
+        self.active_calls = 0
+        self._accepted: dict[str, float] = {}  # job id -> accepted at, until it shows up as running
+        self.loop_lag = 0.0
+        self.cpu = 0.0
+        self.load = 0.0
+        self.accepted = 0
+        self.declined = 0
+        self._probe: asyncio.Task | None = None
+        self._lock = threading.Lock()
+        self._exported_at = 0.0
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)  # the first reading is meaningless
+
+    def _smooth(self, previous: float, sample: float) -> float:
+        return previous + SMOOTHING * (sample - previous)
+
+    def start_probe(self) -> None:
+        """Measure lag on the running loop (the worker's), once"""
+        if self._probe is None or self._probe.done():
+            self._probe = asyncio.get_running_loop().create_task(self._measure_lag())
+
+    async def _measure_lag(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lag = max(time.monotonic() - started - LAG_PROBE_INTERVAL, 0.0)
+            with self._lock:
+                self.loop_lag = self._smooth(self.loop_lag, lag)
+
+    def _ratios(self) -> dict[str, float]:
+        ratios = {}
+        if self.max_calls:
+            ratios["calls"] = self.active_calls / self.max_calls
+        if self.max_loop_lag:
+            ratios["loop_lag"] = self.loop_lag / self.max_loop_lag
+        if self.max_cpu:
+            ratios["cpu"] = self.cpu / self.max_cpu
+        return ratios
+
+    def _update_load(self) -> None:
+        self.load = min(max(self._ratios().values(), default=0.0), 1.0)
+
+    def load_fnc(self, worker) -> float:
+        """WorkerOptions.load_fnc: runs in an executor thread every few seconds"""
+        cpu = _cpu_percent()
+        running = {info.job.id for info in worker.active_jobs}
+        now = time.monotonic()
+        with self._lock:
+            # Accepted jobs count until they run (or were evidently given to another worker)
+            self._accepted = {
+                job_id: accepted_at for job_id, accepted_at in self._accepted.items()
+                if job_id not in running and now - accepted_at < ACCEPTED_JOB_TIMEOUT
+            }
+            self.active_calls = len(running) + len(self._accepted)
+            if cpu is not None:
+                self.cpu = self._smooth(self.cpu, cpu)
+            self._update_load()
+            load = self.load
+        if self.metrics_file and time.monotonic() - self._exported_at >= self.export_interval:
+            self._exported_at = time.monotonic()
+            self.export()
+        return load
+
+    def _over_capacity(self) -> str | None:
+        for name, ratio in self._ratios().items():
+            if ratio >= self.threshold:
+                return name
+        return None
+
+    def over_capacity(self) -> str | None:
+        """The first signal at or above its limit, or None"""
+        with self._lock:
+            return self._over_capacity()
+
+    def reserve(self, job_id: str) -> str | None:
+        """Count `job_id` as a call on this worker, unless a limit is already reached
+
+        Returns the signal at its limit (and reserves nothing), or None. Each
+        accepted job counts at once, so a burst of requests between two
+        load_fnc refreshes cannot push the worker past `max_calls`.
+        """
+        with self._lock:
+            reason = self._over_capacity()
+            if reason is None:
+                self._accepted[job_id] = time.monotonic()
+                self.active_calls += 1
+                self.accepted += 1
+                self._update_load()
+            else:
+                self.declined += 1
+            return reason
+
+    async def request_fnc(self, request) -> None:
+        """WorkerOptions.request_fnc: accept the job unless this worker is full"""
+        self.start_probe()
+        reason = self.reserve(request.id)
+        if reason is not None:
+            logger.warning("Declining job %s: %s limit reached (%d calls, loop lag %.0fms, CPU %.0f%%)",
+                           request.id, reason, self.active_calls, self.loop_lag * 1000, self.cpu)
+            # terminate=False lets LiveKit offer the job to another worker
+            await request.reject(terminate=False)
+            return
+        try:
+            await request.accept()
+        except BaseException:
+            with self._lock:
+                if self._accepted.pop(request.id, None) is not None:
+                    self.active_calls -= 1
+                    self._update_load()
+            raise
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "load": self.load,
+                "active_calls": self.active_calls,
+                "max_calls": self.max_calls,
+                "loop_lag_seconds": self.loop_lag,
+                "cpu_percent": self.cpu,
+                "jobs_accepted": self.accepted,
+                "jobs_declined": self.declined,
+            }
+
+    def export(self) -> None:
+        """Write the current signals to `metrics_file` (atomically replaced)"""
+        labels = f'{{host="{socket.gethostname()}",pid="{os.getpid()}"}}'
+        state = self.snapshot()
+        lines = []
+        for name, kind, help_text in (
+            ("load", "gauge", "Worker load reported to LiveKit (1 = full)"),
+            ("active_calls", "gauge", "Calls running on this worker"),
+            ("max_calls", "gauge", "Calls this worker accepts before declining jobs"),
+            ("loop_lag_seconds", "gauge", "Smoothed event loop lag of the worker"),
+            ("cpu_percent", "gauge", "Smoothed CPU use seen by the worker"),
+            ("jobs_accepted", "counter", "Jobs accepted since the worker started"),
+            ("jobs_declined", "counter", "Jobs declined for load since the worker started"),
+        ):
+            metric = f"call_agent_{name}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}",
+                      f"{metric}{labels} {state[name]}"]
+        tmp_path = f"{self.metrics_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            logger.warning("Could not write load metrics to %s: %s", self.metrics_file, e)
+
+_worker_load: WorkerLoad | None = None
+
+def get_worker_load() -> WorkerLoad:
+    """This worker's load tracker, configured from agent.config"""
+    global _worker_load
+    if _worker_load is None:
+        from .config import (
+            AGENT_MAX_CALLS, AGENT_MAX_LOOP_LAG, AGENT_MAX_CPU, AGENT_LOAD_THRESHOLD,
+            AGENT_LOAD_METRICS_FILE
+        )
+        _worker_load = WorkerLoad(
+            max_calls=AGENT_MAX_CALLS,
+            max_loop_lag=AGENT_MAX_LOOP_LAG,
+            max_cpu=AGENT_MAX_CPU,
+            # LiveKit refuses thresholds above 1 outside dev mode
+            threshold=min(AGENT_LOAD_THRESHOLD, 1.0),
+            metrics_file=AGENT_LOAD_METRICS_FILE or None,
+        )
+    return _worker_load
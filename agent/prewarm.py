@@ -0,0 +1,68 @@
+# agent/prewarm.py
+from __future__ import annotations
+import asyncio
+import logging
+from dataclasses import dataclass
+from livekit import agents
+from livekit.plugins import openai, deepgram
+from .config import DEEPGRAM_API_KEY, STT_MODEL, MODEL_NAME, TTS_MODEL, TTS_VOICE, GREETING_AUDIO_CACHE
+from .greeting_cache import get_greeting_cache
+
+logger = logging.getLogger("call_assistant")
+
+# Fire-and-forget warm-up tasks, referenced until done so they are not collected
+_background_tasks: set[asyncio.Task] = set()
+
+@dataclass
+class Plugins:
+    """The STT/LLM/TTS clients a call's AgentSession runs on"""
+    stt: object
+    llm: object
+    tts: object
+
+    def warm_connections(self) -> None:
+        """Open backend connections on the running loop before they are needed"""
+        for plugin in (self.stt, self.llm, self.tts):
+            try:
+                plugin.prewarm()
+            except Exception as e:
+                logger.warning(f"Could not prewarm {type(plugin).__name__}: {e}")
+
+def build_plugins() -> Plugins:
+    """Create the plugin clients from the configuration loaded at import time"""
+    return Plugins(
+        stt=deepgram.STT(api_key=DEEPGRAM_API_KEY, model=STT_MODEL),
+        llm=openai.LLM(model=MODEL_NAME),
+        tts=openai.TTS(model=TTS_MODEL, voice=TTS_VOICE),
+    )
+
+def prewarm(proc: agents.JobProcess) -> None:
+    """Runs once per job executor, before it is handed a job
+
+    Idle executors are kept ready by the worker, so plugin construction (and
+    the imports behind it) happen off the call path.
+    """
+    proc.userdata["plugins"] = build_plugins()
+    if GREETING_AUDIO_CACHE:
+        get_greeting_cache().load_fixed_parts_from_disk()
+    logger.debug("Job executor prewarmed")
+
+def borrow_plugins(ctx: agents.JobContext) -> Plugins:
+    """Take the prewarmed plugins for this job, building them if prewarm didn't run"""
+    plugins = ctx.proc.userdata.pop("plugins", None)
+    if plugins is None:
+        logger.warning("No prewarmed plugins for this job, creating them now")
+        plugins = build_plugins()
+
+    # Connect to the backends (and warm the fixed greeting audio) while dialing
+    plugins.warm_connections()
+    if GREETING_AUDIO_CACHE:
+        task = asyncio.create_task(get_greeting_cache().warm_fixed_parts(plugins.tts))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_task_done)
+    return plugins
+
+def _background_task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Warming the greeting audio failed: {task.exception()}")
@@ -0,0 +1,371 @@
+# agent/response_cache.py
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterable, Callable, Protocol
+
+logger = logging.getLogger("call_assistant")
+
+# Words that change nothing about what the caller asked
+FILLER_WORDS = frozenset({
+    "um", "umm", "uh", "uhh", "erm", "hmm", "ah", "oh", "okay", "ok", "so", "well",
+    "like", "please", "hey", "hi", "hello", "yeah", "yes", "just", "actually",
+})
+# Stored in place of the caller's name, filled in again on a hit
+NAME_PLACEHOLDER = "{{customer_name}}"
+_NON_WORD = re.compile(r"[^\w]+")
+
+def normalize_question(text: str) -> str:
+    """Case-, punctuation- and filler-insensitive form of a caller's question"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(word for word in _NON_WORD.sub(" ", text).split() if word not in FILLER_WORDS)
+
+def prompt_hash(*parts: str) -> str:
+    """Fingerprint of everything besides the question that shapes the answer"""
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()[:32]
+
+@dataclass
+class CachedResponse:
+    text: str
+    created_at: float
+
+class SimilarityIndex(Protocol):
+    """Finds a stored question close enough to reuse its answer
+
+    Entries are grouped by scope (the prompt hash) and never match across
+    scopes. `match` returns the cache key of the best candidate, or None.
+    """
+
+    def add(self, scope: str, key: str, question: str) -> None: ...
+
+    def discard(self, scope: str, key: str) -> None: ...
+
+    def match(self, scope: str, question: str) -> str | None: ...
+
+class TokenSimilarityIndex:
+    """Jaccard similarity over the words of normalised questions
+
+    Candidates come from an inverted word index, so a lookup only scores
+    questions that share at least one word with the new one. Holds at most
+    `max_entries` questions, forgetting the oldest first.
+    """
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 10000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], frozenset[str]] = OrderedDict()
+        self._postings: dict[tuple[str, str], set[str]] = {}  # (scope, word) -> keys
+        self._lock = threading.Lock()
+
+    def add(self, scope: str, key: str, question: str) -> None:
+        words = frozenset(question.split())
+        if not words:
+            return
+        with self._lock:
+            self._remove((scope, key))
+            self._entries[(scope, key)] = words
+            for word in words:
+                self._postings.setdefault((scope, word), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, scope: str, key: str) -> None:
+        with self._lock:
+            self._remove((scope, key))
+
+    def _remove(self, entry: tuple[str, str]) -> None:
+        words = self._entries.pop(entry, None)
+        for word in words or ():
+            keys = self._postings.get((entry[0], word))
+            if keys is not None:
+                keys.discard(entry[1])
+                if not keys:
+                    del self._postings[(entry[0], word)]
+
+    def match(self, scope: str, question: str) -> str | None:
+        words = frozenset(question.split())
+        if not words:
+            return None
+        with self._lock:
+            candidates = set()
+            for word in words:
+                candidates.update(self._postings.get((scope, word), ()))
+            best_key, best_score = None, self.threshold
+            for key in candidates:
+                stored = self._entries[(scope, key)]
+                score = len(words & stored) / len(words | stored)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            return best_key
+
+class ResponseCache:
+    """Two-level (memory LRU + on-disk SQLite) cache of LLM answers
+
+    Entries are keyed on the normalised question and a prompt hash, and
+    expire `ttl` seconds after they were generated. The SQLite file (WAL
+    mode) can be shared by every worker process on a host: whatever one
+    call generates is a hit for the next call in any process. Disk writes
+    happen off the event loop and off the answer's path.
+
+    Answers are stored with the caller's name replaced by a placeholder;
+    one that mentions the caller's phone number is never stored.
+    """
+
+    def __init__(self, *, path: str | None = None, ttl: float = 86400.0, max_entries: int = 512,
+                 max_disk_entries: int = 10000, similarity: SimilarityIndex | None = None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.similarity = similarity
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+        self._memory: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes: set[asyncio.Task] = set()
+        self._index_loaded = False
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @staticmethod
+    def key(scope: str, question: str) -> str:
+        return hashlib.sha256(f"{scope}|{question}".encode()).hexdigest()
+
+    # Memory level
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        with self._memory_lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str) -> CachedResponse | None:
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _forget(self, key: str) -> None:
+        with self._memory_lock:
+            self._memory.pop(key, None)
+
+    # Disk level
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, scope TEXT NOT NULL, question TEXT NOT NULL,"
+                " response TEXT NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_used_at ON responses (used_at)")
+            self._conn = conn
+        return self._conn
+
+    def _read_disk(self, key: str) -> CachedResponse | None:
+        with self._db_lock:
+            db = self._db()
+            row = db.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] + self.ttl < time.time():
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            # Recently used entries survive disk eviction
+            db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        return CachedResponse(text=row[0], created_at=row[1])
+
+    def _write_disk(self, key: str, scope: str, question: str, entry: CachedResponse) -> None:
+        with self._db_lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, question, response, created_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, question, entry.text, entry.created_at, entry.created_at),
+            )
+            db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses"
+                " ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,)
+            )
+
+    def _load_index(self) -> None:
+        """Feed questions other processes already stored on disk to the similarity index"""
+        self._index_loaded = True
+        if not self.path or self.similarity is None:
+            return
+        with self._db_lock:
+            rows = self._db().execute(
+                "SELECT scope, key, question FROM responses WHERE created_at >= ?"
+                " ORDER BY used_at LIMIT ?", (time.time() - self.ttl, self.max_disk_entries)
+            ).fetchall()
+        for scope, key, question in rows:
+            self.similarity.add(scope, key, question)
+
+    # Public interface
+
+    async def get(self, scope: str, question: str) -> CachedResponse | None:
+        """The stored answer to `question` (already normalised), or None"""
+        entry = await self._lookup(self.key(scope, question))
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry
+        if self.similarity is not None:
+            if not self._index_loaded:
+                await asyncio.to_thread(self._load_index)
+            similar_key = self.similarity.match(scope, question)
+            if similar_key is not None:
+                entry = await self._lookup(similar_key)
+                if entry is not None:
+                    self.stats["similar_hits"] += 1
+                    return entry
+                self.similarity.discard(scope, similar_key)
+        self.stats["misses"] += 1
+        return None
+
+    async def _lookup(self, key: str) -> CachedResponse | None:
+        entry = self._recall(key)
+        if entry is not None:
+            if entry.created_at + self.ttl >= time.time():
+                return entry
+            self._forget(key)
+        if not self.path:
+            return None
+        try:
+            entry = await asyncio.to_thread(self._read_disk, key)
+        except sqlite3.Error as e:
+            logger.warning("Response cache read failed: %s", e)
+            return None
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, scope: str, question: str, text: str) -> None:
+        """Store an answer; the disk write runs in the background"""
+        key = self.key(scope, question)
+        entry = CachedResponse(text=text, created_at=time.time())
+        self._remember(key, entry)
+        if self.similarity is not None:
+            self.similarity.add(scope, key, question)
+        self.stats["stores"] += 1
+        if self.path:
+            task = asyncio.get_running_loop().create_task(
+                asyncio.to_thread(self._write_disk, key, scope, question, entry)
+            )
+            self._writes.add(task)
+            task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task) -> None:
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Response cache write failed: %s", task.exception())
+
+    async def drain(self) -> None:
+        """Wait for background disk writes (before a job ends)"""
+        if self._writes:
+            await asyncio.wait(set(self._writes))
+
+def _personalise(text: str, name: str) -> str | None:
+    if NAME_PLACEHOLDER not in text:
+        return text
+    return text.replace(NAME_PLACEHOLDER, name) if name else None
+
+def _anonymise(text: str, name: str, phone: str) -> str | None:
+    """The answer with the caller's name templated out, or None if it must not be shared"""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) >= 6 and digits[-6:] in re.sub(r"\D", "", text):
+        return None
+    if name and name.strip():
+        text = re.sub(rf"\b{re.escape(name.strip())}\b", NAME_PLACEHOLDER, text, flags=re.IGNORECASE)
+    return text
+
+def cacheable_question(chat_ctx, max_user_turns: int = 1) -> str | None:
+    """The caller's latest question, if the answer can only depend on it and the prompt
+
+    Only the first `max_user_turns` questions of a call qualify (later ones
+    depend on the conversation so far), and never once tools were used.
+    """
+    user_turns = 0
+    last = None
+    for item in chat_ctx.items:
+        if item.type in ("function_call", "function_call_output"):
+            return None
+        if item.type != "message":
+            continue
+        if item.role == "user":
+            user_turns += 1
+        last = item
+    if last is None or last.role != "user" or user_turns > max_user_turns:
+        return None
+    question = normalize_question(last.text_content or "")
+    return question or None
+
+async def cached_llm_stream(cache: ResponseCache, scope: str, question: str | None,
+                            generate: Callable[[], AsyncIterable], *,
+                            name: str = "", phone: str = "") -> AsyncIterable:
+    """`generate()`'s chunks, answered from `cache` when the question was seen before
+
+    A hit yields the stored text as one string, which the agent speaks
+    straight away without calling the LLM. A miss streams the LLM's chunks
+    unchanged and stores the complete answer unless the LLM called a tool
+    or the stream was cut short (the caller interrupted).
+    """
+    if question is not None:
+        entry = await cache.get(scope, question)
+        text = _personalise(entry.text, name) if entry is not None else None
+        if text is not None:
+            logger.debug("LLM response cache hit for %r", question)
+            yield text
+            return
+
+    parts = []
+    used_tools = False
+    async for chunk in generate():
+        if isinstance(chunk, str):
+            parts.append(chunk)
+        else:
+            delta = getattr(chunk, "delta", None)
+            if delta is not None:
+                used_tools = used_tools or bool(delta.tool_calls)
+                if delta.content:
+                    parts.append(delta.content)
+        yield chunk
+
+    if question is not None and not used_tools:
+        text = _anonymise("".join(parts).strip(), name, phone)
+        if text:
+            cache.put(scope, question, text)
+
+_response_cache: ResponseCache | None = None
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache, shared by every job in this worker"""
+    global _response_cache
+    if _response_cache is None:
+        from .config import (
+            RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES,
+            RESPONSE_CACHE_MAX_DISK_ENTRIES, RESPONSE_CACHE_SIMILARITY
+        )
+        _response_cache = ResponseCache(
+            path=RESPONSE_CACHE_PATH or None,
+            ttl=RESPONSE_CACHE_TTL,
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            max_disk_entries=RESPONSE_CACHE_MAX_DISK_ENTRIES,
+            similarity=TokenSimilarityIndex(RESPONSE_CACHE_SIMILARITY) if RESPONSE_CACHE_SIMILARITY else None,
+        )
+    return _response_cache
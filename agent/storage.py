@@ -0,0 +1,52 @@
+# agent/storage.py
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+from sqlalchemy import create_engine, event, insert
+from shared.database import db, CallTimeline, TranscriptSegment
+from .config import DB_PATH
+
+logger = logging.getLogger("call_assistant")
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+def get_engine():
+    """SQLAlchemy engine on the call database, for use outside the Flask app"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                directory = os.path.dirname(DB_PATH)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                engine = create_engine(f"sqlite:///{DB_PATH}")
+                event.listen(engine, "connect", _configure_sqlite_connection)
+                db.metadata.create_all(engine, tables=[CallTimeline.__table__, TranscriptSegment.__table__])
+                _engine = engine
+    return _engine
+
+def save_timeline(room_name: str, stages: dict, turns: list) -> None:
+    """Insert (or replace) the latency timeline for a call; blocking, run off-loop"""
+    table = CallTimeline.__table__
+    with get_engine().begin() as conn:
+        conn.execute(table.delete().where(table.c.room_name == room_name))
+        conn.execute(insert(table).values(
+            room_name=room_name,
+            stages=json.dumps(stages),
+            turns=json.dumps(turns),
+        ))
+
+def save_transcript_segments(rows: list[dict]) -> None:
+    """Append a batch of transcript segments in one transaction; blocking, run off-loop"""
+    if rows:
+        with get_engine().begin() as conn:
+            conn.execute(insert(TranscriptSegment.__table__), rows)
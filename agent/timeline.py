@@ -0,0 +1,105 @@
+# agent/timeline.py
+from __future__ import annotations
+import logging
+import threading
+import time
+from shared.sketch import LatencyHistogram
+
+logger = logging.getLogger("call_assistant")
+
+# Call setup stages, in the order they happen
+STAGES = (
+    "job_received",
+    "connected",                # ctx.connect()
+    "sip_participant_created",  # create_sip_participant returned
+    "participant_joined",       # wait_for_participant: ring + answer
+    "session_started",          # session.start
+    "first_greeting_audio",     # agent started speaking the greeting
+)
+
+# Derived setup intervals: name -> (from stage, to stage)
+INTERVALS = {
+    "setup.connect": ("job_received", "connected"),
+    "setup.dial": ("connected", "sip_participant_created"),
+    "setup.ring": ("sip_participant_created", "participant_joined"),
+    "setup.session_start": ("participant_joined", "session_started"),
+    "setup.greeting": ("session_started", "first_greeting_audio"),
+    "setup.time_to_first_word": ("participant_joined", "first_greeting_audio"),
+}
+
+# Per-turn latency components, all in seconds
+TURN_METRICS = ("eou_delay", "stt_final", "llm_ttft", "tts_ttfb", "total")
+
+_histograms: dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+def observe(metric: str, seconds: float) -> None:
+    """Add a sample to the process-level histogram for `metric`"""
+    with _histograms_lock:
+        histogram = _histograms.get(metric)
+        if histogram is None:
+            histogram = _histograms[metric] = LatencyHistogram()
+    histogram.add(seconds)
+
+def latency_snapshot() -> dict:
+    """count/mean/p50/p95/p99 for every metric seen by this process"""
+    with _histograms_lock:
+        items = list(_histograms.items())
+    return {metric: histogram.summary() for metric, histogram in sorted(items)}
+
+class CallTimeline:
+    """Monotonic timestamps for one call's setup stages and conversational turns"""
+
+    def __init__(self, room_name: str):
+        self.room_name = room_name
+        self._origin = time.monotonic()
+        self.stages: dict[str, float] = {"job_received": 0.0}
+        self.turns: list[dict] = []
+        self._pending_turns: dict[str, dict] = {}
+
+    def mark(self, stage: str) -> None:
+        """Record `stage` (first occurrence wins) and feed the interval histograms"""
+        if stage in self.stages:
+            return
+        self.stages[stage] = round(time.monotonic() - self._origin, 4)
+        for metric, (start, end) in INTERVALS.items():
+            if end == stage and start in self.stages:
+                observe(metric, self.stages[end] - self.stages[start])
+
+    def on_metrics(self, metrics) -> None:
+        """Fold livekit-agents metrics into per-turn records, keyed by speech_id
+
+        A turn runs from the end of user speech to the first TTS byte of the
+        reply: EOU metrics carry the end-of-utterance and STT-final delays,
+        then LLM time to first token and TTS time to first byte follow.
+        """
+        speech_id = getattr(metrics, "speech_id", None)
+        if not speech_id:
+            return
+        kind = getattr(metrics, "type", "")
+        turn = self._pending_turns.setdefault(speech_id, {})
+        if kind == "eou_metrics":
+            turn["eou_delay"] = metrics.end_of_utterance_delay
+            turn["stt_final"] = metrics.transcription_delay
+        elif kind == "llm_metrics":
+            turn.setdefault("llm_ttft", metrics.ttft)
+        elif kind == "tts_metrics":
+            turn.setdefault("tts_ttfb", metrics.ttfb)
+
+        # Agent-initiated speech (e.g. the greeting) has no EOU and is not a turn
+        if kind == "tts_metrics" and "eou_delay" not in turn:
+            del self._pending_turns[speech_id]
+            return
+        if all(key in turn for key in ("eou_delay", "llm_ttft", "tts_ttfb")):
+            del self._pending_turns[speech_id]
+            turn["total"] = turn["eou_delay"] + turn["llm_ttft"] + turn["tts_ttfb"]
+            turn = {key: round(value, 4) for key, value in turn.items()}
+            turn["seq"] = len(self.turns)
+            turn["at"] = round(time.monotonic() - self._origin, 4)
+            self.turns.append(turn)
+            for metric in TURN_METRICS:
+                if metric in turn:
+                    observe(f"turn.{metric}", turn[metric])
+
+    def to_dict(self) -> dict:
+        return {"room_name": self.room_name, "stages": dict(self.stages), "turns": list(self.turns)}
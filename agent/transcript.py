@@ -0,0 +1,85 @@
+# agent/transcript.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from .config import TRANSCRIPT_BATCH_SIZE, TRANSCRIPT_FLUSH_INTERVAL
+from .storage import save_transcript_segments
+
+logger = logging.getLogger("call_assistant")
+
+SPEAKERS = {"user": "customer", "assistant": "agent"}
+
+class TranscriptRecorder:
+    """Streams finalised utterances of one call into the transcript_segments table
+
+    Each conversation item becomes one append-only row, so the cost of a turn
+    does not grow with the length of the call. Rows are buffered and written
+    in batches of `batch_size`, or `flush_interval` seconds after the first
+    buffered row, whichever comes first.
+    """
+
+    def __init__(self, room_name: str, *, batch_size: int = TRANSCRIPT_BATCH_SIZE,
+                 flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL, writer=save_transcript_segments):
+        self.room_name = room_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._writer = writer
+        self._origin = time.time()
+        self._seq = 0
+        self._buffer: list[dict] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    def on_conversation_item(self, event) -> None:
+        """`conversation_item_added` handler: buffer the item if it is a spoken message"""
+        item = event.item
+        speaker = SPEAKERS.get(getattr(item, "role", None))
+        text = getattr(item, "text_content", None)
+        if speaker is None or not text:
+            return
+
+        metrics = getattr(item, "metrics", None) or {}
+        started = metrics.get("started_speaking_at")
+        stopped = metrics.get("stopped_speaking_at")
+        self._buffer.append({
+            "room_name": self.room_name,
+            "seq": self._seq,
+            "speaker": speaker,
+            "start_offset": self._offset(started),
+            "end_offset": self._offset(stopped or getattr(item, "created_at", None)),
+            "text": text,
+        })
+        self._seq += 1
+
+        if len(self._buffer) >= self.batch_size:
+            self._flush_soon()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._flush_soon)
+
+    def _offset(self, wall_time: float | None) -> float | None:
+        return round(wall_time - self._origin, 3) if wall_time else None
+
+    def _flush_soon(self) -> None:
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> None:
+        """Write whatever is buffered"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self._writer, rows)
+        except Exception as e:
+            logger.error(f"Could not store {len(rows)} transcript segments for {self.room_name}: {e}")
+
+    async def aclose(self) -> None:
+        """Flush the tail of the call and wait for in-flight batches (shutdown callback)"""
+        await self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
@@ -1,17 +1,19 @@
 # agent/utils.py
 import logging
-import random
-import string
+from shared.ids import new_ulid
+from shared.logging_config import configure_logging
 
 def setup_logging(level=logging.INFO):
-    """Setup basic logging configuration"""
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    return logging.getLogger("call_assistant")
+    """Setup logging for the agent (queued, see shared.logging_config)"""
+    logger = configure_logging("agent", logger_name="call_assistant")
+    logger.setLevel(level)
+    return logger
 
 def generate_room_name(prefix="outbound"):
-    """Generate a random room name for LiveKit sessions"""
-    random_suffix = ''.join(random.choice(string.digits) for _ in range(10))
-    return f"{prefix}-{random_suffix}"
\ No newline at end of file
+    """Generate a unique, time-ordered room name for LiveKit sessions
+
+    The room name is the call's identifier everywhere (call_records,
+    timelines, transcripts, events), so it is a ULID: never reused, and
+    consecutive calls sort (and are indexed) next to each other.
+    """
+    return f"{prefix}-{new_ulid()}"
\ No newline at end of file
@@ -0,0 +1,519 @@
+# benchmarks/bench_calls.py
+"""
+How many concurrent calls fit on one core? Simulate N calls in one worker
+process and measure.
+
+Each simulated call runs the real `agent.entrypoint.entrypoint` against a
+fake JobContext (dialling, ringing and pickup are timed sleeps). Its
+AgentSession is the real livekit-agents pipeline. The differences are:
+- Audio goes to a synthetic caller instead of a room. The caller streams
+  20ms frames in real time: silence while the agent talks, then a spoken
+  utterance.
+- STT, LLM and TTS are stubs whose latencies are drawn from lognormal
+  distributions (median / p95 configurable).
+- Agent audio is "played" in real time into a null sink.
+
+Per-turn latency is measured from the end of the caller's utterance to the
+first agent audio frame reaching the sink. Every call shares one event loop,
+like a worker running many jobs on one thread.
+
+For each N the report gives:
+- CPU time as cores used and per call;
+- RSS (current and peak);
+- event-loop lag (p50/p99/max);
+- turn latency (p50/p95/p99).
+It also gives calls per core at the largest N that met the latency and loop
+lag targets.
+
+Usage:
+    python -m benchmarks.bench_calls --calls 1,5,10,20,40 --turns 4
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import random
+import resource
+import time
+import uuid
+from types import SimpleNamespace
+
+# The simulation must not write greeting WAVs, timelines or transcripts
+os.environ.setdefault("GREETING_CACHE_DIR", "")
+os.environ.setdefault("CALL_TIMELINE_STORE", "false")
+os.environ.setdefault("TRANSCRIPT_STORE", "false")
+os.environ.setdefault("DIAL_MAX_RETRIES", "0")
+
+from livekit import rtc
+from livekit.agents import AgentSession, APIConnectOptions, llm, stt, tts
+from livekit.agents.voice import io
+
+import agent.entrypoint as entrypoint_module
+from agent.prewarm import Plugins
+from shared.sketch import LatencyHistogram
+
+SAMPLE_RATE = 16000
+TTS_SAMPLE_RATE = 24000
+FRAME_MS = 20
+SAMPLES_PER_FRAME = SAMPLE_RATE * FRAME_MS // 1000
+SPEECH_PCM = (b"\x10\x04" * SAMPLES_PER_FRAME)
+SILENCE_PCM = bytes(2 * SAMPLES_PER_FRAME)
+SPOKEN_SECONDS_PER_WORD = 0.3
+
+CALLER_LINES = [
+    "Hi, yes, I asked about the franchise.",
+    "What is the initial investment?",
+    "How long does it take to break even?",
+    "Do you help with finding a location?",
+    "What training do you provide?",
+    "Okay, can you send me the details by email?",
+]
+AGENT_REPLY = (
+    "Great question. Our franchise partners usually get started with a modest investment, "
+    "and we support you with training, marketing and choosing the right location."
+)
+
+_current_call = contextvars.ContextVar("current_call")
+
+
+class LatencyModel:
+    """Lognormal latency with a given median and 95th percentile (milliseconds)"""
+
+    def __init__(self, median_ms, p95_ms, rng):
+        self.mu = math.log(median_ms / 1000.0)
+        self.sigma = max(math.log(p95_ms / median_ms) / 1.645, 1e-6)
+        self.rng = rng
+
+    def sample(self):
+        return self.rng.lognormvariate(self.mu, self.sigma)
+
+
+# --- stub plugins ---------------------------------------------------------
+
+class StubSTT(stt.STT):
+    """Streaming STT that "recognizes" the caller's next scripted line after each utterance"""
+
+    def __init__(self, latency):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=True, interim_results=False))
+        self.latency = latency
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=None):
+        await asyncio.sleep(self.latency.sample())
+        return self._event(stt.SpeechEventType.FINAL_TRANSCRIPT, _current_call.get().next_line())
+
+    def stream(self, *, language=None, conn_options=APIConnectOptions()):
+        return StubSpeechStream(stt=self, conn_options=conn_options)
+
+    @staticmethod
+    def _event(kind, text=""):
+        alternatives = [stt.SpeechData(language="en", text=text)] if text else []
+        return stt.SpeechEvent(type=kind, alternatives=alternatives)
+
+
+class StubSpeechStream(stt.RecognizeStream):
+    async def _run(self):
+        call = _current_call.get()
+        in_speech = False
+        async for frame in self._input_ch:
+            if isinstance(frame, self._FlushSentinel):
+                continue
+            speaking = frame.data[0] != 0
+            if speaking and not in_speech:
+                in_speech = True
+                self._event_ch.send_nowait(StubSTT._event(stt.SpeechEventType.START_OF_SPEECH))
+            elif not speaking and in_speech:
+                in_speech = False
+                await asyncio.sleep(self._stt.latency.sample())
+                self._event_ch.send_nowait(
+                    StubSTT._event(stt.SpeechEventType.FINAL_TRANSCRIPT, call.next_line())
+                )
+                self._event_ch.send_nowait(StubSTT._event(stt.SpeechEventType.END_OF_SPEECH))
+
+
+class StubLLM(llm.LLM):
+    """Streams a canned reply after a sampled time to first token"""
+
+    def __init__(self, ttft, token_interval):
+        super().__init__()
+        self.ttft = ttft
+        self.token_interval = token_interval
+
+    def chat(self, *, chat_ctx, tools=None, conn_options=APIConnectOptions(), **kwargs):
+        return StubLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class StubLLMStream(llm.LLMStream):
+    async def _run(self):
+        request_id = uuid.uuid4().hex
+        await asyncio.sleep(self._llm.ttft.sample())
+        for word in AGENT_REPLY.split(" "):
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id, delta=llm.ChoiceDelta(role="assistant", content=word + " ")
+            ))
+            await asyncio.sleep(self._llm.token_interval)
+
+
+class StubTTS(tts.TTS):
+    """Returns silence as long as the text would take to say, after a sampled TTFB"""
+
+    def __init__(self, ttfb):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=TTS_SAMPLE_RATE, num_channels=1,
+        )
+        self.ttfb = ttfb
+
+    def synthesize(self, text, *, conn_options=APIConnectOptions()):
+        return StubChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class StubChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter):
+        await asyncio.sleep(self._tts.ttfb.sample())
+        output_emitter.initialize(
+            request_id=uuid.uuid4().hex, sample_rate=TTS_SAMPLE_RATE,
+            num_channels=1, mime_type="audio/pcm",
+        )
+        seconds = max(len(self.input_text.split()), 1) * SPOKEN_SECONDS_PER_WORD
+        chunk = bytes(2 * TTS_SAMPLE_RATE // 10)  # 100ms
+        for _ in range(int(seconds * 10)):
+            output_emitter.push(chunk)
+        output_emitter.flush()
+
+
+# --- simulated room audio ---------------------------------------------------
+
+class SyntheticCaller(io.AudioInput):
+    """Real-time 20ms caller frames: speech while `speaking_until` is ahead, else silence"""
+
+    def __init__(self):
+        super().__init__(label="synthetic-caller")
+        self.speaking_until = 0.0
+        self.speech_ended_at = None
+        self._next_frame_at = None
+
+    async def __anext__(self):
+        now = time.perf_counter()
+        if self._next_frame_at is None:
+            self._next_frame_at = now
+        delay = self._next_frame_at - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next_frame_at += FRAME_MS / 1000.0
+        speaking = time.perf_counter() < self.speaking_until
+        return rtc.AudioFrame(
+            data=SPEECH_PCM if speaking else SILENCE_PCM,
+            sample_rate=SAMPLE_RATE, num_channels=1, samples_per_channel=SAMPLES_PER_FRAME,
+        )
+
+    def say(self, seconds):
+        self.speaking_until = time.perf_counter() + seconds
+        self.speech_ended_at = self.speaking_until
+
+
+class NullSink(io.AudioOutput):
+    """Plays agent audio into the void in real time and notes when each segment starts"""
+
+    def __init__(self, call):
+        super().__init__(label="null-sink", capabilities=io.AudioOutputCapabilities(pause=False))
+        self._call = call
+        self._segment_started = None
+        self._pushed = 0.0
+        self._finish_timer = None
+
+    async def capture_frame(self, frame):
+        await super().capture_frame(frame)
+        if self._segment_started is None:
+            self._segment_started = time.perf_counter()
+            self._pushed = 0.0
+            self.on_playback_started(created_at=time.time())
+            self._call.on_agent_audio(self._segment_started)
+        self._pushed += frame.duration
+
+    def flush(self):
+        super().flush()
+        if self._segment_started is None:
+            return
+        remaining = self._segment_started + self._pushed - time.perf_counter()
+        position = self._pushed
+        self._segment_started = None
+        self._finish_timer = asyncio.get_running_loop().call_later(
+            max(remaining, 0.0), lambda: self.on_playback_finished(playback_position=position, interrupted=False)
+        )
+
+    def clear_buffer(self):
+        if self._finish_timer is not None:
+            self._finish_timer.cancel()
+            self._finish_timer = None
+        if self._segment_started is not None:
+            position = time.perf_counter() - self._segment_started
+            self._segment_started = None
+            self.on_playback_finished(playback_position=position, interrupted=True)
+
+
+class SimulatedSession(AgentSession):
+    """AgentSession wired to the synthetic caller and null sink instead of a room"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        call = _current_call.get()
+        call.session = self
+        self.input.audio = call.caller
+        self.output.audio = NullSink(call)
+
+    async def start(self, agent, **kwargs):
+        return await super().start(agent, record=False)
+
+
+# --- fake job context -------------------------------------------------------
+
+class FakeSIP:
+    def __init__(self, dial):
+        self.dial = dial
+
+    async def create_sip_participant(self, request):
+        await asyncio.sleep(self.dial.sample())
+        return SimpleNamespace(participant_identity=request.participant_identity)
+
+
+class FakeJobContext:
+    """Just enough of agents.JobContext for the entrypoint"""
+
+    def __init__(self, room_name, metadata, dial, ring):
+        self.job = SimpleNamespace(id=f"AJ_{room_name}", room=SimpleNamespace(name=room_name), metadata=metadata)
+        self.room = SimpleNamespace(name=room_name)
+        self.proc = SimpleNamespace(userdata={})
+        self.api = SimpleNamespace(sip=FakeSIP(dial))
+        self._ring = ring
+        self._shutdown_callbacks = []
+        self.shutdown_requested = False
+
+    async def connect(self):
+        await asyncio.sleep(0.01)
+
+    async def wait_for_participant(self, identity=None):
+        await asyncio.sleep(self._ring.sample())
+        return SimpleNamespace(identity=identity)
+
+    def add_shutdown_callback(self, callback):
+        self._shutdown_callbacks.append(callback)
+
+    def shutdown(self, reason=""):
+        self.shutdown_requested = True
+
+    async def run_shutdown_callbacks(self):
+        for callback in self._shutdown_callbacks:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+# --- one call ---------------------------------------------------------------
+
+class SimulatedCall:
+    def __init__(self, index, args, models, turn_latency):
+        self.index = index
+        self.args = args
+        self.models = models
+        self.turn_latency = turn_latency
+        self.caller = SyntheticCaller()
+        self.session = None
+        self.turns_done = 0
+        self.error = None
+        self._lines = iter(CALLER_LINES * (args.turns // len(CALLER_LINES) + 1))
+        self._agent_audio = asyncio.Event()
+
+    def next_line(self):
+        return next(self._lines)
+
+    def on_agent_audio(self, started_at):
+        ended = self.caller.speech_ended_at
+        if ended is not None and started_at > ended:
+            self.turn_latency.add(started_at - ended)
+            self.caller.speech_ended_at = None
+        self._agent_audio.set()
+
+    async def _agent_done_speaking(self, timeout):
+        """Wait for the agent to start and then finish a stretch of speech"""
+        await asyncio.wait_for(self._agent_audio.wait(), timeout)
+        self._agent_audio.clear()
+        while self.session.agent_state == "speaking" or self.session.current_speech is not None:
+            await asyncio.sleep(0.05)
+
+    async def run(self):
+        _current_call.set(self)
+        room_name = f"bench-{self.index}-{uuid.uuid4().hex[:6]}"
+        metadata = json.dumps({"phone_number": "+919800000000", "name": "Bench Caller", "query": "franchise"})
+        ctx = FakeJobContext(room_name, metadata, self.models["dial"], self.models["ring"])
+        try:
+            await entrypoint_module.entrypoint(ctx)
+            if self.session is None:
+                raise RuntimeError("entrypoint did not start a session")
+            await self._agent_done_speaking(timeout=30)  # greeting
+            for _ in range(self.args.turns):
+                await asyncio.sleep(self.args.think_time)
+                self.caller.say(self.args.utterance_seconds)
+                await asyncio.sleep(self.args.utterance_seconds)
+                await self._agent_done_speaking(timeout=30)
+                self.turns_done += 1
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            if self.session is not None:
+                await self.session.aclose()
+            await ctx.run_shutdown_callbacks()
+
+
+# --- measurement ------------------------------------------------------------
+
+def current_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+async def monitor_loop_lag(histogram, stop, interval=0.02):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        histogram.add(max(time.perf_counter() - expected, 0.0))
+
+
+def ms(value):
+    return round(value * 1000, 1) if value is not None else None
+
+
+async def run_step(n, args, rng):
+    models = {
+        "dial": LatencyModel(args.dial_ms, args.dial_ms * 2, rng),
+        "ring": LatencyModel(args.ring_ms, args.ring_ms * 2, rng),
+    }
+    turn_latency = LatencyHistogram()
+    loop_lag = LatencyHistogram()
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(loop_lag, stop))
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    calls = [SimulatedCall(i, args, models, turn_latency) for i in range(n)]
+    tasks = []
+    for call in calls:
+        tasks.append(asyncio.create_task(call.run()))
+        await asyncio.sleep(args.ramp_seconds / n)  # stagger call starts
+    rss_samples = []
+    while not all(task.done() for task in tasks):
+        rss_samples.append(current_rss_mb())
+        await asyncio.sleep(0.5)
+    await asyncio.gather(*tasks)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    stop.set()
+    await lag_task
+
+    cores = cpu / wall if wall else 0.0
+    errors = [call.error for call in calls if call.error]
+    return {
+        "calls": n,
+        "wall_s": round(wall, 2),
+        "cpu_cores_used": round(cores, 3),
+        "cpu_ms_per_call_second": round(cpu * 1000 / (n * wall), 2) if wall else None,
+        "calls_per_core": round(n / cores, 1) if cores else None,
+        "rss_mb": round(max(rss_samples, default=current_rss_mb()), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "loop_lag_ms": {"p50": ms(loop_lag.quantile(0.5)), "p99": ms(loop_lag.quantile(0.99)), "max": ms(loop_lag.max)},
+        "turn_latency_ms": {
+            "count": turn_latency.count,
+            "p50": ms(turn_latency.quantile(0.5)),
+            "p95": ms(turn_latency.quantile(0.95)),
+            "p99": ms(turn_latency.quantile(0.99)),
+        },
+        "turns_completed": sum(call.turns_done for call in calls),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    stt_latency = LatencyModel(args.stt_ms, args.stt_p95_ms, rng)
+    llm_ttft = LatencyModel(args.llm_ttft_ms, args.llm_ttft_p95_ms, rng)
+    tts_ttfb = LatencyModel(args.tts_ttfb_ms, args.tts_ttfb_p95_ms, rng)
+
+    def stub_plugins(ctx):
+        return Plugins(
+            stt=StubSTT(stt_latency),
+            llm=StubLLM(llm_ttft, args.token_ms / 1000.0),
+            tts=StubTTS(tts_ttfb),
+        )
+
+    entrypoint_module.borrow_plugins = stub_plugins
+    entrypoint_module.AgentSession = SimulatedSession
+
+    steps = []
+    for n in (int(value) for value in args.calls.split(",")):
+        steps.append(await run_step(n, args, rng))
+
+    meeting = [
+        step for step in steps
+        if not step["errors"]
+        and step["turn_latency_ms"]["p95"] is not None
+        and step["turn_latency_ms"]["p95"] <= args.slo_p95_ms
+        and step["loop_lag_ms"]["p99"] <= args.max_lag_ms
+    ]
+    best = max(meeting, key=lambda step: step["calls"], default=None)
+    return {
+        "config": {
+            "turns": args.turns,
+            "utterance_s": args.utterance_seconds,
+            "stt_ms": [args.stt_ms, args.stt_p95_ms],
+            "llm_ttft_ms": [args.llm_ttft_ms, args.llm_ttft_p95_ms],
+            "tts_ttfb_ms": [args.tts_ttfb_ms, args.tts_ttfb_p95_ms],
+            "slo_turn_p95_ms": args.slo_p95_ms,
+            "slo_loop_lag_p99_ms": args.max_lag_ms,
+        },
+        "steps": steps,
+        "max_calls_within_slo": best["calls"] if best else 0,
+        "calls_per_core_within_slo": best["calls_per_core"] if best else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", default="1,5,10,20", help="comma-separated concurrent call counts")
+    parser.add_argument("--turns", type=int, default=3, help="caller turns per call")
+    parser.add_argument("--utterance-seconds", type=float, default=1.5)
+    parser.add_argument("--think-time", type=float, default=0.5, help="pause before the caller speaks")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="spread call starts over this long")
+    parser.add_argument("--stt-ms", type=float, default=250.0, help="median STT final-transcript delay")
+    parser.add_argument("--stt-p95-ms", type=float, default=500.0)
+    parser.add_argument("--llm-ttft-ms", type=float, default=450.0, help="median LLM time to first token")
+    parser.add_argument("--llm-ttft-p95-ms", type=float, default=900.0)
+    parser.add_argument("--token-ms", type=float, default=15.0, help="LLM inter-token interval")
+    parser.add_argument("--tts-ttfb-ms", type=float, default=200.0, help="median TTS time to first byte")
+    parser.add_argument("--tts-ttfb-p95-ms", type=float, default=400.0)
+    parser.add_argument("--dial-ms", type=float, default=300.0)
+    parser.add_argument("--ring-ms", type=float, default=1000.0)
+    parser.add_argument("--slo-p95-ms", type=float, default=2500.0, help="turn latency p95 target")
+    parser.add_argument("--max-lag-ms", type=float, default=50.0, help="event-loop lag p99 target")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_ids.py
+"""
+Benchmark room name schemes: the cost of generating one, and bulk-insert
+throughput into `call_records`, whose UNIQUE room_name index they feed.
+
+Schemes:
+
+- legacy: "outbound-" + 10 random digits (the old generate_room_name);
+- ulid:   "outbound-" + a monotonic ULID (the current generate_room_name);
+- uuid4:  "outbound-" + a random UUID, for reference.
+
+Each insert run starts from a fresh SQLite database on disk, pre-filled
+with --existing rows, then inserts --rows more in --batch sized
+transactions, as the call record writer does. Random keys land on random
+pages of the room_name index, so the gap grows with the table size and
+once the index no longer fits in SQLite's page cache.
+
+Usage:
+    python -m benchmarks.bench_ids --rows 200000 --existing 500000
+    python -m benchmarks.bench_ids --schemes legacy,ulid --cache-kib 2000
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import string
+import tempfile
+import time
+import timeit
+import uuid
+
+# shared.database reads the settings at import time
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-ids-"), "unused.sqlite"))
+
+from sqlalchemy import create_engine, event, insert
+
+from shared.database import CallRecord
+from shared.ids import new_ulid
+
+
+def legacy_room_name(prefix="outbound"):
+    return f"{prefix}-{''.join(random.choice(string.digits) for _ in range(10))}"
+
+
+def ulid_room_name(prefix="outbound"):
+    return f"{prefix}-{new_ulid()}"
+
+
+def uuid4_room_name(prefix="outbound"):
+    return f"{prefix}-{uuid.uuid4()}"
+
+
+SCHEMES = {"legacy": legacy_room_name, "ulid": ulid_room_name, "uuid4": uuid4_room_name}
+
+
+def generation_cost(generate, number):
+    """Best of 5 runs, in microseconds per ID"""
+    return round(min(timeit.repeat(generate, number=number, repeat=5)) / number * 1e6, 3)
+
+
+def make_engine(path, cache_kib):
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def configure(conn, _):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{cache_kib}")
+
+    CallRecord.__table__.create(engine)
+    return engine
+
+
+def insert_rows(engine, generate, rows, batch):
+    """Insert `rows` calls in transactions of `batch`; returns (seconds, unique violations)"""
+    now = datetime.datetime.utcnow()
+    stmt = insert(CallRecord.__table__).prefix_with("OR IGNORE")
+    conflicts = 0
+    elapsed = 0.0
+    for offset in range(0, rows, batch):
+        values = [
+            {"room_name": generate(), "customer_name": "Bench", "customer_phone": "+919000000000",
+             "status": "pending", "created_at": now}
+            for _ in range(min(batch, rows - offset))
+        ]
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            inserted = conn.execute(stmt, values).rowcount
+        elapsed += time.perf_counter() - start
+        conflicts += len(values) - inserted
+    return elapsed, conflicts
+
+
+def run_scheme(name, args, scratch):
+    generate = SCHEMES[name]
+    path = os.path.join(scratch, f"{name}.sqlite")
+    engine = make_engine(path, args.cache_kib)
+    try:
+        if args.existing:
+            insert_rows(engine, generate, args.existing, 10000)
+        seconds, conflicts = insert_rows(engine, generate, args.rows, args.batch)
+    finally:
+        engine.dispose()
+    return {
+        "generate_us": generation_cost(generate, args.generate),
+        "insert_rows_per_s": round(args.rows / seconds, 1),
+        "insert_seconds": round(seconds, 3),
+        "unique_violations": conflicts,
+        "db_mib": round(os.path.getsize(path) / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schemes", default="legacy,ulid,uuid4")
+    parser.add_argument("--rows", type=int, default=100000, help="rows inserted and timed")
+    parser.add_argument("--existing", type=int, default=200000, help="rows already in the table")
+    parser.add_argument("--batch", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--cache-kib", type=int, default=2000, help="SQLite page cache size")
+    parser.add_argument("--generate", type=int, default=100000, help="IDs per generation timing run")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench-ids-")
+    report = {"rows": args.rows, "existing": args.existing, "batch": args.batch, "schemes": {}}
+    for name in args.schemes.split(","):
+        report["schemes"][name] = run_scheme(name.strip(), args, scratch)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_response_cache.py
+"""
+Benchmark the agent's LLM response cache with a stub LLM: time to first
+chunk for cached and uncached answers, and the hit rate for a question mix.
+
+Simulated calls each ask one opening question, drawn from a pool of topics
+with a skewed (Zipf) popularity and spoken in one of several wordings
+(fillers, case and punctuation that normalisation should absorb). The stub
+LLM waits --llm-latency before streaming its answer word by word, the way
+a real model's first token arrives. Calls are split over --processes
+ResponseCache instances on one SQLite file, as worker processes on a host
+share it.
+
+Usage:
+    python -m benchmarks.bench_response_cache --calls 2000
+    python -m benchmarks.bench_response_cache --similarity 0.6 --processes 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import percentile
+from agent.response_cache import (
+    ResponseCache, TokenSimilarityIndex, cached_llm_stream, normalize_question, prompt_hash
+)
+
+WORDINGS = ("{q}?", "Um, {q}?", "{Q}!", "okay so {q}", "hi, {q} please", "{q}, actually")
+
+
+def stub_llm(answer, latency):
+    async def generate():
+        await asyncio.sleep(latency)
+        for word in answer.split(" "):
+            yield word + " "
+    return generate
+
+
+async def one_call(cache, scope, question, answer, latency):
+    start = time.perf_counter()
+    first = None
+    stream = cached_llm_stream(cache, scope, normalize_question(question), stub_llm(answer, latency),
+                               name="Caller", phone="+919000000000")
+    async for _ in stream:
+        if first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+async def run(args, path):
+    rng = random.Random(args.seed)
+    caches = [
+        ResponseCache(path=path, ttl=args.ttl, max_entries=args.max_entries,
+                      similarity=TokenSimilarityIndex(args.similarity) if args.similarity else None)
+        for _ in range(args.processes)
+    ]
+    scope = prompt_hash("instructions", "model", "")
+    topics = [f"what does plan number {i} cost per month" for i in range(args.topics)]
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(args.topics)]
+
+    hits, misses = [], []
+    for call in range(args.calls):
+        topic = rng.choices(range(args.topics), weights)[0]
+        question = rng.choice(WORDINGS).format(q=topics[topic], Q=topics[topic].upper())
+        cache = caches[call % args.processes]
+        before = cache.stats["misses"]
+        first = await one_call(cache, scope, question, f"Plan {topic} costs {topic * 10} a month.", args.llm_latency)
+        (misses if cache.stats["misses"] > before else hits).append(first)
+        if call % args.processes == args.processes - 1:
+            # Let the background writes land, as they would between calls
+            await asyncio.gather(*(cache.drain() for cache in caches))
+
+    stats = {key: sum(cache.stats[key] for cache in caches) for key in caches[0].stats}
+    report = {"calls": args.calls, "topics": args.topics, "processes": args.processes,
+              "hit_rate": round(len(hits) / args.calls, 4), "cache": stats}
+    for label, values in (("hit", hits), ("miss", misses)):
+        values.sort()
+        report[f"{label}_first_chunk_ms"] = {
+            "count": len(values),
+            "p50": round(percentile(values, 50) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--topics", type=int, default=50, help="distinct questions")
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew of the topics")
+    parser.add_argument("--processes", type=int, default=2, help="cache instances sharing the disk store")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM time to first token (s)")
+    parser.add_argument("--similarity", type=float, default=0.0, help="similarity threshold (0: exact only)")
+    parser.add_argument("--max-entries", type=int, default=512)
+    parser.add_argument("--ttl", type=float, default=86400.0)
+    parser.add_argument("--memory", action="store_true", help="no disk store")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    path = None if args.memory else os.path.join(tempfile.mkdtemp(prefix="response-cache-"), "responses.sqlite")
+    print(json.dumps(asyncio.run(run(args, path)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
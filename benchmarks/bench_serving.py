@@ -0,0 +1,151 @@
+# benchmarks/bench_serving.py
+"""
+Compare web serving modes under the same open-loop load: Flask's
+single-process development server against gunicorn with 1..N workers.
+
+Each configuration runs `main.py` as a separate process (WEB_SERVER=dev or
+WEB_SERVER=gunicorn with WEB_WORKERS=n) on a scratch database, pointed at a
+fake LiveKit API (benchmarks.fake_livekit) so nothing leaves the machine.
+Once /health answers, benchmarks.loadgen drives POST /submit (or
+/submit/bulk) at the target rate, then the server gets SIGTERM and must exit
+within the drain timeout. Trunk limits are disabled so admission control
+does not cap the result.
+
+Prints one JSON document with a row per configuration: throughput, latency
+percentiles, error rate and how long the graceful shutdown took.
+
+Usage:
+    python -m benchmarks.bench_serving --rate 200 --duration 20
+    python -m benchmarks.bench_serving --configs dev,gunicorn:2,gunicorn:4,gunicorn:8 --rate 400
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.fake_livekit import FakeLiveKitServer, start_in_thread
+from benchmarks.loadgen import run_load, BULK_TOKEN
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(server, workers, port, livekit_url, scratch, threads):
+    env = dict(os.environ)
+    env.update({
+        "NODE_ENV": "production",  # no debugger or reloader on the dev server
+        "WEB_SERVER": server,
+        "WEB_WORKERS": str(workers),
+        "WEB_THREADS": str(threads),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "LIVEKIT_URL": livekit_url,
+        "LIVEKIT_API_KEY": "loadtest",
+        "LIVEKIT_API_SECRET": "loadtest-secret-loadtest-secret-00",
+        "DB_PATH": os.path.join(scratch, "calls.sqlite"),
+        "TRUNK_CALLS_PER_SECOND": "0",
+        "TRUNK_MAX_CONCURRENT_CALLS": "0",
+        "BULK_API_TOKEN": os.environ.get("BULK_API_TOKEN", BULK_TOKEN),
+        "LOG_LEVEL": "warning",
+    })
+    return env
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode} during startup")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not answer /health in time")
+
+
+def run_config(config, args, livekit_url):
+    server, _, workers = config.partition(":")
+    workers = int(workers or 1)
+    port = free_port()
+    scratch = tempfile.mkdtemp(prefix=f"bench-serving-{server}-")
+    process = subprocess.Popen(
+        [sys.executable, MAIN], cwd=scratch,
+        env=server_env(server, workers, port, livekit_url, scratch, args.threads),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port, process)
+        report = asyncio.run(run_load(
+            f"http://127.0.0.1:{port}", args.target, args.rate, args.duration,
+            args.bulk_size, args.max_in_flight, args.timeout, args.seed,
+        ))
+    finally:
+        stopping = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(args.drain_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        drain_s = time.perf_counter() - stopping
+
+    return {
+        "config": config,
+        "workers": workers,
+        "throughput_rps": report["throughput_rps"],
+        "latency_ms": report["latency_ms"],
+        "error_rate": report["error_rate"],
+        "status_codes": report["status_codes"],
+        "shutdown_s": round(drain_s, 2),
+        "exit_status": process.returncode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", default="dev,gunicorn:1,gunicorn:2,gunicorn:4",
+                        help="comma-separated: dev, or gunicorn:<workers>")
+    parser.add_argument("--target", choices=("submit", "bulk"), default="submit")
+    parser.add_argument("--rate", type=float, default=100.0, help="requests started per second")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of load per configuration")
+    parser.add_argument("--bulk-size", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8, help="WEB_THREADS per gunicorn worker")
+    parser.add_argument("--max-in-flight", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="seconds allowed for shutdown")
+    parser.add_argument("--lk-latency-ms", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeLiveKitServer(latency_ms=args.lk_latency_ms, jitter_ms=args.lk_latency_ms / 4, seed=args.seed)
+    livekit_url, stop_fake = start_in_thread(fake)
+    try:
+        results = [run_config(config, args, livekit_url) for config in args.configs.split(",")]
+    finally:
+        stop_fake()
+
+    print(json.dumps({
+        "target": args.target,
+        "target_rate": args.rate,
+        "duration_s": args.duration,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
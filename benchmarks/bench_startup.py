@@ -0,0 +1,93 @@
+# benchmarks/bench_startup.py
+"""
+Benchmark process startup: how long a fresh interpreter takes to import each
+service and answer its first request, and which imports that time goes to.
+
+Each target runs in a new subprocess (as an autoscaled container or a new
+agent job process would) on a scratch database, several times, and the wall
+time from spawn to exit is reported with the bare interpreter's startup
+subtracted. One extra run per target uses `python -X importtime` to list the
+modules with the largest cumulative import time.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --targets web --top 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# name -> code run in the child process
+TARGETS = {
+    "settings": "import shared.config",
+    "web": "from web.app import app; app.test_client().get('/health')",
+    "agent": "import agent.entrypoint",
+}
+
+
+def child_env(scratch):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    env.setdefault("DB_PATH", os.path.join(scratch, "calls.sqlite"))
+    env.setdefault("LOG_QUEUE", "false")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def time_run(code, env, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def slowest_imports(code, env, cwd, top):
+    """Modules with the largest cumulative import time, from `python -X importtime`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, cwd=cwd,
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seen = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        if name not in seen:
+            seen[name] = {"module": name, "cumulative_ms": int(cumulative_us) / 1000, "self_ms": int(self_us) / 1000}
+    return sorted(seen.values(), key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per target")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"comma-separated: {', '.join(TARGETS)}")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per target")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench-startup-")
+    env = child_env(scratch)
+    baseline = statistics.median(time_run("pass", env, scratch) for _ in range(args.runs))
+
+    results = []
+    for name in args.targets.split(","):
+        code = TARGETS[name]
+        time_run(code, env, scratch)  # first run creates the database and warms the OS file cache
+        samples = sorted(time_run(code, env, scratch) for _ in range(args.runs))
+        results.append({
+            "target": name,
+            "runs": args.runs,
+            "median_ms": round((statistics.median(samples) - baseline) * 1000, 1),
+            "min_ms": round((samples[0] - baseline) * 1000, 1),
+            "max_ms": round((samples[-1] - baseline) * 1000, 1),
+            "slowest_imports": slowest_imports(code, env, scratch, args.top),
+        })
+
+    print(json.dumps({"interpreter_ms": round(baseline * 1000, 1), "targets": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_submit.py
+"""
+Benchmark POST /submit under concurrent load for each dispatch loop mode.
+
+The LiveKit API client is replaced by an in-process fake that charges a
+connection setup cost the first time a client is used (TCP + TLS handshake)
+and a round-trip latency on every call, so the difference between reusing one
+client on a persistent loop and building a new loop and client per request
+shows up the same way it does against LiveKit cloud.
+
+Usage:
+    python -m benchmarks.bench_submit --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+# Measure the dispatch path itself, not the trunk limits in front of it
+os.environ.setdefault("TRUNK_CALLS_PER_SECOND", "0")
+os.environ.setdefault("TRUNK_MAX_CONCURRENT_CALLS", "0")
+
+import web.routes as routes
+from web.app import create_app
+from benchmarks import percentile
+
+
+class FakeLiveKitAPI:
+    """Stand-in for livekit.api.LiveKitAPI with connection setup and RTT costs"""
+
+    connect_latency = 0.030
+    rtt = 0.010
+
+    def __init__(self, url=None, api_key=None, api_secret=None):
+        self._connected = False
+        self.agent_dispatch = self
+
+    async def create_dispatch(self, request):
+        if not self._connected:
+            await asyncio.sleep(self.connect_latency)
+            self._connected = True
+        await asyncio.sleep(self.rtt)
+        return SimpleNamespace(id=f"AD_{uuid.uuid4().hex[:12]}")
+
+    async def aclose(self):
+        self._connected = False
+
+
+def run_mode(app, mode, total_requests, concurrency):
+    """Drive /submit from `concurrency` threads and collect per-request latency"""
+    routes.DISPATCH_LOOP_MODE = mode
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+    mode_offset = len(mode) * 10 ** 6  # keep numbers unique across modes
+
+    def worker():
+        nonlocal errors
+        client = app.test_client()
+        while True:
+            with lock:
+                index = next(counter, None)
+                if index is None:
+                    return
+            start = time.perf_counter()
+            response = client.post('/submit', data={
+                'name': 'Bench User',
+                # A new number per request, so duplicate-dial suppression never kicks in
+                'phone': f'+9198{mode_offset + index:08d}',
+                'email': 'bench@example.com',
+                'query': 'pricing',
+            })
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--connect-ms", type=float, default=30.0, help="simulated connection setup cost")
+    parser.add_argument("--rtt-ms", type=float, default=10.0, help="simulated LiveKit API round trip")
+    parser.add_argument("--modes", default="per_request,persistent")
+    args = parser.parse_args()
+
+    FakeLiveKitAPI.connect_latency = args.connect_ms / 1000.0
+    FakeLiveKitAPI.rtt = args.rtt_ms / 1000.0
+    routes._new_livekit_client = FakeLiveKitAPI
+
+    app = create_app()
+    results = [run_mode(app, mode, args.requests, args.concurrency) for mode in args.modes.split(",")]
+    routes.cleanup_on_exit()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
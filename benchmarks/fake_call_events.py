@@ -0,0 +1,239 @@
+# benchmarks/fake_call_events.py
+"""
+Local stand-in for the call lifecycle events LiveKit and the agent send to
+the web service, for tests that must not place real calls.
+
+For every simulated call it produces the events a real one would:
+
+- answered call: agent `answered`, agent `hangup`, LiveKit `participant_left`
+  for the SIP participant, LiveKit `room_finished`;
+- failed call: agent `sip_failed` with a SIP status, LiveKit `room_finished`.
+
+LiveKit webhooks are signed exactly as LiveKit signs them (a JWT from the
+API key and secret carrying the body's sha256), agent events with the
+CALL_EVENTS_SECRET HMAC, so the real verification paths are exercised.
+Events are posted open-loop at the target rate, shuffled across calls (the
+ingestor does not depend on arrival order).
+
+By default the web app is started in this process on a scratch database
+seeded with a pending call record per simulated call; after the run the
+records are checked for the expected status and duration. Pass --url to
+send to an already running web service instead (its records are not checked).
+
+Usage:
+    python -m benchmarks.fake_call_events --calls 2000 --rate 2000
+    python -m benchmarks.fake_call_events --url http://127.0.0.1:8080 --calls 500 --rate 200
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import aiohttp
+
+from benchmarks import percentile
+
+API_KEY = "loadtest"
+API_SECRET = "loadtest-secret-loadtest-secret-00"
+FAILURE_SIP_STATUSES = (486, 480, 503, 603)
+
+
+class CallEventEmitter:
+    """Builds signed LiveKit webhook and agent event requests"""
+
+    def __init__(self, api_key=API_KEY, api_secret=API_SECRET, events_secret=API_SECRET):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.events_secret = events_secret
+
+    def webhook(self, event, room_name, at, sip=True):
+        """(path, body, headers) for a LiveKit webhook"""
+        from livekit.api import AccessToken
+
+        payload = {"event": event, "room": {"name": room_name}, "createdAt": str(int(at)), "id": f"EV_{room_name}_{event}"}
+        if event.startswith("participant_"):
+            payload["participant"] = {"identity": "customer", "kind": "SIP" if sip else "STANDARD"}
+        body = json.dumps(payload).encode()
+        digest = base64.b64encode(hashlib.sha256(body).digest()).decode()
+        token = AccessToken(self.api_key, self.api_secret).with_sha256(digest).to_jwt()
+        return "/events/livekit", body, {"Content-Type": "application/webhook+json", "Authorization": token}
+
+    def agent_event(self, kind, room_name, at, **fields):
+        """(path, body, headers) for an event posted by the agent"""
+        # Imported here: importing `shared` reads the settings, which
+        # start_local_stack has to set first
+        from shared.call_events import sign
+
+        body = json.dumps({"room_name": room_name, "event": kind, "at": at, **fields}).encode()
+        return "/events/agent", body, {"Content-Type": "application/json", **sign(self.events_secret, body)}
+
+    def call(self, room_name, rng, answer_rate, now):
+        """The requests for one simulated call, and the outcome it should leave"""
+        from shared.call_events import ANSWERED, SIP_FAILED, HANGUP
+
+        started = now - rng.uniform(60, 600)
+        if rng.random() < answer_rate:
+            duration = round(rng.uniform(5, 300), 3)
+            ended = started + duration
+            requests = [
+                self.agent_event(ANSWERED, room_name, started),
+                self.agent_event(HANGUP, room_name, ended),
+                self.webhook("participant_left", room_name, ended),
+                self.webhook("room_finished", room_name, ended + 1),
+            ]
+            return requests, ("completed", duration)
+        status = rng.choice(FAILURE_SIP_STATUSES)
+        requests = [
+            self.agent_event(SIP_FAILED, room_name, started + 20, sip_status=status),
+            self.webhook("room_finished", room_name, started + 21),
+        ]
+        return requests, ("failed", None)
+
+
+async def send_events(base_url, requests, rate, max_in_flight, timeout):
+    latencies = []
+    statuses = Counter()
+    in_flight = set()
+
+    async def one(path, body, headers, scheduled):
+        try:
+            async with session.post(f"{base_url}{path}", data=body, headers=headers) as response:
+                await response.read()
+                statuses[str(response.status)] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+        for index, (path, body, headers) in enumerate(requests):
+            scheduled = start + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(one(path, body, headers, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    return {
+        "events": len(latencies),
+        "target_rate": rate,
+        "throughput_eps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "status_codes": dict(statuses),
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+    }
+
+
+def start_local_stack(room_names):
+    """Start the web app in this process with a pending record per room; returns (base_url, app, stop)"""
+    # Settings are read at import time, so they must be in place before web.app loads
+    scratch = tempfile.mkdtemp(prefix="call-events-")
+    os.environ.setdefault("LIVEKIT_API_KEY", API_KEY)
+    os.environ.setdefault("LIVEKIT_API_SECRET", API_SECRET)
+    os.environ.setdefault("DB_PATH", os.path.join(scratch, "calls.sqlite"))
+    os.environ.setdefault("LOG_LEVEL", "warning")
+
+    from werkzeug.serving import make_server
+    import web.routes as routes
+    from web.app import app
+    from web.call_writer import call_writer
+
+    # Through the write-behind queue, as dispatched calls are recorded
+    for room_name in room_names:
+        call_writer.record(room_name=room_name, customer_name="Event Test", customer_phone="+919000000000")
+    call_writer.stop()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="call-events-web", daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        routes.cleanup_on_exit()
+
+    return f"http://127.0.0.1:{server.server_port}", app, stop
+
+
+def check_records(app, expected):
+    """Compare the stored status and duration of each call with what its events imply"""
+    from shared.database import db, CallRecord
+
+    mismatched = Counter()
+    with app.app_context():
+        rows = db.session.query(CallRecord.room_name, CallRecord.status, CallRecord.duration).all()
+    for room_name, status, duration in rows:
+        want_status, want_duration = expected[room_name]
+        if status != want_status:
+            mismatched["status"] += 1
+        # LiveKit webhook times have one-second resolution
+        elif want_duration is not None and (duration is None or abs(duration - want_duration) > 1.0):
+            mismatched["duration"] += 1
+    return {"records": len(rows), "mismatched": dict(mismatched)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running web service (default: start one in-process)")
+    parser.add_argument("--calls", type=int, default=1000, help="simulated calls")
+    parser.add_argument("--rate", type=float, default=1000.0, help="events posted per second")
+    parser.add_argument("--answer-rate", type=float, default=0.7, help="fraction of calls that are answered")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--api-key", default=os.environ.get("LIVEKIT_API_KEY", API_KEY))
+    parser.add_argument("--api-secret", default=os.environ.get("LIVEKIT_API_SECRET", API_SECRET))
+    parser.add_argument("--events-secret", default=os.environ.get("CALL_EVENTS_SECRET"),
+                        help="CALL_EVENTS_SECRET (default: the API secret)")
+    args = parser.parse_args()
+
+    app = stop = None
+    base_url = args.url
+    room_names = [f"call-events-{args.seed or 0}-{i}" for i in range(args.calls)]
+    if base_url is None:
+        base_url, app, stop = start_local_stack(room_names)
+
+    rng = random.Random(args.seed)
+    emitter = CallEventEmitter(args.api_key, args.api_secret, args.events_secret or args.api_secret)
+    requests, expected = [], {}
+    now = time.time()
+    for room_name in room_names:
+        call_requests, expected[room_name] = emitter.call(room_name, rng, args.answer_rate, now)
+        requests.extend(call_requests)
+    rng.shuffle(requests)
+
+    try:
+        report = asyncio.run(send_events(base_url.rstrip("/"), requests, args.rate, args.max_in_flight, args.timeout))
+    finally:
+        if stop is not None:
+            stop()
+
+    report["calls"] = args.calls
+    if app is not None:
+        from web.call_events import call_events
+        report["ingestor"] = dict(call_events.stats)
+        report["records"] = check_records(app, expected)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/fake_livekit.py
+"""
+Local stand-in for the LiveKit server API, for load tests that must not touch
+LiveKit cloud.
+
+Serves the Twirp endpoint the web tier uses,
+AgentDispatchService/CreateDispatch, over real HTTP, so the LiveKitAPI client,
+its connection pool and protobuf encoding are all exercised. Every response is
+delayed by a configurable latency, and a configurable fraction of requests
+fails with a Twirp error. Any other Twirp method answers `bad_route`.
+GET /stats returns the request counters as JSON.
+
+Usage:
+    python -m benchmarks.fake_livekit --port 7880 --latency-ms 40 --jitter-ms 20 --error-rate 0.01
+
+then run the web service with LIVEKIT_URL=http://127.0.0.1:7880.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import uuid
+from collections import Counter
+
+from aiohttp import web
+from livekit.protocol import agent_dispatch
+
+TWIRP_PREFIX = "/twirp/livekit."
+
+
+class FakeLiveKitServer:
+    """aiohttp application answering LiveKit Twirp calls with injected latency and errors"""
+
+    def __init__(self, latency_ms=40.0, jitter_ms=0.0, error_rate=0.0,
+                 error_status=503, error_code="unavailable", seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_code = error_code
+        self.stats = Counter()
+        self._random = random.Random(seed)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/twirp/{method:.*}", self.handle_twirp)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    def _delay(self):
+        delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(delay, 0.0) / 1000.0
+
+    async def handle_twirp(self, request):
+        path = request.path[len(TWIRP_PREFIX):] if request.path.startswith(TWIRP_PREFIX) else ""
+        body = await request.read()
+        self.stats["requests"] += 1
+        await asyncio.sleep(self._delay())
+
+        if path != "AgentDispatchService/CreateDispatch":
+            self.stats["bad_route"] += 1
+            return self._twirp_error(404, "bad_route", f"no handler for {request.path}")
+
+        if self._random.random() < self.error_rate:
+            self.stats["injected_errors"] += 1
+            return self._twirp_error(self.error_status, self.error_code, "injected failure")
+
+        req = agent_dispatch.CreateAgentDispatchRequest.FromString(body)
+        dispatch = agent_dispatch.AgentDispatch(
+            id=f"AD_{uuid.uuid4().hex[:12]}",
+            agent_name=req.agent_name,
+            room=req.room,
+            metadata=req.metadata,
+        )
+        self.stats["dispatches"] += 1
+        return web.Response(body=dispatch.SerializeToString(), content_type="application/protobuf")
+
+    async def handle_stats(self, request):
+        return web.json_response(dict(self.stats))
+
+    @staticmethod
+    def _twirp_error(status, code, message):
+        return web.json_response({"code": code, "msg": message}, status=status)
+
+
+def start_in_thread(server, host="127.0.0.1", port=0):
+    """Serve `server` on a daemon thread; returns (base_url, stop)"""
+    ready = threading.Event()
+    state = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(server.app(), access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, host, port)
+        loop.run_until_complete(site.start())
+        state["port"] = runner.addresses[0][1]
+        state["loop"] = loop
+        state["runner"] = runner
+        ready.set()
+        loop.run_forever()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+    thread = threading.Thread(target=run, name="fake-livekit", daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        state["loop"].call_soon_threadsafe(state["loop"].stop)
+        thread.join(5)
+
+    return f"http://{host}:{state['port']}", stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7880)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of dispatches that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--error-code", default="unavailable", help="Twirp code of injected failures")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeLiveKitServer(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        error_status=args.error_status, error_code=args.error_code, seed=args.seed,
+    )
+    web.run_app(server.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
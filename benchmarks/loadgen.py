@@ -0,0 +1,239 @@
+# benchmarks/loadgen.py
+"""
+Open-loop load generator for POST /submit and POST /submit/bulk.
+
+Requests are started on a fixed schedule at the target rate whether or not
+earlier ones have finished, and latency is measured from the scheduled start,
+so a slow server shows up as latency instead of as a lower request rate
+(no coordinated omission). Every request uses a fresh phone number, so
+duplicate-dial suppression never short-circuits it.
+
+By default the web app and a fake LiveKit API (benchmarks.fake_livekit) are
+started in this process on a scratch database, and nothing leaves the machine.
+Pass --url to load an already running web service instead.
+
+Prints one JSON document with throughput, p50/p95/p99 latency, status codes
+and error rates. Exits with status 1 when --max-p99-ms or --max-error-rate
+is exceeded, so it can gate a deployment.
+
+Usage:
+    python -m benchmarks.loadgen --rate 50 --duration 30
+    python -m benchmarks.loadgen --target bulk --bulk-size 100 --rate 2 --duration 30
+    python -m benchmarks.loadgen --url http://staging:8080 --rate 20 --duration 60 --max-p99-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import aiohttp
+
+from benchmarks import percentile
+
+# BULK_API_TOKEN of the web app started by start_local_stack
+BULK_TOKEN = "loadtest-bulk-token"
+
+
+def random_phone(rng):
+    """A valid, random Indian mobile number in E.164"""
+    return f"+919{rng.randrange(10 ** 9):09d}"
+
+
+def lead(rng, index):
+    return {
+        "name": f"Load Test {index}",
+        "phone": random_phone(rng),
+        "email": f"load{index}@example.com",
+        "query": "franchise pricing",
+    }
+
+
+async def send_submit(session, base_url, rng, index):
+    async with session.post(f"{base_url}/submit", data=lead(rng, index)) as response:
+        await response.read()
+        return response.status, 0, 0
+
+
+async def send_bulk(session, base_url, rng, index, bulk_size):
+    leads = [lead(rng, index * bulk_size + i) for i in range(bulk_size)]
+    succeeded = failed = 0
+    headers = {"Authorization": f"Bearer {os.environ.get('BULK_API_TOKEN', BULK_TOKEN)}"}
+    async with session.post(f"{base_url}/submit/bulk", json=leads, headers=headers) as response:
+        async for line in response.content:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if "summary" in result:
+                continue
+            if result.get("success"):
+                succeeded += 1
+            else:
+                failed += 1
+        return response.status, succeeded, failed
+
+
+async def run_load(base_url, target, rate, duration, bulk_size, max_in_flight, timeout, seed):
+    rng = random.Random(seed)
+    latencies = []
+    statuses = Counter()
+    leads = Counter()
+    dropped = 0
+    in_flight = set()
+
+    async def one(index, scheduled):
+        try:
+            if target == "bulk":
+                status, ok, failed = await send_bulk(session, base_url, rng, index, bulk_size)
+            else:
+                status, ok, failed = await send_submit(session, base_url, rng, index)
+            statuses[str(status)] += 1
+            leads["succeeded"] += ok
+            leads["failed"] += failed
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        total = int(rate * duration)
+        start = time.perf_counter()
+        for index in range(total):
+            scheduled = start + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                dropped += 1  # the client, not the server, is the bottleneck
+                continue
+            task = asyncio.create_task(one(index, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    completed = len(latencies)
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    report = {
+        "target": target,
+        "target_rate": rate,
+        "duration_s": duration,
+        "requests": completed,
+        "dropped_by_client": dropped,
+        "throughput_rps": round(completed / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "status_codes": dict(statuses),
+        "error_rate": round(errors / completed, 4) if completed else 0.0,
+    }
+    if target == "bulk":
+        total_leads = leads["succeeded"] + leads["failed"]
+        report["bulk_size"] = bulk_size
+        report["leads"] = dict(leads)
+        report["lead_error_rate"] = round(leads["failed"] / total_leads, 4) if total_leads else 0.0
+    return report
+
+
+def start_local_stack(args):
+    """Start the fake LiveKit API and the web app in this process; returns (base_url, stop)"""
+    from benchmarks.fake_livekit import FakeLiveKitServer, start_in_thread
+
+    fake = FakeLiveKitServer(
+        latency_ms=args.lk_latency_ms, jitter_ms=args.lk_jitter_ms,
+        error_rate=args.lk_error_rate, seed=args.seed,
+    )
+    livekit_url, stop_fake = start_in_thread(fake)
+
+    # Settings are read at import time, so they must be in place before web.app loads
+    scratch = tempfile.mkdtemp(prefix="loadgen-")
+    os.environ["LIVEKIT_URL"] = livekit_url
+    os.environ.setdefault("LIVEKIT_API_KEY", "loadtest")
+    os.environ.setdefault("LIVEKIT_API_SECRET", "loadtest-secret-loadtest-secret-00")
+    os.environ.setdefault("DB_PATH", os.path.join(scratch, "calls.sqlite"))
+    os.environ.setdefault("TRUNK_CALLS_PER_SECOND", "0")
+    os.environ.setdefault("TRUNK_MAX_CONCURRENT_CALLS", "0")
+    os.environ.setdefault("BULK_API_TOKEN", BULK_TOKEN)
+
+    from werkzeug.serving import make_server
+    import web.routes as routes
+    from web.app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="loadgen-web", daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        routes.cleanup_on_exit()
+        stop_fake()
+        args.fake_stats = dict(fake.stats)
+
+    return f"http://127.0.0.1:{server.server_port}", stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running web service (default: start one in-process)")
+    parser.add_argument("--target", choices=("submit", "bulk"), default="submit")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests started per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--bulk-size", type=int, default=50, help="leads per bulk request")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--lk-latency-ms", type=float, default=40.0, help="fake LiveKit API latency")
+    parser.add_argument("--lk-jitter-ms", type=float, default=10.0, help="fake LiveKit API jitter")
+    parser.add_argument("--lk-error-rate", type=float, default=0.0, help="fake LiveKit API failure rate")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="fail if p99 latency exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="fail if the error rate exceeds this")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    stop = None
+    base_url = args.url
+    if base_url is None:
+        base_url, stop = start_local_stack(args)
+    try:
+        report = asyncio.run(run_load(
+            base_url.rstrip("/"), args.target, args.rate, args.duration,
+            args.bulk_size, args.max_in_flight, args.timeout, args.seed,
+        ))
+    finally:
+        if stop is not None:
+            stop()
+    if getattr(args, "fake_stats", None):
+        report["fake_livekit"] = args.fake_stats
+
+    failures = []
+    if args.max_p99_ms is not None and report["latency_ms"]["p99"] > args.max_p99_ms:
+        failures.append(f"p99 {report['latency_ms']['p99']}ms > {args.max_p99_ms}ms")
+    error_rate = max(report["error_rate"], report.get("lead_error_rate", 0.0))
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        failures.append(f"error rate {error_rate} > {args.max_error_rate}")
+    report["passed"] = not failures
+    if failures:
+        report["failures"] = failures
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 # main.py
 import os
-import logging
-from agent import setup_logging
 from shared.config import IS_PRODUCTION, PORT, HOST
+from shared.logging_config import configure_logging
+from web.config import WEB_SERVER
 
-logger = setup_logging(level=logging.INFO if IS_PRODUCTION else logging.DEBUG)
+logger = configure_logging("web", logger_name="")
 
 if __name__ == "__main__":
-    from web.app import app
     logger.info(f"Starting FRAN-TIGER call agent service on {HOST}:{PORT}")
-    app.run(host=HOST, port=PORT, debug=not IS_PRODUCTION)
\ No newline at end of file
+    if WEB_SERVER == "gunicorn":
+        from web.server import serve
+        serve()
+    else:
+        from web.app import app
+        from web.routes import install_signal_handlers
+        install_signal_handlers()
+        app.run(host=HOST, port=PORT, debug=not IS_PRODUCTION)
\ No newline at end of file
@@ -1,8 +1,12 @@
 # shared/__init__.py
 from .config import ENV, IS_PRODUCTION, LOG_LEVEL, PORT, HOST
-from .prompts import get_time_greeting, get_welcome_message, get_agent_instructions
+from .prompts import (
+    TIME_GREETINGS, get_time_greeting, get_welcome_message, get_welcome_message_parts,
+    get_agent_instructions
+)
 
 __all__ = [
     'ENV', 'IS_PRODUCTION', 'LOG_LEVEL', 'PORT', 'HOST',
-    'get_time_greeting', 'get_welcome_message', 'get_agent_instructions'
-]
\ No newline at end of file
+    'TIME_GREETINGS', 'get_time_greeting', 'get_welcome_message',
+    'get_welcome_message_parts', 'get_agent_instructions'
+]
\ No newline at end of file
@@ -0,0 +1,189 @@
+# shared/admission.py
+import asyncio
+import collections
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# SIP responses that mean "the carrier/trunk is overloaded, try again later"
+CONGESTION_SIP_CODES = {408, 480, 500, 502, 503, 504}
+# SIP responses where retrying the same number is pointless
+BUSY_SIP_CODES = {486, 600}
+REJECTED_SIP_CODES = {403, 404, 410, 484, 485, 488, 603, 604}
+
+def classify_sip_status(code):
+    """Map a SIP status code to congestion / busy / rejected / other"""
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return 'other'
+    if code in CONGESTION_SIP_CODES:
+        return 'congestion'
+    if code in BUSY_SIP_CODES:
+        return 'busy'
+    if code in REJECTED_SIP_CODES:
+        return 'rejected'
+    return 'other'
+
+class AdmissionError(Exception):
+    """Raised when a call cannot be admitted to a trunk"""
+
+class AdmissionQueueFull(AdmissionError):
+    """The queue in front of the trunk is already at its limit"""
+
+class AdmissionTimeout(AdmissionError):
+    """The call waited in the queue longer than allowed"""
+
+class TrunkLimiter:
+    """Calls-per-second and max-concurrent-calls limits for one SIP trunk
+
+    Callers wait in a FIFO queue until both a rate token and a concurrency
+    slot are free. A slot is a lease keyed by room name: it is held for the
+    length of the call and returned with `release()`, or expires after
+    `lease_seconds` if the end of the call is never reported. Without a
+    concurrency cap no lease is kept and `release()` is a no-op. `pause()`
+    stops admissions for a while when the carrier signals congestion.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, calls_per_second=0, max_concurrent=0, burst=None,
+                 max_queue=1000, lease_seconds=600):
+        self.calls_per_second = calls_per_second
+        self.max_concurrent = max_concurrent
+        self.burst = burst or max(1.0, calls_per_second)
+        self.max_queue = max_queue
+        self.lease_seconds = lease_seconds
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._leases = {}
+        self._waiters = collections.deque()
+        self._paused_until = 0.0
+        self._timer = None
+
+    @property
+    def active(self):
+        return len(self._leases)
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def lease_keys(self):
+        return list(self._leases)
+
+    async def acquire(self, lease_key, timeout=None):
+        """Wait for admission and take a lease for `lease_key`"""
+        if self.max_queue and len(self._waiters) >= self.max_queue:
+            raise AdmissionQueueFull(f"{len(self._waiters)} calls already queued")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((future, lease_key))
+        self._admit()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as the wait was cancelled: hand the lease back
+                self.release(lease_key)
+            else:
+                self._discard(future)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionTimeout(f"not admitted within {timeout}s") from None
+            raise
+
+    def release(self, lease_key):
+        """Return the lease for a finished (or failed) call"""
+        if self._leases.pop(lease_key, None) is not None:
+            self._admit()
+
+    def pause(self, seconds):
+        """Hold back all admissions for `seconds` (carrier congestion)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning(f"Trunk admissions paused for {seconds:.1f}s")
+        self._admit()
+
+    def _discard(self, future):
+        try:
+            self._waiters.remove(next(w for w in self._waiters if w[0] is future))
+        except StopIteration:
+            pass
+
+    def _refill(self, now):
+        if self.calls_per_second:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.calls_per_second)
+        self._refilled_at = now
+
+    def _expire_leases(self, now):
+        expired = [key for key, expires_at in self._leases.items() if expires_at <= now]
+        for key in expired:
+            logger.warning(f"Trunk lease for {key} expired without a release")
+            del self._leases[key]
+
+    def _admit(self):
+        """Admit queued callers while tokens and slots allow, else schedule a retry"""
+        now = time.monotonic()
+        self._refill(now)
+        self._expire_leases(now)
+
+        while self._waiters:
+            future, lease_key = self._waiters[0]
+            if future.done():  # timed out or cancelled while queued
+                self._waiters.popleft()
+                continue
+            if now < self._paused_until:
+                self._schedule(self._paused_until - now)
+                return
+            if self.max_concurrent and len(self._leases) >= self.max_concurrent:
+                if self._leases:
+                    self._schedule(min(self._leases.values()) - now)
+                return
+            if self.calls_per_second and self._tokens < 1:
+                self._schedule((1 - self._tokens) / self.calls_per_second)
+                return
+
+            self._waiters.popleft()
+            if self.calls_per_second:
+                self._tokens -= 1
+            if self.max_concurrent:
+                self._leases[lease_key] = now + self.lease_seconds
+            future.set_result(None)
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._admit()
+
+class AdmissionController:
+    """One TrunkLimiter per SIP trunk id, created on first use with shared settings"""
+
+    def __init__(self, **limiter_kwargs):
+        self._limiter_kwargs = limiter_kwargs
+        self._limiters = {}
+
+    def limiter(self, trunk_id):
+        limiter = self._limiters.get(trunk_id)
+        if limiter is None:
+            limiter = self._limiters[trunk_id] = TrunkLimiter(**self._limiter_kwargs)
+        return limiter
+
+    async def acquire(self, trunk_id, lease_key, timeout=None):
+        await self.limiter(trunk_id).acquire(lease_key, timeout)
+
+    def release(self, trunk_id, lease_key):
+        self.limiter(trunk_id).release(lease_key)
+
+    def leases(self):
+        """(trunk_id, lease_key) for every lease held"""
+        return [(trunk_id, key) for trunk_id, limiter in self._limiters.items() for key in limiter.lease_keys()]
+
+    def stats(self):
+        return {
+            trunk_id: {"active": limiter.active, "queued": limiter.queued}
+            for trunk_id, limiter in self._limiters.items()
+        }
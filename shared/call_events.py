@@ -0,0 +1,46 @@
+# shared/call_events.py
+import hashlib
+import hmac
+import time
+
+# Call lifecycle events the agent reports to the web service
+ANSWERED = "answered"      # the callee picked up
+SIP_FAILED = "sip_failed"  # the outbound dial failed (busy, rejected, congestion ...)
+HANGUP = "hangup"          # the call ended after being answered
+AGENT_EVENTS = (ANSWERED, SIP_FAILED, HANGUP)
+
+SIGNATURE_HEADER = "X-Call-Event-Signature"
+TIMESTAMP_HEADER = "X-Call-Event-Timestamp"
+
+# Signed requests older (or newer) than this are refused as replays
+MAX_CLOCK_SKEW = 300
+
+class SignatureError(ValueError):
+    """Raised when a call event request is unsigned, mis-signed or stale"""
+
+def _digest(secret, timestamp, body):
+    return hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+
+def sign(secret, body, timestamp=None):
+    """Headers that authenticate `body` (bytes) as coming from a holder of `secret`"""
+    timestamp = str(int(time.time() if timestamp is None else timestamp))
+    return {
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: f"sha256={_digest(secret, timestamp, body)}",
+    }
+
+def verify(secret, body, timestamp, signature, max_skew=MAX_CLOCK_SKEW):
+    """Check the headers produced by `sign`; raises SignatureError"""
+    if not secret:
+        raise SignatureError("call event secret is not configured")
+    if not timestamp or not signature:
+        raise SignatureError("missing signature headers")
+    try:
+        skew = abs(time.time() - int(timestamp))
+    except ValueError:
+        raise SignatureError("malformed timestamp") from None
+    if skew > max_skew:
+        raise SignatureError("timestamp outside the allowed window")
+    expected = f"sha256={_digest(secret, timestamp, body)}"
+    if not hmac.compare_digest(expected, signature):
+        raise SignatureError("signature mismatch")
@@ -0,0 +1,81 @@
+# shared/compression.py
+import logging
+import zlib
+from .config import STORAGE_COMPRESSION
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# Text that shows up in most call metadata and transcripts. Both codecs prime
+# their window with it, so even a short value can refer back to it. Never edit
+# this in place: compressed rows need the exact dictionary they were written
+# with. Add a new dictionary under a new header byte instead.
+SHARED_DICTIONARY_V1 = (
+    '{"name": "", "phone_number": "+", "email": "", "query": "", "room_name": "call-'
+    'Customer: Agent: Hello, Good morning, Good afternoon, Good evening, '
+    'this is calling from FRAN-TIGER about your franchise enquiry. '
+    'Thank you for your time. Is this a good time to talk? '
+    'Yes, No, I would like to know more about the investment, the franchise fee, '
+    'the royalty, the location, the support and training you provide. '
+    'Could you tell me more about it? Sure, I can help you with that. '
+    'Have a great day. Goodbye.'
+).encode()
+
+# First byte of every stored value says how the rest is encoded
+_RAW = b'\x00'
+_ZLIB_V1 = b'\x01'
+_ZSTD_V1 = b'\x02'
+
+# Values shorter than this are not worth compressing
+MIN_COMPRESS_SIZE = 64
+
+_zstd_dict = None
+
+def _zstd_dictionary():
+    global _zstd_dict
+    if _zstd_dict is None:
+        _zstd_dict = zstandard.ZstdCompressionDict(
+            SHARED_DICTIONARY_V1, dict_type=zstandard.DICT_TYPE_RAWCONTENT
+        )
+    return _zstd_dict
+
+_CODEC = STORAGE_COMPRESSION
+if _CODEC == 'zstd' and zstandard is None:
+    logger.warning("STORAGE_COMPRESSION=zstd but zstandard is not installed; using zlib")
+    _CODEC = 'zlib'
+
+def compress_text(value):
+    """Encode text for storage: header byte + zlib/zstd payload (or raw when that is smaller)"""
+    if value is None:
+        return None
+    raw = value.encode('utf-8')
+    if len(raw) < MIN_COMPRESS_SIZE or _CODEC == 'none':
+        return _RAW + raw
+    if _CODEC == 'zstd':
+        packed = _ZSTD_V1 + zstandard.ZstdCompressor(dict_data=_zstd_dictionary()).compress(raw)
+    else:
+        compressor = zlib.compressobj(level=6, zdict=SHARED_DICTIONARY_V1)
+        packed = _ZLIB_V1 + compressor.compress(raw) + compressor.flush()
+    return packed if len(packed) < len(raw) + 1 else _RAW + raw
+
+def decompress_text(value):
+    """Inverse of compress_text; plain strings (rows written before compression) pass through"""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    header, payload = value[:1], value[1:]
+    if header == _RAW:
+        return payload.decode('utf-8')
+    if header == _ZLIB_V1:
+        decompressor = zlib.decompressobj(zdict=SHARED_DICTIONARY_V1)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+    if header == _ZSTD_V1:
+        if zstandard is None:
+            raise RuntimeError("Value was stored with zstd; install zstandard to read it")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dictionary()).decompress(payload).decode('utf-8')
+    # Unknown header: most likely legacy bytes that were never compressed
+    return value.decode('utf-8', errors='replace')
@@ -1,16 +1,39 @@
 # shared/config.py
-import os
-from dotenv import load_dotenv
+from .settings import get_settings
 
-load_dotenv()
+env = get_settings()
 
 # Environment detection
-ENV = os.getenv("NODE_ENV", "development")
+ENV = env.str("NODE_ENV", "development")
 IS_PRODUCTION = ENV == "production"
+DEBUG = env.bool("DEBUG", False)
 
 # Shared logging configuration
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO" if IS_PRODUCTION else "DEBUG")
+LOG_LEVEL = env.choice("LOG_LEVEL", "INFO", ("debug", "info", "warning", "error", "critical")).upper()
+# "text" or "json" (one object per line)
+LOG_FORMAT = env.choice("LOG_FORMAT", "json" if IS_PRODUCTION else "text", ("text", "json"))
+# Hand records to a background thread that formats and writes them
+LOG_QUEUE = env.bool("LOG_QUEUE", True)
+# Records beyond this many waiting are dropped rather than blocking the caller
+LOG_QUEUE_SIZE = env.int("LOG_QUEUE_SIZE", 10000, minimum=0)
+# Fraction of DEBUG/INFO records kept per logger, e.g. "web.routes=0.1,call_assistant=0.5"
+LOG_SAMPLE_RATES = env.str("LOG_SAMPLE_RATES", "")
 
 # Shared server configuration
-PORT = int(os.getenv("PORT", "8080"))
-HOST = os.getenv("HOST", "0.0.0.0")
\ No newline at end of file
+PORT = env.int("PORT", 8080, minimum=0)
+HOST = env.str("HOST", "0.0.0.0")
+
+# SQLite database shared by the web service and the agent
+DB_PATH = env.str("DB_PATH", "db/calls.sqlite")
+
+# Codec for large call fields (transcript, metadata): zlib, zstd (needs zstandard) or none
+STORAGE_COMPRESSION = env.choice("STORAGE_COMPRESSION", "zlib", ("zlib", "zstd", "none"))
+
+# Phone numbers are normalised to E.164; numbers typed without a country code
+# are read in this region
+DEFAULT_PHONE_REGION = env.str("DEFAULT_PHONE_REGION", "IN").upper()
+
+# HMAC key the agent signs its call lifecycle events with (see shared.call_events)
+CALL_EVENTS_SECRET = env.str("CALL_EVENTS_SECRET") or env.str("LIVEKIT_API_SECRET")
+
+env.validate()
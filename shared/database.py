@@ -1,57 +1,230 @@
 # shared/database.py
 import os
+import re
 import json
+import logging
 import datetime
+from collections import Counter
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float
-from dotenv import load_dotenv
+from sqlalchemy import (
+    Column, Integer, String, Text, Boolean, DateTime, Float, Index, LargeBinary,
+    bindparam, event, func, inspect, select, text
+)
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, column_property, deferred, relationship
+from .compression import compress_text, decompress_text
+from .config import DB_PATH
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
+class CompressedText(TypeDecorator):
+    """Text stored compressed as a BLOB; rows written as plain TEXT still read back"""
+    impl = LargeBinary
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+    
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
 class CallRecord(db.Model):
     """Model for storing call records"""
     __tablename__ = 'call_records'
+    __table_args__ = (
+        # Newest-first listings and keyset pagination walk this index
+        Index('ix_call_records_created_at_id', 'created_at', 'id'),
+        # Duplicate-dial checks look up recent calls to a normalised number
+        Index('ix_call_records_phone_e164_created_at', 'customer_phone_e164', 'created_at'),
+        # The live change feed tails recently changed rows
+        Index('ix_call_records_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     room_name = Column(String(50), unique=True, nullable=False)
     dispatch_id = Column(String(100), unique=True, nullable=True)
     customer_name = Column(String(100), nullable=False)
     customer_phone = Column(String(20), nullable=False)
+    customer_phone_e164 = Column(String(20), nullable=True)  # normalised form of customer_phone
     customer_email = Column(String(100), nullable=True)
     customer_query = Column(Text, nullable=True)
-    status = Column(String(20), default='pending')  # pending, connected, failed, completed
+    # pending, connected, failed, completed. active_history loads the committed
+    # value before an overwrite, so call_counters always learns the old status
+    status = column_property(Column(String(20), default='pending'), active_history=True)
     call_start = Column(DateTime, nullable=True)
     call_end = Column(DateTime, nullable=True)
     duration = Column(Float, nullable=True)  # in seconds
-    transcript = Column(Text, nullable=True)
-    metadata = Column(Text, nullable=True)  # JSON string for additional data
+    sip_status = Column(String(10), nullable=True)  # SIP response of a failed dial
+    # Large fields are compressed and deferred: only loaded when accessed, so
+    # list and dashboard queries never read them
+    transcript = deferred(Column(CompressedText, nullable=True), group='large')
+    # JSON string for additional data ("metadata" itself is reserved by the declarative API)
+    call_metadata = deferred(Column('metadata', CompressedText, nullable=True), group='large')
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
+    # Latency timeline written by the agent, matched on room name
+    timeline = relationship(
+        'CallTimeline',
+        primaryjoin='foreign(CallTimeline.room_name) == CallRecord.room_name',
+        uselist=False,
+        viewonly=True
+    )
+    
     def __repr__(self):
         return f'<CallRecord {self.id}: {self.customer_name} - {self.status}>'
     
-    def to_dict(self):
-        """Convert record to dictionary"""
-        return {
+    def segments_query(self):
+        """Transcript segments streamed in by the agent, in spoken order"""
+        return TranscriptSegment.query.filter_by(room_name=self.room_name).order_by(TranscriptSegment.seq)
+    
+    def full_transcript(self):
+        """The stored transcript, or one assembled from the call's segments"""
+        if self.transcript:
+            return self.transcript
+        return assemble_transcript(self.room_name)
+    
+    def to_dict(self, include_transcript=False):
+        """Convert record to dictionary (the transcript is only loaded when asked for)"""
+        data = {
             'id': self.id,
             'room_name': self.room_name,
             'dispatch_id': self.dispatch_id,
             'customer_name': self.customer_name,
             'customer_phone': self.customer_phone,
+            'customer_phone_e164': self.customer_phone_e164,
             'customer_email': self.customer_email,
             'customer_query': self.customer_query,
             'status': self.status,
             'call_start': self.call_start.isoformat() if self.call_start else None,
             'call_end': self.call_end.isoformat() if self.call_end else None,
             'duration': self.duration,
-            'transcript': self.transcript,
+            'sip_status': self.sip_status,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
         }
+        if include_transcript:
+            data['transcript'] = self.full_transcript()
+        return data
+
+class CallTimeline(db.Model):
+    """Per-call latency timeline recorded by the agent worker"""
+    __tablename__ = 'call_timelines'
+    
+    id = Column(Integer, primary_key=True)
+    room_name = Column(String(50), unique=True, nullable=False)
+    stages = Column(Text, nullable=False)  # JSON: stage -> seconds since the job was received
+    turns = Column(Text, nullable=True)  # JSON list of per-turn latency breakdowns
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<CallTimeline {self.room_name}>'
+    
+    def to_dict(self):
+        return {
+            'room_name': self.room_name,
+            'stages': json.loads(self.stages) if self.stages else {},
+            'turns': json.loads(self.turns) if self.turns else [],
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+class TranscriptSegment(db.Model):
+    """One finalised utterance of a call, appended by the agent as the call goes"""
+    __tablename__ = 'transcript_segments'
+    __table_args__ = (
+        Index('ix_transcript_segments_room_seq', 'room_name', 'seq', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    room_name = Column(String(50), nullable=False)
+    seq = Column(Integer, nullable=False)
+    speaker = Column(String(20), nullable=False)  # customer, agent
+    start_offset = Column(Float, nullable=True)  # seconds since the call's job started
+    end_offset = Column(Float, nullable=True)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TranscriptSegment {self.room_name}#{self.seq}>'
+    
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'speaker': self.speaker,
+            'start_offset': self.start_offset,
+            'end_offset': self.end_offset,
+            'text': self.text,
+        }
+
+def iter_transcript_lines(room_name, batch_size=500):
+    """Yield "Speaker: text" lines for a call without loading every segment at once"""
+    query = db.session.query(TranscriptSegment.speaker, TranscriptSegment.text).filter(
+        TranscriptSegment.room_name == room_name
+    ).order_by(TranscriptSegment.seq).execution_options(yield_per=batch_size)
+    for speaker, line in query:
+        yield f"{speaker.capitalize()}: {line}"
+
+def assemble_transcript(room_name):
+    """Join a call's segments into a plain-text transcript (None if there are none)"""
+    return '\n'.join(iter_transcript_lines(room_name)) or None
+
+class CallCounter(db.Model):
+    """Running number of call records per status, kept in step with call_records"""
+    __tablename__ = 'call_counters'
+    
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CallCounter {self.status}: {self.count}>'
+
+class DialClaim(db.Model):
+    """A number dialled within the duplicate-dial window, shared by all web workers"""
+    __tablename__ = 'dial_claims'
+    
+    phone_e164 = Column(String(20), primary_key=True)
+    room_name = Column(String(50), nullable=False)
+    dispatch_id = Column(String(100), nullable=True)
+    dispatched_at = Column(DateTime, nullable=True)  # None while the dispatch is in flight
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<DialClaim {self.phone_e164}: {self.room_name}>'
+
+class DatabaseFlag(db.Model):
+    """A one-off maintenance step that has been completed on this database"""
+    __tablename__ = 'db_flags'
+    
+    name = Column(String(50), primary_key=True)
+    set_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DatabaseFlag {self.name}>'
+
+class CallRollup(db.Model):
+    """Call outcomes aggregated per minute, hour or day of the calls' created_at
+
+    Maintained incrementally by shared.rollups as calls are written and
+    change state. `durations` is a LatencyHistogram (JSON), so percentiles
+    over any range come from merging a few rows.
+    """
+    __tablename__ = 'call_rollups'
+    
+    granularity = Column(String(10), primary_key=True)  # minute, hour, day
+    bucket_start = Column(DateTime, primary_key=True)
+    requested = Column(Integer, nullable=False, default=0)
+    answered = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    failures = Column(Text, nullable=True)  # JSON: SIP status (or "no_answer") -> count
+    durations = Column(Text, nullable=True)  # JSON LatencyHistogram of call durations
+    
+    def __repr__(self):
+        return f'<CallRollup {self.granularity} {self.bucket_start}>'
 
 class AdminUser(db.Model):
     """Model for admin users"""
@@ -66,10 +239,285 @@ class AdminUser(db.Model):
     def __repr__(self):
         return f'<AdminUser {self.username}>'
 
+def begin_immediate(session):
+    """Start the session's transaction with SQLite's write lock already held
+
+    A read-modify-write that begins with a plain SELECT only takes the lock
+    at its first write, so another process can change the rows in between.
+    """
+    session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+def apply_counter_deltas(session, deltas):
+    """Add per-status deltas to call_counters in the caller's transaction"""
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        stmt = sqlite_insert(CallCounter).values(status=status, count=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CallCounter.status],
+            set_={'count': CallCounter.count + stmt.excluded.count}
+        )
+        session.execute(stmt)
+
+def get_call_counters():
+    """Return per-status call counts plus a 'total', without scanning call_records"""
+    counters = {status: count for status, count in db.session.query(CallCounter.status, CallCounter.count)}
+    counters['total'] = sum(counters.values())
+    return counters
+
+@event.listens_for(Session, 'before_flush')
+def _track_status_changes(session, flush_context, instances):
+    """Keep call_counters in step with CallRecord rows changed through the ORM"""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, CallRecord):
+            deltas[obj.status or 'pending'] += 1
+    for obj in session.dirty:
+        if isinstance(obj, CallRecord):
+            history = inspect(obj).attrs.status.history
+            if history.added:
+                if history.deleted:
+                    deltas[history.deleted[0]] -= 1
+                deltas[history.added[0]] += 1
+    for obj in session.deleted:
+        if isinstance(obj, CallRecord):
+            deltas[obj.status] -= 1
+    if deltas:
+        apply_counter_deltas(session, deltas)
+
+def _upgrade_schema():
+    """Add nullable columns and indexes introduced since a table was first created"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
+                if (table.name, column.name) == ('call_records', 'customer_phone_e164'):
+                    _backfill_phone_e164()
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def _backfill_phone_e164(batch_size=1000):
+    """Fill customer_phone_e164 for rows written before the column existed"""
+    from .config import DEFAULT_PHONE_REGION
+    from .phone import normalize_phone, InvalidPhoneNumber
+    table = CallRecord.__table__
+    last_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.customer_phone)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return
+            updates = []
+            for row in rows:
+                try:
+                    updates.append({'row_id': row.id, 'phone': normalize_phone(row.customer_phone, DEFAULT_PHONE_REGION)})
+                except InvalidPhoneNumber:
+                    pass
+            if updates:
+                conn.execute(
+                    table.update().where(table.c.id == bindparam('row_id')).values(
+                        customer_phone_e164=bindparam('phone'), updated_at=table.c.updated_at
+                    ),
+                    updates
+                )
+            last_id = rows[-1].id
+
+def _compress_legacy_rows(batch_size=500):
+    """Rewrite transcript/metadata values still stored as plain TEXT in compressed form
+
+    The typeof() scan reads every row, so it runs until it finds nothing
+    left to convert and is then recorded as done in db_flags (every writer
+    since stores these columns compressed). Run VACUUM afterwards to give
+    the space back.
+    """
+    if db.session.get(DatabaseFlag, 'legacy_rows_compressed') is not None:
+        return
+    table = CallRecord.__table__
+    find_legacy = text(
+        "SELECT id FROM call_records WHERE typeof(transcript) = 'text' OR typeof(metadata) = 'text' "
+        "LIMIT :limit"
+    )
+    rewrite = table.update().where(table.c.id == bindparam('row_id')).values(
+        transcript=bindparam('new_transcript'),
+        metadata=bindparam('new_metadata'),
+        updated_at=table.c.updated_at,
+    )
+    converted = 0
+    while True:
+        with db.engine.begin() as conn:
+            ids = [row[0] for row in conn.execute(find_legacy, {'limit': batch_size})]
+            if not ids:
+                break
+            rows = conn.execute(
+                select(table.c.id, table.c.transcript, table.c.metadata).where(table.c.id.in_(ids))
+            ).all()
+            conn.execute(rewrite, [
+                {'row_id': row.id, 'new_transcript': row.transcript, 'new_metadata': row.metadata}
+                for row in rows
+            ])
+            converted += len(rows)
+    if converted:
+        logger.info(f"Compressed large fields of {converted} call records; run VACUUM to reclaim space")
+    db.session.merge(DatabaseFlag(name='legacy_rows_compressed'))
+    db.session.commit()
+
+def _backfill_call_counters():
+    """Seed call_counters from call_records once, e.g. for a pre-existing database"""
+    if db.session.query(CallCounter.status).first() is not None:
+        return
+    counts = db.session.query(CallRecord.status, func.count(CallRecord.id)).group_by(CallRecord.status).all()
+    if counts:
+        apply_counter_deltas(db.session, {status or 'pending': count for status, count in counts})
+        db.session.commit()
+
+def _backfill_call_rollups():
+    """Build call_rollups from call_records once, e.g. for a pre-existing database"""
+    from .rollups import rebuild_rollups
+    if db.session.query(CallRollup.granularity).first() is not None:
+        return
+    if db.session.query(CallRecord.id).first() is not None:
+        rebuild_rollups(db.session)
+        db.session.commit()
+
+# Full-text search over call_records, kept in sync by triggers. Updates only
+# touch the index when one of the indexed columns changes (not on status updates).
+# What was said is searched through a second index over transcript_segments.
+SEARCH_COLUMNS = ('customer_name', 'customer_phone', 'customer_email', 'customer_query')
+# bm25 column weights, in SEARCH_COLUMNS order, and for transcript segments
+SEARCH_WEIGHTS = (10.0, 10.0, 5.0, 2.0)
+TRANSCRIPT_SEARCH_WEIGHT = 1.0
+search_index_enabled = False
+
+def _search_index_ddl():
+    cols = ', '.join(SEARCH_COLUMNS)
+    new_cols = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+    old_cols = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS call_records_fts USING fts5(
+            {cols}, content='call_records', content_rowid='id', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS call_records_fts_ai AFTER INSERT ON call_records BEGIN
+            INSERT INTO call_records_fts(rowid, {cols}) VALUES (new.id, {new_cols});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS call_records_fts_ad AFTER DELETE ON call_records BEGIN
+            INSERT INTO call_records_fts(call_records_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS call_records_fts_au AFTER UPDATE OF {cols} ON call_records BEGIN
+            INSERT INTO call_records_fts(call_records_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            INSERT INTO call_records_fts(rowid, {cols}) VALUES (new.id, {new_cols});
+        END""",
+    ]
+
+TRANSCRIPT_SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transcript_segments_fts USING fts5(
+        text, content='transcript_segments', content_rowid='id', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transcript_segments_fts_ai AFTER INSERT ON transcript_segments BEGIN
+        INSERT INTO transcript_segments_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcript_segments_fts_ad AFTER DELETE ON transcript_segments BEGIN
+        INSERT INTO transcript_segments_fts(transcript_segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcript_segments_fts_au AFTER UPDATE OF text ON transcript_segments BEGIN
+        INSERT INTO transcript_segments_fts(transcript_segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO transcript_segments_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+def _create_search_index():
+    """Create the FTS5 indexes and their triggers, building them for existing rows"""
+    global search_index_enabled
+    try:
+        with db.engine.begin() as conn:
+            segments_indexed = _table_exists(conn, 'transcript_segments_fts')
+            for statement in TRANSCRIPT_SEARCH_INDEX_DDL:
+                conn.execute(text(statement))
+            if not segments_indexed:
+                conn.execute(text("INSERT INTO transcript_segments_fts(transcript_segments_fts) VALUES ('rebuild')"))
+            existed = _table_exists(conn, 'call_records_fts')
+            if existed and _search_index_columns(conn) != SEARCH_COLUMNS:
+                logger.info("Search columns changed; rebuilding the full-text index")
+                _drop_search_index(conn)
+                existed = False
+            for statement in _search_index_ddl():
+                conn.execute(text(statement))
+            if not existed:
+                conn.execute(text("INSERT INTO call_records_fts(call_records_fts) VALUES ('rebuild')"))
+        search_index_enabled = True
+    except Exception as e:
+        logger.warning(f"Full-text search unavailable, falling back to LIKE search: {e}")
+        search_index_enabled = False
+
+def _table_exists(conn, name):
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"), {'name': name}
+    ).first() is not None
+
+def _search_index_columns(conn):
+    return tuple(row[1] for row in conn.execute(text("PRAGMA table_info(call_records_fts)")))
+
+def _drop_search_index(conn):
+    for trigger in ('call_records_fts_ai', 'call_records_fts_ad', 'call_records_fts_au'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.execute(text("DROP TABLE IF EXISTS call_records_fts"))
+
+def _match_terms(search):
+    return [f'"{term}"*' for term in re.findall(r'\w+', search)]
+
+def build_match_query(search):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    return ' '.join(_match_terms(search))
+
+def search_calls(search):
+    """Subquery of (call_id, score) for calls matching `search`, best match first
+
+    Every word must be found in the call, but each may be in its own fields
+    or in any of its transcript segments, so the hits are grouped per call
+    and per word. A call scores by the sum of its best hit for each word.
+    """
+    weights = ', '.join(str(w) for w in SEARCH_WEIGHTS)
+    terms = _match_terms(search)
+    hits = ' UNION ALL '.join(
+        f"SELECT rowid AS call_id, {i} AS term, bm25(call_records_fts, {weights}) AS score "
+        f"FROM call_records_fts WHERE call_records_fts MATCH :term{i} "
+        "UNION ALL "
+        f"SELECT call_records.id AS call_id, {i} AS term, "
+        f"bm25(transcript_segments_fts, {TRANSCRIPT_SEARCH_WEIGHT}) AS score "
+        "FROM transcript_segments_fts "
+        "JOIN transcript_segments ON transcript_segments.id = transcript_segments_fts.rowid "
+        "JOIN call_records ON call_records.room_name = transcript_segments.room_name "
+        f"WHERE transcript_segments_fts MATCH :term{i}"
+        for i in range(len(terms))
+    )
+    return text(
+        "SELECT call_id, SUM(score) AS score FROM ("
+        f"SELECT call_id, term, MIN(score) AS score FROM ({hits}) GROUP BY call_id, term"
+        ") GROUP BY call_id HAVING COUNT(*) = :term_count"
+    ).bindparams(
+        term_count=len(terms), **{f'term{i}': term for i, term in enumerate(terms)}
+    ).columns(
+        call_id=Integer, score=Float
+    ).subquery('search_matches')
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Use WAL so admin reads don't block the batched call record writes"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 def init_db(app):
     """Initialize the database with the app context"""
     # Configure SQLite database
-    db_path = os.getenv('DB_PATH', 'db/calls.sqlite')
+    db_path = DB_PATH
     
     # Ensure directory exists
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
@@ -82,6 +530,12 @@ def init_db(app):
     
     # Create tables if they don't exist
     with app.app_context():
+        event.listen(db.engine, 'connect', _configure_sqlite_connection)
         db.create_all()
+        _upgrade_schema()
+        _create_search_index()
+        _compress_legacy_rows()
+        _backfill_call_counters()
+        _backfill_call_rollups()
         
-    return db
\ No newline at end of file
+    return db
@@ -0,0 +1,72 @@
+# shared/ids.py
+import datetime
+import os
+import threading
+import time
+
+# Crockford base32: no I, L, O or U, so IDs survive being read out or retyped
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+_RANDOM_LIMIT = 1 << _RANDOM_BITS
+ULID_LENGTH = 26
+
+def _encode(value):
+    chars = []
+    for _ in range(ULID_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+class ULIDGenerator:
+    """Collision-free, monotonic identifiers (ULID: 48-bit ms timestamp + 80 random bits)
+
+    IDs sort in creation order, so rows keyed on them are appended at the
+    right edge of a B-tree index instead of landing on random pages. Within
+    one millisecond (or if the clock steps back) the random part of the
+    previous ID is incremented, so IDs from one process are strictly
+    increasing; across processes the 80 random bits make a collision
+    practically impossible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._last_ms = -1
+        self._last_random = 0
+
+    def reset_after_fork(self):
+        """Forget the last ID so a forked child does not continue its parent's sequence"""
+        self._lock = threading.Lock()
+        self._reset()
+
+    def new(self):
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms > self._last_ms:
+                random_part = int.from_bytes(os.urandom(10), "big")
+            else:
+                ms = self._last_ms
+                random_part = self._last_random + 1
+                if random_part >= _RANDOM_LIMIT:
+                    # 2^80 IDs in one millisecond: borrow the next one
+                    ms += 1
+                    random_part = int.from_bytes(os.urandom(10), "big")
+            self._last_ms, self._last_random = ms, random_part
+        return _encode((ms << _RANDOM_BITS) | random_part)
+
+def ulid_datetime(ulid):
+    """The (naive UTC) creation time encoded in a ULID"""
+    value = 0
+    for char in ulid[:10].upper():
+        value = value * 32 + _ALPHABET.index(char)
+    return datetime.datetime.utcfromtimestamp(value / 1000)
+
+_generator = ULIDGenerator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_generator.reset_after_fork)
+
+def new_ulid():
+    """A new 26-character ULID from the process-wide generator"""
+    return _generator.new()
@@ -3,54 +3,273 @@ shared/logging_config.py - Centralized logging configuration for both services
 """
 
 import os
+import json
+import atexit
+import random
 import logging
-from logging.handlers import RotatingFileHandler
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import queue
 import sys
 
-def configure_logging(name, log_dir="logs"):
+from .config import DEBUG, LOG_LEVEL, LOG_FORMAT, LOG_QUEUE, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES
+
+# Fields bound to the current call (room, dispatch, job ...), added to every record
+_log_context = contextvars.ContextVar("log_context", default={})
+
+# (listener, queue handler) pairs started by configure_logging, stopped (and drained) at exit
+_listeners = []
+
+# [owner, file handler] pairs opened by configure_logging; the owner is the
+# QueueListener or logger the handler is attached to
+_file_handlers = []
+
+def bind_log_context(**fields):
+    """Add fields to every record logged from the current thread/task
+
+    Returns a token for reset_log_context. asyncio tasks get their own copy of
+    the context, so binding inside a coroutine never leaks into other calls.
+    """
+    return _log_context.set({**_log_context.get(), **fields})
+
+def reset_log_context(token=None):
+    """Undo a bind_log_context, or drop all bound fields when no token is given"""
+    if token is None:
+        _log_context.set({})
+    else:
+        _log_context.reset(token)
+
+@contextmanager
+def log_context(**fields):
+    """Bind fields for the duration of a with-block"""
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        reset_log_context(token)
+
+class ContextFilter(logging.Filter):
+    """Copies the bound call context onto the record
+
+    Runs on the logging thread, where the context is visible; the listener
+    thread that formats the record later has no access to it.
+    """
+    def filter(self, record):
+        context = _log_context.get()
+        if context:
+            record.context = context
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of DEBUG/INFO records per logger
+
+    Rates are matched on the longest logger-name prefix ("web" covers
+    "web.routes"). WARNING and above are never dropped.
+    """
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._resolved = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            else:
+                rate = self.rates.get("", 1.0)
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, bound context, exception"""
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        context = getattr(record, "context", None)
+        if context:
+            entry.update(context)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """The classic text format, with any bound context appended as key=value pairs"""
+    def format(self, record):
+        line = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            line += " [" + " ".join(f"{k}={v}" for k, v in context.items()) + "]"
+        return line
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock handler formats every record before queueing it, which puts the
+    formatter (and traceback rendering) back on the calling thread. Here only
+    the message arguments are merged, so later mutation of those arguments
+    cannot change what gets logged, and the record is queued without blocking;
+    if the queue is full the record is dropped and counted.
+    """
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_sample_rates(spec):
+    """Parse "web.routes=0.1,call_assistant=0.5" into {logger_name: rate}"""
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+def configure_logging(name, log_dir="logs", logger_name=None):
     """Configure logging for application components
-    
+
     Args:
-        name: The logger name (typically the module name)
+        name: The component name; also names the log file
         log_dir: Directory to store log files
-        
+        logger_name: Logger to attach handlers to (defaults to `name`; "" for the root logger)
+
     Returns:
         A configured logger instance
+
+    With LOG_QUEUE on, records go through a queue to a listener thread that
+    owns the file and console handlers, so formatting, disk writes and log
+    rotation never run on a request or call thread.
     """
     # Create logs directory if it doesn't exist
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-        
+
     # Get logger
-    logger = logging.getLogger(name)
-    
+    logger = logging.getLogger(name if logger_name is None else logger_name)
+
     # Set base level
-    level = logging.INFO
-    if os.getenv("DEBUG", "").lower() in ("true", "1", "yes"):
-        level = logging.DEBUG
+    level = logging.DEBUG if DEBUG else logging.getLevelName(LOG_LEVEL)
     logger.setLevel(level)
-    
+
+    # Add handlers if not already added
+    if logger.handlers:
+        return logger
+
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # File handler with rotation (keep logs manageable)
     file_handler = RotatingFileHandler(
         os.path.join(log_dir, f"{name}.log"),
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5
     )
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    file_handler.setFormatter(file_formatter)
-    
+    file_handler.setFormatter(formatter)
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(console_formatter)
-    
-    # Add handlers if not already added
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-        
-    return logger
\ No newline at end of file
+    console_handler.setFormatter(formatter)
+
+    if LOG_QUEUE:
+        front = DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        listener = QueueListener(front.queue, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        if not _listeners:
+            atexit.register(stop_logging)
+        _listeners.append((listener, front))
+        handlers = [front]
+        _file_handlers.append([listener, file_handler])
+    else:
+        handlers = [file_handler, console_handler]
+        _file_handlers.append([logger, file_handler])
+
+    rates = parse_sample_rates(LOG_SAMPLE_RATES)
+    for handler in handlers:
+        handler.addFilter(ContextFilter())
+        if rates:
+            handler.addFilter(SamplingFilter(rates))
+        logger.addHandler(handler)
+
+    # A named logger owns its output; propagating would print it twice
+    # wherever the root logger has a handler of its own
+    if logger.name != "root":
+        logger.propagate = False
+
+    return logger
+
+def use_per_process_log_files():
+    """Switch this process's log files to `<name>.<pid>.log`
+
+    For pre-forked server workers: RotatingFileHandler is not safe across
+    processes, since one process renames the file while the others keep
+    writing to the rotated copy. Each worker therefore writes and rotates a
+    file of its own; the console output is left as it is.
+    """
+    for entry in _file_handlers:
+        owner, old = entry
+        base, ext = os.path.splitext(old.baseFilename)
+        new = RotatingFileHandler(f"{base}.{os.getpid()}{ext}", maxBytes=old.maxBytes, backupCount=old.backupCount)
+        new.setFormatter(old.formatter)
+        for log_filter in old.filters:
+            new.addFilter(log_filter)
+        if isinstance(owner, QueueListener):
+            owner.handlers = tuple(new if handler is old else handler for handler in owner.handlers)
+        else:
+            owner.removeHandler(old)
+            owner.addHandler(new)
+        old.close()
+        entry[1] = new
+
+def stop_logging():
+    """Flush queued records and stop the listener threads"""
+    while _listeners:
+        listener, _ = _listeners.pop()
+        listener.stop()
+
+def _restart_listeners_after_fork():
+    # Threads do not survive fork: give each listener a fresh queue (records
+    # queued before the fork belong to the parent) and a new thread
+    for listener, front in _listeners:
+        listener.queue = front.queue = queue.Queue(front.queue.maxsize)
+        listener._thread = None
+        listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners_after_fork)
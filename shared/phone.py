@@ -0,0 +1,19 @@
+# shared/phone.py
+import phonenumbers
+
+class InvalidPhoneNumber(ValueError):
+    """Raised when a phone number cannot be parsed into a valid E.164 number"""
+
+def normalize_phone(raw, default_region=None):
+    """Return `raw` in E.164 form (+<country><number>)
+
+    Numbers without a leading + are read as national numbers of
+    `default_region` (an ISO 3166 code such as "IN").
+    """
+    try:
+        number = phonenumbers.parse(raw, default_region)
+    except phonenumbers.NumberParseException as e:
+        raise InvalidPhoneNumber(f"Could not parse phone number {raw!r}: {e}") from None
+    if not phonenumbers.is_valid_number(number):
+        raise InvalidPhoneNumber(f"Not a valid phone number: {raw!r}")
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
@@ -11,13 +11,26 @@ def get_time_greeting():
     else:
         return "Good Evening"
 
-def get_welcome_message(customer_name: str, query: str = None) -> str:
-    """Creates a personalized welcome message for the customer"""
-    greeting = get_time_greeting()
+# Every value get_time_greeting() can return
+TIME_GREETINGS = ("Good Morning", "Good Afternoon", "Good Evening")
+
+def get_welcome_message_parts(customer_name: str, query: str = None, greeting: str = None) -> tuple:
+    """Splits the welcome message into (name part, body part)
+
+    The body only depends on the time-of-day greeting and the query, so its
+    audio can be synthesized once and reused; only the name part is per call.
+    """
+    greeting = greeting or get_time_greeting()
+    name_part = f"Hey {customer_name},"
     if query:
-        return f"Hey {customer_name}, {greeting.lower()}! You're speaking with FRAN-TIGER — your friendly AI on a mission to help! I heard you've got a question about {query}, and I'm all ears. Let's sort it out together — how can I assist you today?"
+        body = f"{greeting.lower()}! You're speaking with FRAN-TIGER — your friendly AI on a mission to help! I heard you've got a question about {query}, and I'm all ears. Let's sort it out together — how can I assist you today?"
     else:
-        return f"Hey {customer_name}, {greeting}! I'm FRAN-TIGER, your smart assistant. What can I help you tackle today?"
+        body = f"{greeting}! I'm FRAN-TIGER, your smart assistant. What can I help you tackle today?"
+    return name_part, body
+
+def get_welcome_message(customer_name: str, query: str = None) -> str:
+    """Creates a personalized welcome message for the customer"""
+    return " ".join(get_welcome_message_parts(customer_name, query))
 
 def get_agent_instructions() -> str:
     """Return the instructions for the AI agent"""
@@ -38,4 +51,4 @@ When the call starts, you'll receive instructions to greet the customer by name
 For example:
 - "Good Morning John! How can I assist you today?"
 - "Hello Sarah, good afternoon! I understand you have a query about IT services. How can I help you with that?"
-"""
\ No newline at end of file
+"""
\ No newline at end of file
@@ -0,0 +1,218 @@
+# shared/rollups.py
+import datetime
+import json
+from collections import Counter, namedtuple
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .database import db, CallRecord, CallRollup
+from .sketch import LatencyHistogram
+
+GRANULARITIES = ("minute", "hour", "day")
+COUNT_COLUMNS = ("requested", "answered", "completed", "failed")
+# Failure key for calls that failed without a SIP error (nobody picked up)
+NO_ANSWER = "no_answer"
+# 2% keeps a day's duration sketch to a couple of hundred buckets
+DURATION_ACCURACY = 0.02
+
+# What one call contributes to its bucket
+Outcome = namedtuple("Outcome", "answered completed failed failure duration")
+
+def bucket_start(timestamp, granularity):
+    """Start of the minute/hour/day containing `timestamp`"""
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def call_outcome(status, call_start, duration, sip_status):
+    failed = status == "failed"
+    return Outcome(
+        answered=call_start is not None,
+        completed=status == "completed",
+        failed=failed,
+        failure=(str(sip_status) if sip_status else NO_ANSWER) if failed else None,
+        duration=duration,
+    )
+
+class _Bucket:
+    __slots__ = ("counts", "failures", "durations", "removed")
+
+    def __init__(self):
+        self.counts = Counter()
+        self.failures = Counter()
+        self.durations = None
+        self.removed = None
+
+    def add_duration(self, value):
+        if self.durations is None:
+            self.durations = LatencyHistogram(relative_accuracy=DURATION_ACCURACY)
+        self.durations.add(value)
+
+    def remove_duration(self, value):
+        if self.removed is None:
+            self.removed = LatencyHistogram(relative_accuracy=DURATION_ACCURACY)
+        self.removed.add(value)
+
+class RollupDeltas:
+    """Changes to call_rollups collected while a batch of calls is written
+
+    `change(created_at, before, after)` records one call moving from one
+    Outcome to another (`before=None` for a new call). `apply(session)`
+    merges everything into the touched rollup rows with one SELECT and one
+    batched upsert.
+
+    Everything moves both ways: a call closed as failed can still turn
+    into a completed one, and a later, more precise end time replaces a
+    duration (its old value is subtracted from the sketch).
+    """
+
+    def __init__(self):
+        self._buckets = {}  # (granularity, bucket_start) -> _Bucket
+
+    def __bool__(self):
+        return bool(self._buckets)
+
+    def change(self, created_at, before, after):
+        if created_at is None:
+            return
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(created_at, granularity))
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            if before is None:
+                bucket.counts["requested"] += 1
+            for column in ("answered", "completed", "failed"):
+                bucket.counts[column] += int(getattr(after, column)) - int(bool(before and getattr(before, column)))
+            if before is not None and before.failure:
+                bucket.failures[before.failure] -= 1
+            if after.failure:
+                bucket.failures[after.failure] += 1
+            if before is not None and before.duration is not None and before.duration != after.duration:
+                bucket.remove_duration(before.duration)
+            if after.duration is not None and (before is None or before.duration != after.duration):
+                bucket.add_duration(after.duration)
+
+    def apply(self, session):
+        """Merge into call_rollups in the caller's transaction
+
+        Reads, merges and writes whole rows, so it must run after the
+        transaction's first write: from then on the transaction holds
+        SQLite's write lock and no other process can change the rows
+        between the read and the write.
+        """
+        table = CallRollup.__table__
+        keys = list(self._buckets)
+        existing = {}
+        for i in range(0, len(keys), 300):
+            chunk = keys[i:i + 300]
+            for row in session.execute(
+                select(table).where(tuple_(table.c.granularity, table.c.bucket_start).in_(chunk))
+            ):
+                existing[(row.granularity, row.bucket_start)] = row
+
+        values = []
+        for key, bucket in self._buckets.items():
+            row = existing.get(key)
+            counts = Counter({column: getattr(row, column) for column in COUNT_COLUMNS} if row else {})
+            counts.update(bucket.counts)
+            failures = Counter(json.loads(row.failures) if row is not None and row.failures else {})
+            failures.update(bucket.failures)
+            durations = LatencyHistogram(relative_accuracy=DURATION_ACCURACY)
+            if row is not None and row.durations:
+                durations = LatencyHistogram.from_dict(json.loads(row.durations))
+            if bucket.durations is not None:
+                durations.merge(bucket.durations)
+            if bucket.removed is not None:
+                durations.subtract(bucket.removed)
+            values.append({
+                "granularity": key[0],
+                "bucket_start": key[1],
+                **{column: counts[column] for column in COUNT_COLUMNS},
+                "failures": json.dumps({k: v for k, v in failures.items() if v > 0}, sort_keys=True),
+                "durations": json.dumps(durations.to_dict()) if durations.count else None,
+            })
+
+        if values:
+            stmt = sqlite_insert(table)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.granularity, table.c.bucket_start],
+                set_={column: stmt.excluded[column] for column in (*COUNT_COLUMNS, "failures", "durations")},
+            ), values)
+        self._buckets = {}
+
+def prune_rollups(session, retention_days, now=None):
+    """Delete rollup rows older than retention_days[granularity] days (0 or missing keeps them)"""
+    now = now or datetime.datetime.utcnow()
+    table = CallRollup.__table__
+    deleted = 0
+    for granularity, days in retention_days.items():
+        if days:
+            deleted += session.execute(table.delete().where(
+                table.c.granularity == granularity,
+                table.c.bucket_start < bucket_start(now - datetime.timedelta(days=days), granularity),
+            )).rowcount
+    return deleted
+
+def rebuild_rollups(session, batch_size=5000):
+    """Recompute every rollup row from call_records (walks the table once, in id order)"""
+    table = CallRecord.__table__
+    session.execute(CallRollup.__table__.delete())
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(table.c.id, table.c.created_at, table.c.status, table.c.call_start,
+                   table.c.duration, table.c.sip_status)
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        deltas = RollupDeltas()
+        for row in rows:
+            deltas.change(row.created_at, None, call_outcome(row.status, row.call_start, row.duration, row.sip_status))
+        deltas.apply(session)
+        last_id = rows[-1].id
+
+def _summarise(counts, failures, durations):
+    requested = counts["requested"]
+    return {
+        **{column: counts[column] for column in COUNT_COLUMNS},
+        "pickup_rate": round(counts["answered"] / requested, 4) if requested else None,
+        "failure_rate": round(counts["failed"] / requested, 4) if requested else None,
+        "failures_by_sip_status": dict(failures.most_common()),
+        "duration": durations.summary() if durations is not None else {"count": 0, "mean": None},
+    }
+
+def query_rollups(granularity, start, end):
+    """Per-bucket stats for [start, end) plus a summary of the whole range"""
+    table = CallRollup.__table__
+    rows = db.session.execute(
+        select(table).where(
+            table.c.granularity == granularity,
+            table.c.bucket_start >= bucket_start(start, granularity),
+            table.c.bucket_start < end,
+        ).order_by(table.c.bucket_start)
+    ).all()
+
+    buckets = []
+    total_counts, total_failures, total_durations = Counter(), Counter(), None
+    for row in rows:
+        counts = Counter({column: getattr(row, column) for column in COUNT_COLUMNS})
+        failures = Counter(json.loads(row.failures) if row.failures else {})
+        durations = LatencyHistogram.from_dict(json.loads(row.durations)) if row.durations else None
+        buckets.append({"start": row.bucket_start.isoformat(), **_summarise(counts, failures, durations)})
+        total_counts.update(counts)
+        total_failures.update(failures)
+        if durations is not None:
+            if total_durations is None:
+                total_durations = LatencyHistogram(relative_accuracy=durations.relative_accuracy)
+            total_durations.merge(durations)
+
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "buckets": buckets,
+        "summary": _summarise(total_counts, total_failures, total_durations),
+    }
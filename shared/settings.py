@@ -0,0 +1,91 @@
+# shared/settings.py
+import functools
+import os
+from dotenv import load_dotenv
+
+_TRUE = ("true", "1", "yes", "on")
+_FALSE = ("false", "0", "no", "off", "")
+
+class SettingsError(ValueError):
+    """Raised when environment settings are missing or cannot be parsed"""
+
+class Settings:
+    """Typed, validated access to the environment shared by the web and agent services
+
+    `.env` is read once, when the settings are first requested (existing
+    environment variables win). The config modules declare their values
+    through the typed getters below; bad values are collected and reported
+    together by `validate()`, so a misconfigured process fails at startup
+    with every problem listed instead of on the first request that hits one.
+    """
+
+    def __init__(self, environ=None, env_file=None):
+        if environ is None:
+            load_dotenv(env_file)
+            environ = os.environ
+        self._environ = environ
+        self.errors = []
+
+    def get(self, name, default=None):
+        """The raw string value, or `default` when unset"""
+        return self._environ.get(name, default)
+
+    def str(self, name, default=None):
+        return self.get(name, default)
+
+    def bool(self, name, default=False):
+        value = self.get(name)
+        if value is None:
+            return default
+        value = value.strip().lower()
+        if value in _TRUE:
+            return True
+        if value in _FALSE:
+            return False
+        self.errors.append(f"{name}={value!r} is not a boolean")
+        return default
+
+    def int(self, name, default, minimum=None):
+        return self._number(int, name, default, minimum)
+
+    def float(self, name, default, minimum=None):
+        return self._number(float, name, default, minimum)
+
+    def choice(self, name, default, choices):
+        """A lower-cased value that must be one of `choices`"""
+        value = self.get(name, default).strip().lower()
+        if value not in choices:
+            self.errors.append(f"{name}={value!r} must be one of {', '.join(choices)}")
+            return default
+        return value
+
+    def require(self, *names):
+        """Raise SettingsError if any of `names` is unset or empty"""
+        missing = [name for name in names if not self.get(name)]
+        if missing:
+            raise SettingsError(f"Missing required environment variables: {', '.join(missing)}")
+
+    def validate(self):
+        """Raise SettingsError listing every invalid value read so far"""
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise SettingsError("Invalid settings: " + "; ".join(errors))
+
+    def _number(self, kind, name, default, minimum):
+        value = self.get(name)
+        if value is None or not value.strip():
+            return default
+        try:
+            number = kind(value)
+        except ValueError:
+            self.errors.append(f"{name}={value!r} is not a{'n integer' if kind is int else ' number'}")
+            return default
+        if minimum is not None and number < minimum:
+            self.errors.append(f"{name}={value!r} must be at least {minimum}")
+            return default
+        return number
+
+@functools.lru_cache(maxsize=None)
+def get_settings():
+    """The process-wide Settings, created (and .env read) on first use"""
+    return Settings()
@@ -0,0 +1,116 @@
+# shared/sketch.py
+import math
+import threading
+
+class LatencyHistogram:
+    """Mergeable log-bucketed histogram for quantiles with bounded relative error
+
+    Values land in geometric buckets of width `gamma = (1 + a) / (1 - a)`, so
+    any quantile is reported within `relative_accuracy` of the true value
+    (a DDSketch-style sketch). Two histograms merge by adding bucket counts,
+    which lets per-process or per-bucket sketches be combined without keeping
+    the raw samples.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-4):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._bins = {}
+        self._zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index):
+        # Midpoint of the bucket in log space, within relative_accuracy of any member
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value, count=1):
+        if value is None or count <= 0:
+            return
+        value = float(value)
+        with self._lock:
+            if value < self.min_value:
+                self._zero_count += count
+            else:
+                index = self._index(value)
+                self._bins[index] = self._bins.get(index, 0) + count
+            self.count += count
+            self.total += value * count
+            self.max = max(self.max, value)
+
+    def merge(self, other):
+        with self._lock:
+            for index, count in other._bins.items():
+                self._bins[index] = self._bins.get(index, 0) + count
+            self._zero_count += other._zero_count
+            self.count += other.count
+            self.total += other.total
+            self.max = max(self.max, other.max)
+
+    def subtract(self, other):
+        """Remove values previously merged or added (e.g. a corrected measurement)
+
+        Bucket counts, count and total are exact; `max` cannot shrink back.
+        """
+        with self._lock:
+            for index, count in other._bins.items():
+                remaining = self._bins.get(index, 0) - count
+                if remaining > 0:
+                    self._bins[index] = remaining
+                else:
+                    self._bins.pop(index, None)
+            self._zero_count = max(0, self._zero_count - other._zero_count)
+            self.count = max(0, self.count - other.count)
+            self.total -= other.total
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None when empty"""
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = q * (self.count - 1)
+            seen = self._zero_count
+            if rank < seen:
+                return 0.0
+            for index in sorted(self._bins):
+                seen += self._bins[index]
+                if rank < seen:
+                    return min(self._value(index), self.max)
+            return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        result = {"count": self.count, "mean": self.mean()}
+        for q in quantiles:
+            result[f"p{int(q * 100)}"] = self.quantile(q)
+        return result
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "a": self.relative_accuracy,
+                "bins": {str(k): v for k, v in self._bins.items()},
+                "zero": self._zero_count,
+                "count": self.count,
+                "total": self.total,
+                "max": self.max,
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(relative_accuracy=data.get("a", 0.01))
+        sketch._bins = {int(k): v for k, v in data.get("bins", {}).items()}
+        sketch._zero_count = data.get("zero", 0)
+        sketch.count = data.get("count", 0)
+        sketch.total = data.get("total", 0.0)
+        sketch.max = data.get("max", 0.0)
+        return sketch
@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Settings are read when `shared` is first imported: keep the tests off the
+# real database and log files
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="tests-"), "calls.sqlite"))
+os.environ.setdefault("LOG_QUEUE", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app():
+    """A bare Flask app on the test database"""
+    from flask import Flask
+    from shared.database import init_db
+
+    app = Flask(__name__)
+    init_db(app)
+    return app
@@ -0,0 +1,92 @@
+# tests/test_admin_api.py
+import datetime
+import json
+
+import pytest
+
+from shared.database import db, AdminUser, CallRecord
+from shared.ids import new_ulid
+
+
+@pytest.fixture(scope="module")
+def web_app():
+    from web import app
+    return app
+
+
+@pytest.fixture
+def client(web_app):
+    from web.config import ADMIN_USERNAME
+    with web_app.app_context():
+        admin_id = AdminUser.query.filter_by(username=ADMIN_USERNAME).one().id
+    client = web_app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(admin_id)
+    return client
+
+
+@pytest.fixture
+def calls(web_app):
+    """Five calls under a status of their own, oldest first"""
+    status = f"test-{new_ulid()}"
+    started = datetime.datetime(2024, 1, 1, 12, 0)
+    with web_app.app_context():
+        records = [
+            CallRecord(room_name=f"test-{new_ulid()}", customer_name=f"Caller {i}", customer_phone=f"09000000{i:03d}",
+                       customer_phone_e164=f"+919000000{i:03d}", status=status, sip_status="486" if i % 2 else None,
+                       created_at=started + datetime.timedelta(minutes=i))
+            for i in range(5)
+        ]
+        db.session.add_all(records)
+        db.session.commit()
+        ids = [record.id for record in records]
+    yield status, ids
+    with web_app.app_context():
+        for record in CallRecord.query.filter(CallRecord.id.in_(ids)):
+            db.session.delete(record)  # through the session, so call_counters follows
+        db.session.commit()
+
+
+def test_pages_follow_the_cursor_newest_first(client, calls):
+    status, ids = calls
+    seen, cursor = [], None
+    while True:
+        params = {"status": status, "limit": 2, "fields": "id,customer_phone_e164,sip_status"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/admin/api/calls", query_string=params).get_json()
+        seen += page["calls"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [call["id"] for call in seen] == ids[::-1]
+    assert seen[0] == {"id": ids[4], "customer_phone_e164": "+919000000004", "sip_status": None}
+    assert seen[1] == {"id": ids[3], "customer_phone_e164": "+919000000003", "sip_status": "486"}
+
+
+def test_default_fields_include_e164_phone_and_sip_status(client, calls):
+    status, _ = calls
+    call = client.get("/admin/api/calls", query_string={"status": status, "limit": 1}).get_json()["calls"][0]
+    assert {"customer_phone_e164", "sip_status"} <= set(call)
+    assert "transcript" not in call
+
+
+def test_ndjson_streams_every_row(client, calls):
+    status, ids = calls
+    response = client.get("/admin/api/calls", query_string={
+        "status": status, "format": "ndjson", "fields": "id,customer_phone_e164,sip_status"
+    })
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["id"] for row in rows] == ids[::-1]
+    assert rows[-1] == {"id": ids[0], "customer_phone_e164": "+919000000000", "sip_status": None}
+
+
+def test_unknown_fields_are_refused(client):
+    response = client.get("/admin/api/calls", query_string={"fields": "id,password"})
+    assert response.status_code == 400
+
+
+def test_login_is_required(web_app):
+    assert web_app.test_client().get("/admin/api/calls").status_code == 302
@@ -0,0 +1,109 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+
+from shared.admission import (
+    AdmissionController, AdmissionQueueFull, AdmissionTimeout, TrunkLimiter, classify_sip_status
+)
+
+
+@pytest.mark.parametrize("code, kind", [
+    (503, "congestion"), ("480", "congestion"), (486, "busy"), (600, "busy"),
+    (404, "rejected"), (603, "rejected"), (200, "other"), (None, "other"), ("abc", "other"),
+])
+def test_classify_sip_status(code, kind):
+    assert classify_sip_status(code) == kind
+
+
+def test_uncapped_limiter_keeps_no_leases(caplog):
+    async def main():
+        limiter = TrunkLimiter(lease_seconds=0)
+        for i in range(100):
+            await limiter.acquire(f"room-{i}")
+        limiter.release("room-0")
+        return limiter
+
+    limiter = asyncio.run(main())
+    assert limiter.active == 0
+    assert limiter.lease_keys() == []
+    assert "expired without a release" not in caplog.text
+
+
+def test_concurrency_cap_queues_until_release():
+    async def main():
+        limiter = TrunkLimiter(max_concurrent=2)
+        await limiter.acquire("a")
+        await limiter.acquire("b")
+        waiting = asyncio.ensure_future(limiter.acquire("c"))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        assert limiter.queued == 1
+
+        limiter.release("a")
+        await asyncio.wait_for(waiting, 1)
+        return sorted(limiter.lease_keys())
+
+    assert asyncio.run(main()) == ["b", "c"]
+
+
+def test_queue_wait_times_out():
+    async def main():
+        limiter = TrunkLimiter(max_concurrent=1)
+        await limiter.acquire("a")
+        with pytest.raises(AdmissionTimeout):
+            await limiter.acquire("b", timeout=0.05)
+        return limiter
+
+    limiter = asyncio.run(main())
+    assert limiter.queued == 0
+    assert limiter.lease_keys() == ["a"]
+
+
+def test_full_queue_is_refused():
+    async def main():
+        limiter = TrunkLimiter(max_concurrent=1, max_queue=1)
+        await limiter.acquire("a")
+        waiting = asyncio.ensure_future(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionQueueFull):
+            await limiter.acquire("c")
+        waiting.cancel()
+
+    asyncio.run(main())
+
+
+def test_unreleased_lease_expires(caplog):
+    async def main():
+        limiter = TrunkLimiter(max_concurrent=1, lease_seconds=0.05)
+        await limiter.acquire("a")
+        await asyncio.wait_for(limiter.acquire("b"), 1)
+        return limiter.lease_keys()
+
+    assert asyncio.run(main()) == ["b"]
+    assert "Trunk lease for a expired without a release" in caplog.text
+
+
+def test_calls_per_second_spaces_admissions():
+    async def main():
+        limiter = TrunkLimiter(calls_per_second=20, burst=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(3):
+            await limiter.acquire(f"room-{i}")
+        return loop.time() - started
+
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_controller_tracks_leases_per_trunk():
+    async def main():
+        controller = AdmissionController(max_concurrent=5)
+        await controller.acquire("trunk-a", "room-1")
+        await controller.acquire("trunk-b", "room-2")
+        controller.release("trunk-a", "room-1")
+        return controller
+
+    controller = asyncio.run(main())
+    assert controller.leases() == [("trunk-b", "room-2")]
+    assert controller.stats() == {"trunk-a": {"active": 0, "queued": 0}, "trunk-b": {"active": 1, "queued": 0}}
@@ -0,0 +1,79 @@
+# tests/test_assets.py
+import gzip
+
+import pytest
+from flask import Flask
+
+from web.assets import AssetPipeline, IMMUTABLE
+
+
+@pytest.fixture(scope="module")
+def asset_app():
+    app = Flask(__name__)
+    app.extensions["test_assets"] = AssetPipeline(app, max_age=300)
+    return app
+
+
+@pytest.fixture
+def pipeline(asset_app):
+    return asset_app.extensions["test_assets"]
+
+
+@pytest.fixture
+def client(asset_app):
+    return asset_app.test_client()
+
+
+def test_stable_url_is_cached_briefly_with_a_strong_etag(client, pipeline):
+    response = client.get("/widget/call-widget.js", headers={"Accept-Encoding": "identity"})
+    asset = pipeline._assets["widget/call-widget.js"]
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+    assert response.headers["ETag"] == f'"{asset.digest[:32]}"'
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.data == asset.body
+
+
+def test_fingerprinted_url_is_immutable(client, pipeline):
+    asset = pipeline._assets["widget/call-widget.js"]
+    response = client.get(f"/assets/{asset.hashed}")
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE
+    assert client.get("/assets/widget/call-widget.000000000000.js").status_code == 404
+
+
+def test_each_encoding_gets_its_own_etag(client, pipeline):
+    asset = pipeline._assets["widget/call-widget.js"]
+    response = client.get("/widget/call-widget.js", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == f'"{asset.digest[:32]}-gzip"'
+    assert gzip.decompress(response.data) == asset.body
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip"])
+def test_matching_etag_of_any_encoding_is_not_modified(client, pipeline, encoding):
+    identity_etag = client.get("/widget/call-widget.js", headers={"Accept-Encoding": "identity"}).headers["ETag"]
+    gzip_etag = client.get("/widget/call-widget.js", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+
+    for etag in (identity_etag, gzip_etag, f'W/{gzip_etag}', f'"other", {identity_etag}', "*"):
+        response = client.get("/widget/call-widget.js",
+                              headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+        assert response.status_code == 304, etag
+        assert response.data == b""
+        assert response.headers["ETag"]
+
+
+def test_stale_etag_gets_the_body(client):
+    response = client.get("/widget/call-widget.js", headers={"If-None-Match": '"0123456789abcdef"'})
+    assert response.status_code == 200
+    assert response.data
+
+
+def test_stylesheet_reference_is_rewritten_to_its_fingerprinted_url(pipeline):
+    loader = pipeline._assets["widget/call-widget.js"].body.decode()
+    stylesheet = pipeline._assets["widget/style.css"]
+    assert f"/assets/{stylesheet.hashed}" in loader
+    assert "/widget/style.css" not in loader
@@ -0,0 +1,55 @@
+# tests/test_bulk.py
+import asyncio
+import json
+import queue
+from concurrent.futures import Future
+
+from web import bulk
+from web.bulk import fan_out, stream_results
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream]
+
+
+def test_results_stream_as_they_finish_then_a_summary():
+    async def dispatch_one(index, lead):
+        if lead["phone"] == "bad":
+            raise ValueError("invalid phone")
+        return {"index": index, "success": True}
+
+    leads = [{"phone": "+911"}, {"phone": "bad"}, {"phone": "+912"}]
+    results = queue.Queue()
+    future = Future()
+    future.set_result(asyncio.run(fan_out(leads, dispatch_one, results, concurrency=2)))
+
+    streamed = lines(stream_results(results, future, len(leads)))
+    assert sorted(line["index"] for line in streamed[:-1]) == [0, 1, 2]
+    assert streamed[-1] == {"summary": {"total": 3, "succeeded": 2, "failed": 1}}
+
+
+def test_dispatch_that_never_started_ends_the_stream(monkeypatch):
+    monkeypatch.setattr(bulk, "RESULT_WAIT", 0.01)
+    future = Future()
+    future.set_exception(RuntimeError("event loop stopped"))
+
+    streamed = lines(stream_results(queue.Queue(), future, 2))
+    assert streamed == [
+        {"error": "Bulk dispatch stopped: event loop stopped"},
+        {"summary": {"total": 2, "succeeded": 0, "failed": 0}},
+    ]
+
+
+def test_cancelled_dispatch_ends_the_stream(monkeypatch):
+    monkeypatch.setattr(bulk, "RESULT_WAIT", 0.01)
+    results = queue.Queue()
+    results.put({"index": 0, "success": True})
+    future = Future()
+    future.cancel()
+
+    streamed = lines(stream_results(results, future, 2))
+    assert streamed == [
+        {"index": 0, "success": True},
+        {"error": "Bulk dispatch stopped: cancelled"},
+        {"summary": {"total": 2, "succeeded": 1, "failed": 0}},
+    ]
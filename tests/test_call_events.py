@@ -0,0 +1,69 @@
+# tests/test_call_events.py
+import datetime
+import threading
+import time
+
+from shared.call_events import ANSWERED, HANGUP
+from shared.database import db, CallRecord, get_call_counters
+from shared.ids import new_ulid
+from web.call_events import CallEvent, CallEventIngestor, ROOM_FINISHED
+
+START = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def add_calls(app, count):
+    rooms = [f"test-{new_ulid()}" for _ in range(count)]
+    with app.app_context():
+        db.session.add_all(
+            CallRecord(room_name=room, customer_name="Test", customer_phone="+919000000000", status="pending")
+            for room in rooms
+        )
+        db.session.commit()
+    return rooms
+
+
+class SlowIngestor(CallEventIngestor):
+    """Pauses between reading the rows and writing them back"""
+
+    def __init__(self, app):
+        super().__init__(app, flush_interval=60)
+        self.reading = threading.Event()
+
+    def _resolve(self, row, room):
+        self.reading.set()
+        time.sleep(0.01)
+        return super()._resolve(row, room)
+
+
+def test_workers_do_not_overwrite_each_others_updates(app):
+    """The pickup and the hangup of each call reach two ingestors (two workers) at once"""
+    rooms = add_calls(app, 20)
+    with app.app_context():
+        before = get_call_counters()
+    answered, hung_up = SlowIngestor(app), CallEventIngestor(app, flush_interval=60)
+    for room in rooms:
+        answered.submit([CallEvent(room, ANSWERED, START)])
+        hung_up.submit([CallEvent(room, HANGUP, START + datetime.timedelta(seconds=30))])
+
+    first = threading.Thread(target=answered.flush)
+    first.start()
+    answered.reading.wait()
+    hung_up.flush()  # while the first batch is between its read and its write
+    first.join()
+    answered.stop(), hung_up.stop()
+
+    with app.app_context():
+        calls = CallRecord.query.filter(CallRecord.room_name.in_(rooms)).all()
+        assert {(call.status, call.call_start, call.duration) for call in calls} == {("completed", START, 30.0)}
+        after = get_call_counters()
+    assert after["completed"] - before.get("completed", 0) == len(rooms)
+    assert before["pending"] - after["pending"] == len(rooms)
+
+
+def test_ended_sees_calls_ended_by_any_ingestor(app):
+    ended_room, live_room = add_calls(app, 2)
+    other_worker = CallEventIngestor(app)
+    other_worker.submit([CallEvent(ended_room, ROOM_FINISHED, START)])
+    other_worker.stop()
+
+    assert CallEventIngestor(app).ended([ended_room, live_room]) == {ended_room}
@@ -0,0 +1,121 @@
+# tests/test_call_writer.py
+import datetime
+import time
+from collections import Counter
+
+import pytest
+from sqlalchemy import update
+
+from shared.database import db, CallRecord, CallRollup, get_call_counters
+from shared.ids import new_ulid
+from web.call_writer import CallRecordWriter
+
+
+@pytest.fixture
+def writer(app):
+    writer = CallRecordWriter(app, batch_size=3, flush_interval=60)
+    committed = []
+    writer.add_commit_listener(lambda rows, deltas: committed.append(([row["room_name"] for row in rows], deltas)))
+    writer.committed = committed
+    yield writer
+    writer.stop()
+
+
+def row(minute, **fields):
+    fields.setdefault("room_name", f"test-{new_ulid()}")
+    fields.setdefault("created_at", datetime.datetime(2001, 1, 1) + datetime.timedelta(minutes=minute))
+    return dict(customer_name="Test", customer_phone="+919000000000", **fields)
+
+
+def stored(app, rooms):
+    with app.app_context():
+        return {call.room_name: call.status for call in CallRecord.query.filter(CallRecord.room_name.in_(rooms))}
+
+
+def counters(app):
+    with app.app_context():
+        return Counter(get_call_counters())
+
+
+def requested_in_minute(app, minute):
+    with app.app_context():
+        rollup = db.session.get(CallRollup, ("minute", datetime.datetime(2001, 1, 1) + datetime.timedelta(minutes=minute)))
+        return rollup.requested if rollup is not None else 0
+
+
+def test_rows_are_written_in_batches(app, writer):
+    rows = [row(1) for _ in range(4)]
+    for r in rows:
+        writer.record(**r)
+
+    # The full batch of three is written without waiting for the flush interval
+    deadline = time.monotonic() + 5
+    while not writer.committed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [len(rooms) for rooms, _ in writer.committed] == [3]
+    assert writer.pending() == 0
+
+    writer.stop()  # flushes the fourth
+    assert [len(rooms) for rooms, _ in writer.committed] == [3, 1]
+    assert stored(app, [r["room_name"] for r in rows]) == {r["room_name"]: "pending" for r in rows}
+
+
+def test_counters_and_rollups_are_written_with_the_rows(app, writer):
+    before = counters(app)
+    rows = [row(2), row(2), row(2, status="failed", sip_status="486")]
+    for r in rows:
+        writer.record(**r)
+    writer.stop()
+
+    after = counters(app)
+    after.subtract(before)
+    assert +after == Counter({"pending": 2, "failed": 1, "total": 3})
+    assert requested_in_minute(app, 2) == 3
+    assert writer.committed[0][1] == Counter({"pending": 2, "failed": 1})
+
+
+def test_failed_batch_is_retried_row_by_row(app, writer):
+    duplicate = row(3)
+    writer.record(**duplicate)
+    writer.stop()
+
+    before = counters(app)
+    rows = [row(4), row(4, room_name=duplicate["room_name"]), row(4)]
+    for r in rows:
+        writer.record(**r)
+    writer.stop()
+
+    good = [rows[0]["room_name"], rows[2]["room_name"]]
+    assert stored(app, good) == {room: "pending" for room in good}
+    after = counters(app)
+    after.subtract(before)
+    assert +after == Counter({"pending": 2, "total": 2})
+    assert requested_in_minute(app, 4) == 2
+    assert [rooms for rooms, _ in writer.committed[1:]] == [[good[0]], [good[1]]]
+
+
+def test_rows_are_not_kept_when_their_counters_cannot_be_written(app, writer, monkeypatch):
+    def fail(rows):
+        raise RuntimeError("rollups unavailable")
+
+    monkeypatch.setattr(CallRecordWriter, "_rollups", staticmethod(fail))
+    before = counters(app)
+    rows = [row(5), row(5)]
+    for r in rows:
+        writer.record(**r)
+    writer.stop()
+
+    assert stored(app, [r["room_name"] for r in rows]) == {}
+    assert counters(app) == before
+    assert writer.committed == []
+
+
+def test_deferred_writes_ride_along_after_the_inserts(app, writer):
+    first = row(6)
+    writer.record(**first)
+    writer.defer(update(CallRecord).where(CallRecord.room_name == first["room_name"]).values(dispatch_id="dispatch-1"))
+    writer.stop()
+
+    assert len(writer.committed) == 1
+    with app.app_context():
+        assert CallRecord.query.filter_by(room_name=first["room_name"]).one().dispatch_id == "dispatch-1"
@@ -0,0 +1,63 @@
+# tests/test_counters.py
+from collections import Counter
+
+from shared.database import db, CallRecord, get_call_counters
+from shared.ids import new_ulid
+
+
+def counter_change(app, action):
+    """Per-status change of call_counters across `action()`"""
+    with app.app_context():
+        before = Counter(get_call_counters())
+    action()
+    with app.app_context():
+        after = Counter(get_call_counters())
+    after.subtract(before)
+    return {status: delta for status, delta in after.items() if delta}
+
+
+def add_call(app, status="pending"):
+    room = f"test-{new_ulid()}"
+    with app.app_context():
+        db.session.add(CallRecord(room_name=room, customer_name="Test", customer_phone="+919000000000", status=status))
+        db.session.commit()
+    return room
+
+
+def set_status(app, room, status):
+    with app.app_context():
+        CallRecord.query.filter_by(room_name=room).one().status = status
+        db.session.commit()
+
+
+def test_new_calls_are_counted(app):
+    assert counter_change(app, lambda: add_call(app)) == {"pending": 1, "total": 1}
+
+
+def test_status_change_after_a_commit_moves_the_count(app):
+    room = add_call(app)
+    assert counter_change(app, lambda: set_status(app, room, "completed")) == {"pending": -1, "completed": 1}
+
+
+def test_status_change_of_an_expired_instance_moves_the_count(app):
+    room = add_call(app)
+
+    def change():
+        with app.app_context():
+            call = CallRecord.query.filter_by(room_name=room).one()
+            db.session.commit()  # expires every attribute, status included
+            call.status = "failed"
+            db.session.commit()
+
+    assert counter_change(app, change) == {"pending": -1, "failed": 1}
+
+
+def test_deleted_calls_are_uncounted(app):
+    room = add_call(app, status="completed")
+
+    def delete():
+        with app.app_context():
+            db.session.delete(CallRecord.query.filter_by(room_name=room).one())
+            db.session.commit()
+
+    assert counter_change(app, delete) == {"completed": -1, "total": -1}
@@ -0,0 +1,103 @@
+# tests/test_dedupe.py
+import datetime
+
+import pytest
+
+from shared.database import db, CallRecord, DialClaim
+from shared.ids import new_ulid
+from web.call_writer import CallRecordWriter
+from web.dedupe import DialDeduplicator
+
+
+def number():
+    return f"+91{new_ulid()[-10:]}"
+
+
+@pytest.fixture
+def writer(app):
+    writer = CallRecordWriter(app)
+    yield writer
+    writer.stop()
+
+
+def deduplicator(app, writer, **kwargs):
+    return DialDeduplicator(app, writer=writer, **kwargs)
+
+
+def test_repeat_request_is_pending_until_the_dispatch_succeeds(app, writer):
+    dedupe, phone = deduplicator(app, writer), number()
+
+    assert dedupe.claim(phone, "room-1") is None
+    assert dedupe.claim(phone, "room-2") == {"room_name": "room-1", "dispatch_id": None, "pending": True}
+
+    dedupe.confirm(phone, "room-1", "AD_1")
+    assert dedupe.claim(phone, "room-2") == {"room_name": "room-1", "dispatch_id": "AD_1", "pending": False}
+
+
+def test_repeat_request_within_the_cache_ttl_never_reaches_the_database(app, writer, monkeypatch):
+    dedupe, phone = deduplicator(app, writer), number()
+    dedupe.claim(phone, "room-1")
+    dedupe.confirm(phone, "room-1", "AD_1")
+
+    def no_database(*args):
+        raise AssertionError("the database was queried")
+
+    monkeypatch.setattr(dedupe, "_claim_in_db", no_database)
+    assert dedupe.claim(phone, "room-2")["room_name"] == "room-1"
+    assert dedupe.claim(phone, "room-3")["room_name"] == "room-1"
+
+
+def test_confirmation_is_written_behind(app, writer):
+    dedupe, phone = deduplicator(app, writer), number()
+    dedupe.claim(phone, "room-1")
+    dedupe.confirm(phone, "room-1", "AD_1")
+    writer.stop()
+
+    with app.app_context():
+        claim = db.session.get(DialClaim, phone)
+        assert claim.dispatch_id == "AD_1" and claim.dispatched_at is not None
+
+
+def test_claims_are_shared_between_workers(app, writer):
+    phone = number()
+    assert deduplicator(app, writer).claim(phone, "room-1") is None
+    assert deduplicator(app, writer).claim(phone, "room-2")["room_name"] == "room-1"
+
+
+def test_failed_dispatch_can_be_retried(app, writer):
+    dedupe, phone = deduplicator(app, writer), number()
+    dedupe.claim(phone, "room-1")
+    dedupe.release(phone, "room-1")
+    assert dedupe.claim(phone, "room-2") is None
+
+
+def test_failed_call_can_be_retried_once_the_cache_entry_is_gone(app, writer):
+    dedupe, phone, room = deduplicator(app, writer), number(), f"test-{new_ulid()}"
+    dedupe.claim(phone, room)
+    dedupe.confirm(phone, room, None)
+    writer.stop()
+    with app.app_context():
+        db.session.add(CallRecord(room_name=room, customer_name="Test", customer_phone=phone, status="failed"))
+        db.session.commit()
+
+    # Another worker never cached the claim; this one drops it on the SIP failure
+    assert deduplicator(app, writer).claim(phone, "room-2") is None
+    dedupe.forget(room)
+    assert dedupe.claim(phone, "room-3")["room_name"] == "room-2"
+
+
+def test_claims_expire_after_the_window(app, writer):
+    dedupe, phone = deduplicator(app, writer, window=60, cache_ttl=0), number()
+    dedupe.claim(phone, "room-1")
+    with app.app_context():
+        claim = db.session.get(DialClaim, phone)
+        claim.expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+        db.session.commit()
+
+    assert dedupe.claim(phone, "room-2") is None
+
+
+def test_window_of_zero_disables_the_check(app, writer):
+    dedupe, phone = deduplicator(app, writer, window=0), number()
+    assert dedupe.claim(phone, "room-1") is None
+    assert dedupe.claim(phone, "room-2") is None
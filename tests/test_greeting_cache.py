@@ -0,0 +1,119 @@
+# tests/test_greeting_cache.py
+import asyncio
+import os
+from types import SimpleNamespace
+
+from livekit import rtc
+
+from agent.greeting_cache import GreetingAudioCache, iter_frames
+
+SAMPLE_RATE = 24000
+
+
+class StubTTS:
+    """Yields one 100ms frame per character; counts syntheses"""
+
+    def __init__(self, fail=False, delay=0.0):
+        self.calls = []
+        self.fail = fail
+        self.delay = delay
+
+    def synthesize(self, text):
+        self.calls.append(text)
+        return self._stream(text)
+
+    async def _stream(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("TTS unavailable")
+        samples = SAMPLE_RATE // 10
+        for _ in text:
+            frame = rtc.AudioFrame(data=b"\x01\x00" * samples, sample_rate=SAMPLE_RATE,
+                                   num_channels=1, samples_per_channel=samples)
+            yield SimpleNamespace(frame=frame)
+
+
+def make_cache(tmp_path=None, **kwargs):
+    return GreetingAudioCache(voice_key="stub|voice", cache_dir=str(tmp_path) if tmp_path else None, **kwargs)
+
+
+def test_miss_synthesizes_then_hits_memory():
+    cache, tts = make_cache(), StubTTS()
+
+    async def run():
+        first = await cache.get_audio("Hello", tts)
+        second = await cache.get_audio("Hello", tts)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert tts.calls == ["Hello"]
+    assert second is first
+    assert len(first.pcm) == 5 * SAMPLE_RATE // 10 * 2
+
+
+def test_concurrent_requests_share_one_synthesis():
+    cache, tts = make_cache(), StubTTS(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_audio("Hi", tts) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert tts.calls == ["Hi"]
+    assert all(result is results[0] for result in results)
+
+
+def test_disk_cache_survives_a_new_process(tmp_path):
+    tts = StubTTS()
+    audio = asyncio.run(make_cache(tmp_path).get_audio("Welcome", tts))
+
+    reloaded = asyncio.run(make_cache(tmp_path).get_audio("Welcome", tts))
+    assert tts.calls == ["Welcome"]
+    assert reloaded.pcm == audio.pcm
+    assert (reloaded.sample_rate, reloaded.num_channels) == (SAMPLE_RATE, 1)
+
+
+def test_voice_is_part_of_the_key(tmp_path):
+    tts = StubTTS()
+    asyncio.run(make_cache(tmp_path).get_audio("Welcome", tts))
+    other = GreetingAudioCache(voice_key="stub|other", cache_dir=str(tmp_path))
+    asyncio.run(other.get_audio("Welcome", tts))
+    assert tts.calls == ["Welcome", "Welcome"]
+
+
+def test_memory_lru_and_disk_eviction(tmp_path):
+    cache, tts = make_cache(tmp_path, max_entries=2, max_disk_entries=2), StubTTS()
+
+    async def run():
+        for text in ("a", "b", "c"):
+            await cache.get_audio(text, tts)
+
+    asyncio.run(run())
+    assert len(cache._memory) == 2
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".wav")]) == 2
+
+
+def test_unreadable_file_is_discarded(tmp_path):
+    cache, tts = make_cache(tmp_path), StubTTS()
+    with open(cache._path(cache._key("Broken")), "wb") as f:
+        f.write(b"not a wav file")
+
+    asyncio.run(cache.get_audio("Broken", tts))
+    assert tts.calls == ["Broken"]
+
+
+def test_load_returns_none_when_synthesis_fails():
+    cache = make_cache()
+    assert asyncio.run(cache.load(["Hello", "there"], StubTTS(fail=True))) is None
+
+
+def test_cached_audio_replays_in_20ms_frames():
+    cache, tts = make_cache(), StubTTS()
+
+    async def run():
+        audio = await cache.get_audio("ab", tts)
+        return [frame async for frame in iter_frames([audio])]
+
+    frames = asyncio.run(run())
+    assert len(frames) == 10  # 200ms of audio
+    assert all(frame.samples_per_channel == SAMPLE_RATE // 50 for frame in frames)
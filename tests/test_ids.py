@@ -0,0 +1,56 @@
+# tests/test_ids.py
+import datetime
+import re
+
+from shared import ids
+from shared.ids import ULIDGenerator, new_ulid, ulid_datetime
+
+
+def test_ulids_are_crockford_base32_and_carry_their_time():
+    before = datetime.datetime.utcnow().replace(microsecond=0)
+    ulid = new_ulid()
+    assert re.fullmatch(r"[0-9A-HJKMNP-TV-Z]{26}", ulid)
+    assert before <= ulid_datetime(ulid) <= datetime.datetime.utcnow()
+
+
+def test_ulids_within_one_millisecond_are_strictly_increasing(monkeypatch):
+    monkeypatch.setattr(ids.time, "time_ns", lambda: 1_700_000_000_000 * 1_000_000)
+    generator = ULIDGenerator()
+    generated = [generator.new() for _ in range(1000)]
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+    assert {ulid[:10] for ulid in generated} == {generated[0][:10]}
+
+
+def test_ulids_stay_ordered_when_the_clock_steps_back(monkeypatch):
+    clock = iter([2_000, 1_000, 1_000, 3_000])
+    monkeypatch.setattr(ids.time, "time_ns", lambda: next(clock) * 1_000_000)
+    generator = ULIDGenerator()
+    generated = [generator.new() for _ in range(4)]
+    assert generated == sorted(generated)
+    assert len(set(generated)) == 4
+
+
+def test_later_milliseconds_sort_later(monkeypatch):
+    clock = iter(range(1_000, 1_100))
+    monkeypatch.setattr(ids.time, "time_ns", lambda: next(clock) * 1_000_000)
+    generator = ULIDGenerator()
+    generated = [generator.new() for _ in range(100)]
+    assert generated == sorted(generated)
+
+
+def test_random_part_overflow_moves_to_the_next_millisecond(monkeypatch):
+    monkeypatch.setattr(ids.time, "time_ns", lambda: 5_000 * 1_000_000)
+    monkeypatch.setattr(ids.os, "urandom", lambda n: b"\xff" * n)
+    generator = ULIDGenerator()
+    first, second = generator.new(), generator.new()
+    assert second > first
+    assert ulid_datetime(second) - ulid_datetime(first) == datetime.timedelta(milliseconds=1)
+
+
+def test_reset_after_fork_forgets_the_sequence(monkeypatch):
+    monkeypatch.setattr(ids.time, "time_ns", lambda: 5_000 * 1_000_000)
+    generator = ULIDGenerator()
+    generator.new()
+    generator.reset_after_fork()
+    assert generator._last_ms == -1
@@ -0,0 +1,100 @@
+# tests/test_live.py
+import datetime
+import json
+import time
+
+from shared.database import db, CallRecord, get_call_counters
+from shared.ids import new_ulid
+from web.live import ChangeFeed
+
+
+def add_call(app, **fields):
+    room = f"test-{new_ulid()}"
+    with app.app_context():
+        db.session.add(CallRecord(room_name=room, customer_name="Test", customer_phone="+919000000000", **fields))
+        db.session.commit()
+    return room
+
+
+def events(chunk):
+    """(event, data) pairs in a chunk of SSE text"""
+    parsed = []
+    for message in chunk.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.split("\n") if ": " in line)
+        if "event" in lines:
+            parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def events_until(stream, room):
+    """Every event streamed up to the batch that includes the call in `room`"""
+    found = []
+    for chunk in stream:
+        batch = events(chunk)
+        found += batch
+        if ("call", room) in [(kind, data.get("room_name")) for kind, data in batch]:
+            return found
+    raise AssertionError(f"{room} was never streamed")
+
+
+def open_stream(app):
+    feed = ChangeFeed(poll_interval=0.05, heartbeat=0.1, max_age=5)
+    feed.app = app
+    stream = feed.stream(feed.current())
+    next(stream)  # retry:
+    return feed, stream
+
+
+def test_changes_committed_by_another_worker_are_streamed(app):
+    feed, stream = open_stream(app)
+    try:
+        room = add_call(app, status="pending")  # not through this process's writer
+
+        found = events_until(stream, room)
+        with app.app_context():
+            assert found[-1] == ("counters", get_call_counters())
+    finally:
+        feed.close()
+        stream.close()
+
+
+def test_late_commit_with_an_older_timestamp_is_not_missed(app):
+    feed, stream = open_stream(app)
+    try:
+        events_until(stream, add_call(app))
+        # Stamped before the row above, committed after it
+        late = add_call(app, updated_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=2))
+
+        events_until(stream, late)
+    finally:
+        feed.close()
+        stream.close()
+
+
+def test_tailing_parks_without_streams_and_resumes(app):
+    feed, stream = open_stream(app)
+    feed.idle_timeout = 0.2
+    polls = []
+    poll = feed._poll
+    feed._poll = lambda cursor, seen: polls.append(cursor) or poll(cursor, seen)
+    try:
+        events_until(stream, add_call(app))
+        last_seen = feed.current()
+        stream.close()
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            parked_at = len(polls)
+            time.sleep(0.3)
+            if len(polls) == parked_at:
+                break
+        else:
+            raise AssertionError("the feed kept polling without streams")
+        assert feed.resume_point(f"{feed._epoch}-{last_seen}") is None
+
+        stream = feed.stream(feed.current())
+        next(stream)
+        events_until(stream, add_call(app))
+    finally:
+        feed.close()
+        stream.close()
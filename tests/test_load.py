@@ -0,0 +1,58 @@
+# tests/test_load.py
+import asyncio
+from types import SimpleNamespace
+
+from agent import load
+from agent.load import WorkerLoad
+
+
+class StubRequest:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.answer = None
+
+    async def accept(self):
+        self.answer = "accepted"
+
+    async def reject(self, terminate=True):
+        self.answer = "terminated" if terminate else "declined"
+
+
+def worker(*job_ids):
+    return SimpleNamespace(active_jobs=[SimpleNamespace(job=SimpleNamespace(id=job_id)) for job_id in job_ids])
+
+
+def burst(tracker, count):
+    async def run():
+        requests = [StubRequest(f"job-{i}") for i in range(count)]
+        await asyncio.gather(*(tracker.request_fnc(request) for request in requests))
+        return [request.answer for request in requests]
+    return asyncio.run(run())
+
+
+def test_burst_between_refreshes_stops_at_max_calls():
+    tracker = WorkerLoad(max_calls=2, max_loop_lag=0, max_cpu=0)
+    tracker.load_fnc(worker())
+
+    assert burst(tracker, 5) == ["accepted", "accepted", "declined", "declined", "declined"]
+    assert tracker.load == 1.0
+
+
+def test_refresh_does_not_count_a_job_twice():
+    tracker = WorkerLoad(max_calls=4, max_loop_lag=0, max_cpu=0)
+    burst(tracker, 2)
+
+    assert tracker.load_fnc(worker("job-0", "job-1")) == 0.5
+    assert tracker.active_calls == 2
+    assert tracker.load_fnc(worker("job-1")) == 0.25
+
+
+def test_accepted_job_that_never_runs_is_forgotten(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(load.time, "monotonic", lambda: now[0])
+    tracker = WorkerLoad(max_calls=2, max_loop_lag=0, max_cpu=0)
+    assert tracker.reserve("job-0") is None
+
+    assert tracker.load_fnc(worker()) == 0.5
+    now[0] += load.ACCEPTED_JOB_TIMEOUT
+    assert tracker.load_fnc(worker()) == 0.0
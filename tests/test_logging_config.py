@@ -0,0 +1,27 @@
+# tests/test_logging_config.py
+import logging
+import os
+
+from shared import logging_config
+from shared.logging_config import configure_logging, use_per_process_log_files
+
+
+def test_workers_log_to_a_file_of_their_own(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_config, "_file_handlers", [])
+    logger = configure_logging("worker-test", log_dir=str(tmp_path))
+    logger.warning("before fork")
+
+    use_per_process_log_files()
+    logger.warning("in worker")
+    for handler in logger.handlers:
+        handler.flush()
+
+    shared_log = (tmp_path / "worker-test.log").read_text()
+    own_log = (tmp_path / f"worker-test.{os.getpid()}.log").read_text()
+    assert "before fork" in shared_log and "in worker" not in shared_log
+    assert "in worker" in own_log
+
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+    logging.Logger.manager.loggerDict.pop("worker-test", None)
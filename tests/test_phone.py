@@ -0,0 +1,30 @@
+# tests/test_phone.py
+import pytest
+
+from shared.phone import InvalidPhoneNumber, normalize_phone
+
+
+@pytest.mark.parametrize("raw, region, expected", [
+    ("+91 98765 43210", None, "+919876543210"),
+    ("+1 (415) 555-2671", "IN", "+14155552671"),
+    ("098765 43210", "IN", "+919876543210"),
+    ("98765-43210", "IN", "+919876543210"),
+    ("(415) 555-2671", "US", "+14155552671"),
+])
+def test_numbers_are_normalised_to_e164(raw, region, expected):
+    assert normalize_phone(raw, region) == expected
+
+
+@pytest.mark.parametrize("raw, region", [
+    ("98765 43210", None),  # national number without a default region
+    ("not a number", "IN"),
+    ("+91 12345", None),
+    ("", "IN"),
+])
+def test_invalid_numbers_are_refused(raw, region):
+    with pytest.raises(InvalidPhoneNumber):
+        normalize_phone(raw, region)
+
+
+def test_invalid_number_is_a_value_error():
+    assert issubclass(InvalidPhoneNumber, ValueError)
@@ -0,0 +1,209 @@
+# tests/test_response_cache.py
+import asyncio
+
+import pytest
+from livekit.agents import llm
+
+from agent import response_cache
+from agent.response_cache import (
+    NAME_PLACEHOLDER, ResponseCache, TokenSimilarityIndex, cacheable_question, cached_llm_stream,
+    normalize_question
+)
+
+SCOPE = "scope"
+PHONE = "+919812345678"
+
+
+class StubLLM:
+    """Streams a fixed answer word by word; counts calls"""
+
+    def __init__(self, answer="Plans start at ten dollars.", tool_call=False):
+        self.answer = answer
+        self.tool_call = tool_call
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self._stream()
+
+    async def _stream(self):
+        for word in self.answer.split(" "):
+            yield word + " "
+        if self.tool_call:
+            yield llm.ChatChunk(id="1", delta=llm.ChoiceDelta(
+                role="assistant",
+                tool_calls=[llm.FunctionToolCall(name="lookup", arguments="{}", call_id="c1")],
+            ))
+
+
+async def ask(cache, question, generate, name="Ravi", phone=PHONE):
+    chunks = [chunk async for chunk in cached_llm_stream(
+        cache, SCOPE, normalize_question(question), generate, name=name, phone=phone
+    )]
+    await cache.drain()
+    return "".join(chunk for chunk in chunks if isinstance(chunk, str)).strip()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_normalisation_ignores_case_punctuation_and_fillers():
+    assert normalize_question("Um, what are your PRICES?") == "what are your prices"
+    assert normalize_question("okay so... what are your prices") == "what are your prices"
+
+
+def test_miss_calls_the_llm_then_hit_skips_it():
+    cache, stub = ResponseCache(), StubLLM()
+
+    assert run(ask(cache, "What are your prices?", stub)) == "Plans start at ten dollars."
+    assert run(ask(cache, "um, what are your prices", stub)) == "Plans start at ten dollars."
+    assert stub.calls == 1
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_hit_is_one_string_for_tts():
+    cache = ResponseCache()
+    run(ask(cache, "hours?", StubLLM("Nine to five.")))
+
+    async def chunks():
+        return [c async for c in cached_llm_stream(cache, SCOPE, "hours", StubLLM())]
+
+    assert run(chunks()) == ["Nine to five."]
+
+
+def test_scope_separates_prompts():
+    cache, stub = ResponseCache(), StubLLM()
+    run(ask(cache, "prices", stub))
+
+    async def other_scope():
+        return [c async for c in cached_llm_stream(cache, "other", "prices", stub)]
+
+    run(other_scope())
+    assert stub.calls == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache, stub = ResponseCache(path=str(tmp_path / "r.sqlite"), ttl=60), StubLLM()
+
+    run(ask(cache, "prices", stub))
+    now[0] += 59
+    run(ask(cache, "prices", stub))
+    assert stub.calls == 1
+
+    now[0] += 2
+    run(ask(cache, "prices", stub))
+    assert stub.calls == 2
+
+
+def test_expired_disk_entry_is_a_miss(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "r.sqlite")
+    run(ask(ResponseCache(path=path, ttl=60), "prices", StubLLM()))
+
+    now[0] += 61
+    stub = StubLLM()
+    run(ask(ResponseCache(path=path, ttl=60), "prices", stub))
+    assert stub.calls == 1
+
+
+def test_disk_store_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "r.sqlite")
+    run(ask(ResponseCache(path=path), "prices", StubLLM()))
+
+    stub = StubLLM()
+    assert run(ask(ResponseCache(path=path), "prices", stub)) == "Plans start at ten dollars."
+    assert stub.calls == 0
+
+
+def test_memory_is_lru_bounded():
+    cache = ResponseCache(max_entries=2)
+    for question in ("a", "b", "c"):
+        run(ask(cache, question, StubLLM()))
+    assert len(cache._memory) == 2
+
+    stub = StubLLM()
+    run(ask(cache, "a", stub))
+    assert stub.calls == 1
+
+
+def test_disk_is_trimmed_to_max_disk_entries(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "r.sqlite"), max_disk_entries=2)
+    for question in ("a", "b", "c"):
+        run(ask(cache, question, StubLLM()))
+    assert cache._db().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 2
+
+
+def test_tool_calls_are_never_stored():
+    cache = ResponseCache()
+    run(ask(cache, "book me a slot", StubLLM("Let me check.", tool_call=True)))
+    assert cache.stats["stores"] == 0
+
+
+def test_interrupted_answers_are_never_stored():
+    cache = ResponseCache()
+
+    async def interrupted():
+        stream = cached_llm_stream(cache, SCOPE, "prices", StubLLM("one two three four"))
+        async for _ in stream:
+            break  # the caller talked over the agent
+        await stream.aclose()
+
+    run(interrupted())
+    assert cache.stats["stores"] == 0
+
+
+def test_answers_with_the_phone_number_are_never_stored():
+    cache = ResponseCache()
+    run(ask(cache, "what number do you have", StubLLM("I have 98123 45678 on file.")))
+    assert cache.stats["stores"] == 0
+
+
+def test_caller_name_is_templated_out():
+    cache = ResponseCache()
+    run(ask(cache, "prices", StubLLM("Sure Ravi, plans start at ten."), name="Ravi"))
+    stored = next(iter(cache._memory.values())).text
+    assert "Ravi" not in stored and NAME_PLACEHOLDER in stored
+
+    assert run(ask(cache, "prices", StubLLM(), name="Asha")) == "Sure Asha, plans start at ten."
+    # Without a name to fill in, the answer is generated afresh
+    stub = StubLLM()
+    run(ask(cache, "prices", stub, name=""))
+    assert stub.calls == 1
+
+
+def test_similarity_index_matches_rewordings():
+    cache = ResponseCache(similarity=TokenSimilarityIndex(0.6))
+    run(ask(cache, "what are your monthly prices", StubLLM()))
+
+    stub = StubLLM()
+    assert run(ask(cache, "what are your monthly prices today", stub)) == "Plans start at ten dollars."
+    assert stub.calls == 0 and cache.stats["similar_hits"] == 1
+    run(ask(cache, "where is your office", stub))
+    assert stub.calls == 1
+
+
+def _chat(*messages):
+    ctx = llm.ChatContext()
+    for role, text in messages:
+        ctx.add_message(role=role, content=text)
+    return ctx
+
+
+@pytest.mark.parametrize("turns, expected", [
+    ([("system", "s"), ("assistant", "Hello!"), ("user", "What are your prices?")], "what are your prices"),
+    ([("system", "s"), ("user", "hi"), ("assistant", "Hello"), ("user", "prices?")], None),
+    ([("system", "s"), ("assistant", "Hello!")], None),
+])
+def test_only_the_opening_question_is_cacheable(turns, expected):
+    assert cacheable_question(_chat(*turns)) == expected
+
+
+def test_conversations_with_tool_calls_are_not_cacheable():
+    ctx = _chat(("system", "s"))
+    ctx.items.append(llm.FunctionCall(name="lookup", arguments="{}", call_id="c1"))
+    ctx.add_message(role="user", content="prices?")
+    assert cacheable_question(ctx) is None
@@ -0,0 +1,88 @@
+# tests/test_search.py
+from sqlalchemy import text
+
+from shared import database
+from shared.database import db, CallRecord, DatabaseFlag, TranscriptSegment, search_calls
+from shared.ids import new_ulid
+
+
+def add_call(name, lines=()):
+    room = f"test-{new_ulid()}"
+    call = CallRecord(room_name=room, customer_name=name, customer_phone="+919000000000", status="completed")
+    db.session.add(call)
+    db.session.add_all(
+        TranscriptSegment(room_name=room, seq=seq, speaker="customer", text=line) for seq, line in enumerate(lines)
+    )
+    db.session.commit()
+    return call.id
+
+
+def matches(search):
+    subquery = search_calls(search)
+    return [row.call_id for row in db.session.execute(db.select(subquery.c.call_id).order_by(subquery.c.score))]
+
+
+def test_calls_are_found_by_what_was_said(app):
+    assert database.search_index_enabled
+    with app.app_context():
+        call_id = add_call("Meera", ["Hello", "I want to cancel my subscription", "Thanks"])
+        add_call("Arjun", ["What are your opening hours"])
+
+        assert matches("cancel subscription") == [call_id]
+        assert matches("subscr") == [call_id]
+
+
+def test_one_match_per_call_and_name_ranks_above_transcript(app):
+    with app.app_context():
+        said = add_call("Kiran", ["Zanzibarian holiday please", "Zanzibarian again"])
+        named = add_call("Zanzibarian")
+
+        assert matches("zanzibarian") == [named, said]
+
+
+def test_words_may_be_spread_over_segments_and_fields(app):
+    with app.app_context():
+        spread = add_call("Priyanka", ["My router keeps dropping", "Only in the evening though"])
+        add_call("Rohan", ["My router is fine"])
+
+        assert matches("router evening") == [spread]
+        assert matches("priyanka dropping") == [spread]
+        assert matches("router tuesday") == []
+
+
+def test_legacy_row_compression_runs_once(app):
+    with app.app_context():
+        assert db.session.get(DatabaseFlag, "legacy_rows_compressed") is not None
+
+        def insert_plaintext_row():
+            room = f"test-{new_ulid()}"
+            db.session.execute(text(
+                "INSERT INTO call_records (room_name, customer_name, customer_phone, status, transcript, metadata) "
+                "VALUES (:room, 'Legacy', '+919000000000', 'completed', 'old transcript', '{\"a\": 1}')"
+            ), {"room": room})
+            db.session.commit()
+            return room
+
+        def storage(room):
+            return db.session.execute(text(
+                "SELECT typeof(transcript), typeof(metadata) FROM call_records WHERE room_name = :room"
+            ), {"room": room}).one()
+
+        legacy = insert_plaintext_row()
+        db.session.delete(db.session.get(DatabaseFlag, "legacy_rows_compressed"))
+        db.session.commit()
+
+        database._compress_legacy_rows()
+        assert tuple(storage(legacy)) == ("blob", "blob")
+        call = CallRecord.query.filter_by(room_name=legacy).one()
+        assert call.transcript == "old transcript"
+        assert call.call_metadata == '{"a": 1}'
+        db.session.remove()
+
+        # Once recorded as done, later startups do not scan the table again
+        later = insert_plaintext_row()
+        database._compress_legacy_rows()
+        assert tuple(storage(later)) == ("text", "text")
+
+        db.session.execute(text("DELETE FROM call_records WHERE room_name IN (:a, :b)"), {"a": legacy, "b": later})
+        db.session.commit()
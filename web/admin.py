@@ -1,17 +1,24 @@
 # web/admin.py
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from dotenv import load_dotenv
-from shared.database import db, CallRecord, AdminUser
+from sqlalchemy import tuple_
+from shared import database
+from shared.database import (
+    db, CallRecord, CallTimeline, AdminUser, get_call_counters, build_match_query, search_calls,
+    iter_transcript_lines
+)
+from shared.sketch import LatencyHistogram
+from shared.rollups import GRANULARITIES, query_rollups
+from agent.timeline import INTERVALS as TIMELINE_INTERVALS, TURN_METRICS
+from .config import SECRET_KEY, ADMIN_USERNAME, ADMIN_PASSWORD
+from .live import change_feed, StreamLimitReached, LIVE_CALL_FIELDS
+import base64
 import os
 import logging
 import datetime
 import json
 
-# Load environment variables
-load_dotenv()
-
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -36,15 +43,18 @@ def load_user(user_id):
 
 def init_admin(app):
     """Initialize admin functionality"""
+    # Sessions need a secret key; set SECRET_KEY so logins survive restarts
+    if not app.config.get('SECRET_KEY'):
+        app.config['SECRET_KEY'] = SECRET_KEY or os.urandom(24).hex()
     login_manager.init_app(app)
     app.register_blueprint(admin_bp)
     
     # Create default admin user if it doesn't exist
     with app.app_context():
-        if not AdminUser.query.filter_by(username=os.getenv('ADMIN_USERNAME', 'admin')).first():
+        if not AdminUser.query.filter_by(username=ADMIN_USERNAME).first():
             default_admin = AdminUser(
-                username=os.getenv('ADMIN_USERNAME', 'admin'),
-                password_hash=generate_password_hash(os.getenv('ADMIN_PASSWORD', 'admin'))
+                username=ADMIN_USERNAME,
+                password_hash=generate_password_hash(ADMIN_PASSWORD)
             )
             db.session.add(default_admin)
             db.session.commit()
@@ -55,20 +65,22 @@ def init_admin(app):
 @login_required
 def index():
     """Admin dashboard"""
-    # Get basic stats
-    total_calls = CallRecord.query.count()
-    completed_calls = CallRecord.query.filter_by(status='completed').count()
-    failed_calls = CallRecord.query.filter_by(status='failed').count()
+    # Get basic stats from the maintained counters rather than COUNT(*) scans
+    counters = get_call_counters()
+    total_calls = counters['total']
+    completed_calls = counters.get('completed', 0)
+    failed_calls = counters.get('failed', 0)
     
-    # Get recent calls (last 10)
-    recent_calls = CallRecord.query.order_by(CallRecord.created_at.desc()).limit(10).all()
+    # Get recent calls (served by the created_at index); later changes arrive over /api/stream
+    recent_calls = CallRecord.query.order_by(CallRecord.created_at.desc()).limit(RECENT_CALLS).all()
     
     return render_template(
         'admin/index.html', 
         total_calls=total_calls,
         completed_calls=completed_calls, 
         failed_calls=failed_calls,
-        recent_calls=recent_calls
+        recent_calls=recent_calls,
+        recent_limit=RECENT_CALLS
     )
 
 @admin_bp.route('/login', methods=['GET', 'POST'])
@@ -123,15 +135,22 @@ def calls():
     if status:
         query = query.filter_by(status=status)
     
-    if search:
+    if search and database.search_index_enabled and build_match_query(search):
+        # Ranked full-text search over the FTS5 index
+        matches = search_calls(search)
+        query = query.join(matches, CallRecord.id == matches.c.call_id)
+        query = query.order_by(matches.c.score, CallRecord.created_at.desc())
+    elif search:
         query = query.filter(
             (CallRecord.customer_name.like(f'%{search}%')) |
             (CallRecord.customer_phone.like(f'%{search}%')) |
             (CallRecord.customer_email.like(f'%{search}%'))
-        )
+        ).order_by(CallRecord.created_at.desc())
+    else:
+        query = query.order_by(CallRecord.created_at.desc())
     
     # Get paginated results
-    calls = query.order_by(CallRecord.created_at.desc()).paginate(page=page, per_page=per_page)
+    calls = query.paginate(page=page, per_page=per_page)
     
     return render_template('admin/calls.html', calls=calls)
 
@@ -140,14 +159,251 @@ def calls():
 def call_details(call_id):
     """View details of a specific call"""
     call = CallRecord.query.get_or_404(call_id)
-    return render_template('admin/call_details.html', call=call)
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', TRANSCRIPT_PAGE_SIZE, type=int), 500)
+    segments = call.segments_query().paginate(page=page, per_page=per_page, error_out=False)
+    return render_template('admin/call_details.html', call=call, segments=segments)
+
+@admin_bp.route('/calls/room/<room_name>')
+@login_required
+def call_by_room(room_name):
+    """Call details by room name (live updates only know the room of a new call)"""
+    call_id = db.session.query(CallRecord.id).filter_by(room_name=room_name).scalar()
+    if call_id is None:
+        flash('That call has not been saved yet', 'warning')
+        return redirect(url_for('admin.calls'))
+    return redirect(url_for('admin.call_details', call_id=call_id))
+
+@admin_bp.route('/calls/<int:call_id>/transcript.txt')
+@login_required
+def call_transcript(call_id):
+    """Download the full transcript, assembled from the segments as it streams out"""
+    call = CallRecord.query.get_or_404(call_id)
+    if call.transcript:
+        lines = iter([call.transcript])
+    else:
+        lines = iter_transcript_lines(call.room_name)
+    return Response(
+        stream_with_context(f"{line}\n" for line in lines),
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename="{call.room_name}.txt"'}
+    )
+
+TRANSCRIPT_PAGE_SIZE = 50
+
+# Fields the calls API can project; transcript is only returned when asked for
+API_CALL_FIELDS = {
+    'id': CallRecord.id,
+    'room_name': CallRecord.room_name,
+    'dispatch_id': CallRecord.dispatch_id,
+    'customer_name': CallRecord.customer_name,
+    'customer_phone': CallRecord.customer_phone,
+    'customer_phone_e164': CallRecord.customer_phone_e164,
+    'customer_email': CallRecord.customer_email,
+    'customer_query': CallRecord.customer_query,
+    'status': CallRecord.status,
+    'call_start': CallRecord.call_start,
+    'call_end': CallRecord.call_end,
+    'duration': CallRecord.duration,
+    'sip_status': CallRecord.sip_status,
+    'transcript': CallRecord.transcript,
+    'created_at': CallRecord.created_at,
+    'updated_at': CallRecord.updated_at,
+}
+DEFAULT_API_CALL_FIELDS = [name for name in API_CALL_FIELDS if name != 'transcript']
+API_CALLS_MAX_LIMIT = 500
+NDJSON_BATCH_SIZE = 1000
+
+def _encode_cursor(created_at, call_id):
+    raw = f"{created_at.isoformat()}|{call_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, call_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|', 1)
+    return datetime.datetime.fromisoformat(created_at), int(call_id)
+
+def _serialise_row(fields, row):
+    item = {}
+    for name, value in zip(fields, row):
+        item[name] = value.isoformat() if isinstance(value, datetime.datetime) else value
+    return item
 
 @admin_bp.route('/api/calls')
 @login_required
 def api_calls():
-    """API endpoint to get call data for AJAX requests"""
-    calls = CallRecord.query.order_by(CallRecord.created_at.desc()).all()
-    return jsonify([call.to_dict() for call in calls])
+    """Keyset-paginated call data, newest first
+
+    Query parameters:
+        fields: comma-separated list of fields to return (default: all but transcript)
+        limit: page size (JSON mode, max 500)
+        cursor: the next_cursor value from the previous page
+        status: only return calls with this status
+        format: "ndjson" streams every matching row, one JSON object per line
+    """
+    requested = request.args.get('fields')
+    fields = [f.strip() for f in requested.split(',') if f.strip()] if requested else list(DEFAULT_API_CALL_FIELDS)
+    unknown = [f for f in fields if f not in API_CALL_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    # created_at and id are always selected so the cursor can be built
+    columns = [API_CALL_FIELDS[f] for f in fields] + [CallRecord.created_at, CallRecord.id]
+    query = db.session.query(*columns)
+
+    status = request.args.get('status')
+    if status:
+        query = query.filter(CallRecord.status == status)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = _decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+        query = query.filter(
+            tuple_(CallRecord.created_at, CallRecord.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    query = query.order_by(CallRecord.created_at.desc(), CallRecord.id.desc())
+
+    if request.args.get('format') == 'ndjson':
+        limit = request.args.get('limit', type=int)
+        if limit:
+            query = query.limit(limit)
+
+        def generate():
+            # Stream from a server-side cursor in fixed-size batches
+            rows = query.execution_options(stream_results=True, yield_per=NDJSON_BATCH_SIZE)
+            for row in rows:
+                yield json.dumps(_serialise_row(fields, row)) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = max(1, min(request.args.get('limit', 50, type=int), API_CALLS_MAX_LIMIT))
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = _encode_cursor(last[-2], last[-1])
+
+    return jsonify({
+        "calls": [_serialise_row(fields, row) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+RECENT_CALLS = 10
+
+def _live_snapshot():
+    """Counters and the recent calls, for a stream that cannot resume from the feed"""
+    rows = db.session.query(*(API_CALL_FIELDS[f] for f in LIVE_CALL_FIELDS)).order_by(
+        CallRecord.created_at.desc(), CallRecord.id.desc()
+    ).limit(RECENT_CALLS).all()
+    return {
+        "counters": get_call_counters(),
+        "recent_calls": [_serialise_row(LIVE_CALL_FIELDS, row) for row in rows],
+    }
+
+@admin_bp.route('/api/stream')
+@login_required
+def api_stream():
+    """Server-Sent Events: `call` (new or changed call) and `counters` (per-status deltas)
+
+    A new connection first gets a `snapshot` of the counters and recent
+    calls. A browser that reconnects with Last-Event-ID resumes from the
+    in-process history instead; `reset` means it fell too far behind.
+    """
+    after = change_feed.resume_point(request.headers.get('Last-Event-ID'))
+    snapshot = None
+    if after is None:
+        after = change_feed.current()
+        snapshot = _live_snapshot()
+    db.session.remove()  # the stream may stay open for a while; do not hold a connection
+    try:
+        stream = change_feed.stream(after, snapshot)
+    except StreamLimitReached as e:
+        logger.warning(f"Refused live stream: {e}")
+        return jsonify({"error": "Too many live dashboards open"}), 503, {"Retry-After": "30"}
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx: pass events through as they are written
+    })
+
+@admin_bp.route('/api/latency')
+@login_required
+def api_latency():
+    """p50/p95/p99 of call setup stages and turn latency over the most recent calls"""
+    limit = max(1, min(request.args.get('limit', 1000, type=int), 10000))
+    rows = db.session.query(CallTimeline.stages, CallTimeline.turns).order_by(
+        CallTimeline.created_at.desc()
+    ).limit(limit)
+
+    histograms = {}
+    calls = 0
+    for stages_json, turns_json in rows:
+        calls += 1
+        stages = json.loads(stages_json) if stages_json else {}
+        for name, (start, end) in TIMELINE_INTERVALS.items():
+            if start in stages and end in stages:
+                histograms.setdefault(name, LatencyHistogram()).add(stages[end] - stages[start])
+        for turn in json.loads(turns_json) if turns_json else []:
+            for metric in TURN_METRICS:
+                if metric in turn:
+                    histograms.setdefault(f'turn.{metric}', LatencyHistogram()).add(turn[metric])
+
+    return jsonify({
+        "calls": calls,
+        "metrics": {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+    })
+
+# Finest granularity whose buckets for a range stay within ANALYTICS_MAX_BUCKETS
+ANALYTICS_STEPS = {
+    "minute": datetime.timedelta(minutes=1),
+    "hour": datetime.timedelta(hours=1),
+    "day": datetime.timedelta(days=1),
+}
+ANALYTICS_MAX_BUCKETS = 1500
+
+def _parse_utc(value):
+    """ISO 8601 time as a naive UTC datetime, like the stored timestamps"""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@admin_bp.route('/api/analytics')
+@login_required
+def api_analytics():
+    """Call volume, pickup and failure rates and duration percentiles per time bucket
+
+    Served from the call_rollups table, never from call_records.
+
+    Query parameters:
+        start, end: ISO 8601 UTC times (default: the last 7 days)
+        granularity: minute, hour or day (default: the finest that fits the range)
+    """
+    try:
+        end = _parse_utc(request.args['end']) if request.args.get('end') else datetime.datetime.utcnow()
+        start = _parse_utc(request.args['start']) if request.args.get('start') else end - datetime.timedelta(days=7)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 times"}), 400
+    if start >= end:
+        return jsonify({"error": "start must be before end"}), 400
+
+    granularity = request.args.get('granularity')
+    if granularity is None:
+        granularity = next(
+            (g for g in GRANULARITIES if (end - start) / ANALYTICS_STEPS[g] <= ANALYTICS_MAX_BUCKETS), 'day'
+        )
+    elif granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    elif (end - start) / ANALYTICS_STEPS[granularity] > ANALYTICS_MAX_BUCKETS:
+        return jsonify({"error": f"Range too long for {granularity} buckets (max {ANALYTICS_MAX_BUCKETS})"}), 400
+
+    return jsonify(query_rollups(granularity, start, end))
 
 @admin_bp.route('/settings', methods=['GET', 'POST'])
 @login_required
@@ -170,4 +426,4 @@ def settings():
             flash('Password updated successfully', 'success')
             logger.info(f"Admin user {admin.username} changed password")
     
-    return render_template('admin/settings.html')
\ No newline at end of file
+    return render_template('admin/settings.html')
\ No newline at end of file
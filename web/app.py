@@ -2,34 +2,90 @@
 from flask import Flask
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
-from dotenv import load_dotenv
 import logging
-from shared.config import LOG_LEVEL, PORT, HOST, IS_PRODUCTION
-from .routes import register_routes
-
-# Setup logging
-logging.basicConfig(
-    level=logging.getLevelName(LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from shared.config import PORT, HOST, IS_PRODUCTION
+from shared.database import db, init_db
+from shared.logging_config import configure_logging, reset_log_context
+from .config import (
+    CALL_WRITER_BATCH_SIZE, CALL_WRITER_FLUSH_INTERVAL, DUPLICATE_DIAL_WINDOW, DUPLICATE_DIAL_CACHE_TTL,
+    DUPLICATE_DIAL_CACHE_SIZE,
+    ASSET_MAX_AGE, ASSET_BROTLI_QUALITY, CALL_EVENT_FLUSH_INTERVAL, CALL_EVENT_MAX_PENDING,
+    CALL_EVENT_ORPHAN_TTL, ROLLUP_MINUTE_RETENTION_DAYS, ROLLUP_HOUR_RETENTION_DAYS, LIVE_MAX_STREAMS, LIVE_STREAM_MAX_AGE, LIVE_HISTORY,
+    LIVE_POLL_INTERVAL, LIVE_IDLE_TIMEOUT
 )
-logger = logging.getLogger(__name__)
+from .call_writer import call_writer
+from .call_events import call_events
+from .live import change_feed
+from .dedupe import dial_dedupe
+from .assets import assets
+from .routes import register_routes, install_signal_handlers
+from . import routes
+from .admin import init_admin
 
-# Load environment variables
-load_dotenv()
+# Setup logging (queued; every module logs through the root logger)
+configure_logging("web", logger_name="")
+logger = logging.getLogger(__name__)
 
 def create_app():
     app = Flask(__name__)
     CORS(app)  # Enable CORS for all routes
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
     
+    # Database and write-behind call record persistence
+    init_db(app)
+    call_writer.init_app(
+        app,
+        batch_size=CALL_WRITER_BATCH_SIZE,
+        flush_interval=CALL_WRITER_FLUSH_INTERVAL
+    )
+    dial_dedupe.init_app(app, window=DUPLICATE_DIAL_WINDOW, cache_ttl=DUPLICATE_DIAL_CACHE_TTL,
+                         max_entries=DUPLICATE_DIAL_CACHE_SIZE, writer=call_writer)
+    
+    # Call lifecycle events, applied to call records in batches
+    call_events.init_app(
+        app,
+        flush_interval=CALL_EVENT_FLUSH_INTERVAL,
+        max_pending=CALL_EVENT_MAX_PENDING,
+        orphan_ttl=CALL_EVENT_ORPHAN_TTL,
+        rollup_retention={"minute": ROLLUP_MINUTE_RETENTION_DAYS, "hour": ROLLUP_HOUR_RETENTION_DAYS}
+    )
+    call_events.add_listener(routes.on_call_event)
+    
+    # Live admin dashboard fed from call_records, whichever worker changed them
+    change_feed.init_app(app, history=LIVE_HISTORY, max_streams=LIVE_MAX_STREAMS, max_age=LIVE_STREAM_MAX_AGE,
+                         poll_interval=LIVE_POLL_INTERVAL, idle_timeout=LIVE_IDLE_TIMEOUT)
+    
+    # Fingerprinted, precompressed static and widget files
+    assets.init_app(app, max_age=ASSET_MAX_AGE, brotli_quality=ASSET_BROTLI_QUALITY)
+    
     # Register routes
     register_routes(app)
+    init_admin(app)
+    
+    # Drop call context bound during a request so it cannot leak into the next one on this thread
+    app.teardown_request(lambda exc: reset_log_context())
     
     logger.info(f"Application initialized in {IS_PRODUCTION and 'PRODUCTION' or 'DEVELOPMENT'} mode")
     return app
 
+def init_worker(app, workers=1):
+    """Re-create per-process state in a worker forked from the preloaded app
+
+    Pooled database connections, the write-behind queue, the call event
+    batch, the duplicate-dial cache, the live change feed and the dispatch
+    loop are not safe to share across a fork, so each worker opens its own.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    call_writer.reset_after_fork()
+    call_events.reset_after_fork()
+    dial_dedupe.reset_after_fork()
+    change_feed.reset_after_fork()
+    routes.init_worker(workers)
+
 app = create_app()
 
 if __name__ == '__main__':
+    install_signal_handlers()
     logger.info(f"Starting web server on {HOST}:{PORT}")
-    app.run(host=HOST, port=PORT, debug=not IS_PRODUCTION)
\ No newline at end of file
+    app.run(host=HOST, port=PORT, debug=not IS_PRODUCTION)
\ No newline at end of file
@@ -0,0 +1,228 @@
+# web/assets.py
+"""
+Fingerprinted, precompressed static assets
+
+Every file under the asset roots (web/static and widget/) is read once at
+startup, hashed, and compressed with gzip (and brotli when the optional
+`brotli` package is installed). Each asset is served from two URLs:
+
+- /assets/<name>.<hash>.<ext> never changes, so it is sent with
+  `Cache-Control: immutable` and a one-year max-age;
+- the stable URL (/widget/call-widget.js, /static/css/style.css) that
+  embeds and old pages already use, with a short max-age.
+
+Both answer If-None-Match with 304 using a strong ETag derived from the
+content hash. References to stable URLs inside JS and CSS files are
+rewritten to the fingerprinted URLs, so the widget loader pulls its
+stylesheet from the immutable URL.
+
+`flask --app web.app build-assets <dir>` writes the same files (plus .gz/.br
+siblings and manifest.json) for a CDN or nginx to serve directly.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import click
+from flask import Response, abort, request, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# URL prefix -> directory served under it
+ASSET_ROOTS = {
+    "static": os.path.join(ROOT, "web", "static"),
+    "widget": os.path.join(ROOT, "widget"),
+}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Files that may reference other assets by their stable URL
+REWRITABLE = (".css", ".js")
+REWRITE_ORDER = {".css": 1, ".js": 2}
+MIN_COMPRESS_SIZE = 256
+
+class Asset:
+    """One file: its bytes, fingerprint and precompressed encodings"""
+
+    def __init__(self, logical, body, mimetype):
+        self.logical = logical  # "widget/call-widget.js"
+        self.body = body
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()
+        stem, ext = os.path.splitext(logical)
+        self.hashed = f"{stem}.{self.digest[:12]}{ext}"
+        self.encodings = {}  # "br" / "gzip" -> bytes
+
+    def compress(self, brotli_quality):
+        if len(self.body) < MIN_COMPRESS_SIZE or not self.mimetype.startswith(COMPRESSIBLE):
+            return
+        gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        if len(gzipped) < len(self.body):
+            self.encodings["gzip"] = gzipped
+        if brotli is not None:
+            compressed = brotli.compress(self.body, quality=brotli_quality)
+            if len(compressed) < len(self.body):
+                self.encodings["br"] = compressed
+
+    def etag(self, encoding=None):
+        # A strong ETag names one exact byte sequence, so each encoding gets its own
+        return f'"{self.digest[:32]}{"-" + encoding if encoding else ""}"'
+
+class AssetPipeline:
+    """Builds the asset table at startup and serves it"""
+
+    def __init__(self, app=None, roots=None, max_age=300, brotli_quality=11):
+        self.roots = roots or ASSET_ROOTS
+        self.max_age = max_age
+        self.brotli_quality = brotli_quality
+        self._assets = {}  # logical path -> Asset
+        self._hashed = {}  # hashed path -> Asset
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, max_age=None, brotli_quality=None):
+        if max_age is not None:
+            self.max_age = max_age
+        if brotli_quality is not None:
+            self.brotli_quality = brotli_quality
+        self.build()
+
+        app.add_url_rule("/assets/<path:filename>", "hashed_asset", self.serve_hashed)
+        app.add_url_rule("/widget/<path:filename>", "widget_asset", self.serve_widget)
+        # Flask's own static route keeps working; only its cache headers change
+        app.view_functions["static"] = self.serve_static
+        app.jinja_env.globals["asset_url"] = self.url
+
+        @app.cli.command("build-assets")
+        @click.argument("out_dir")
+        def build_assets(out_dir):
+            """Write fingerprinted, precompressed assets and manifest.json to OUT_DIR"""
+            for logical, hashed in sorted(self.write(out_dir).items()):
+                click.echo(f"{logical} -> {hashed}")
+
+    def build(self):
+        """Read, fingerprint and compress every file under the asset roots"""
+        files = []
+        for prefix, directory in self.roots.items():
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    logical = f"{prefix}/{os.path.relpath(path, directory).replace(os.sep, '/')}"
+                    files.append((logical, path))
+
+        assets = {}
+        # Plain files first, then CSS, then JS, each with its references rewritten
+        # to the fingerprinted URLs (so a changed stylesheet changes the JS hash too)
+        files.sort(key=lambda item: REWRITE_ORDER.get(os.path.splitext(item[0])[1], 0))
+        for logical, path in files:
+            with open(path, "rb") as f:
+                body = f.read()
+            if logical.endswith(REWRITABLE):
+                body = self._rewrite_references(body, assets)
+            mimetype = mimetypes.guess_type(logical)[0] or "application/octet-stream"
+            asset = Asset(logical, body, mimetype)
+            asset.compress(self.brotli_quality)
+            assets[logical] = asset
+
+        self._assets = assets
+        self._hashed = {asset.hashed: asset for asset in assets.values()}
+        logger.info(f"Built {len(assets)} static assets (brotli {'on' if brotli else 'off'})")
+
+    @staticmethod
+    def _rewrite_references(body, assets):
+        if not assets:
+            return body
+        text = body.decode("utf-8")
+        pattern = re.compile("/(" + "|".join(re.escape(name) for name in sorted(assets, key=len, reverse=True)) + ")(?![\\w.-])")
+        return pattern.sub(lambda m: f"/assets/{assets[m.group(1)].hashed}", text).encode("utf-8")
+
+    def url(self, filename, prefix="static"):
+        """Fingerprinted URL of an asset, for templates: asset_url('css/style.css')"""
+        asset = self._assets.get(f"{prefix}/{filename}")
+        if asset is None:
+            return url_for("static", filename=filename) if prefix == "static" else f"/{prefix}/{filename}"
+        return url_for("hashed_asset", filename=asset.hashed)
+
+    def serve_hashed(self, filename):
+        asset = self._hashed.get(filename)
+        if asset is None:
+            abort(404)
+        return self._respond(asset, IMMUTABLE)
+
+    def serve_widget(self, filename):
+        return self._serve_stable(f"widget/{filename}")
+
+    def serve_static(self, filename):
+        return self._serve_stable(f"static/{filename}")
+
+    def _serve_stable(self, logical):
+        asset = self._assets.get(logical)
+        if asset is None:
+            abort(404)
+        return self._respond(asset, f"public, max-age={self.max_age}")
+
+    def _respond(self, asset, cache_control):
+        encoding = self._negotiate(asset)
+        etag = asset.etag(encoding)
+        headers = {
+            "Cache-Control": cache_control,
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(asset):
+            return Response(status=304, headers=headers)
+        body = asset.encodings[encoding] if encoding else asset.body
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(body, mimetype=asset.mimetype, headers=headers)
+
+    @staticmethod
+    def _negotiate(asset):
+        accepted = request.accept_encodings
+        for encoding in ("br", "gzip"):
+            if encoding in asset.encodings and accepted[encoding]:
+                return encoding
+        return None
+
+    @staticmethod
+    def _not_modified(asset):
+        # Any encoding of the same content counts as a match: the client's copy
+        # is current even if it was fetched with a different Accept-Encoding
+        if_none_match = request.headers.get("If-None-Match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tag = asset.digest[:32]
+        return any(
+            candidate.strip().removeprefix("W/").strip('"').split("-")[0] == tag
+            for candidate in if_none_match.split(",")
+        )
+
+    def write(self, out_dir):
+        """Write fingerprinted files, .gz/.br siblings and manifest.json to `out_dir`"""
+        manifest = {}
+        for asset in self._assets.values():
+            path = os.path.join(out_dir, asset.hashed)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(asset.body)
+            for encoding, body in asset.encodings.items():
+                with open(path + (".gz" if encoding == "gzip" else ".br"), "wb") as f:
+                    f.write(body)
+            manifest[asset.logical] = asset.hashed
+        with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return manifest
+
+assets = AssetPipeline()
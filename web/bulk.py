@@ -0,0 +1,120 @@
+# web/bulk.py
+import asyncio
+import csv
+import io
+import json
+import logging
+import queue
+
+logger = logging.getLogger(__name__)
+
+LEAD_FIELDS = ('name', 'phone', 'email', 'query')
+
+# Marks the end of a result stream
+_DONE = object()
+# Seconds between checks that the dispatch is still running while no result arrives
+RESULT_WAIT = 1.0
+
+class LeadParseError(ValueError):
+    """Raised when a bulk upload cannot be parsed into leads"""
+
+def _normalise_lead(raw):
+    """Keep the known lead fields as stripped strings"""
+    if not isinstance(raw, dict):
+        return None
+    lead = {}
+    for field in LEAD_FIELDS:
+        value = raw.get(field)
+        lead[field] = str(value).strip() if value is not None else ''
+    return lead
+
+def parse_leads(request):
+    """Parse leads from a JSON array or a CSV upload/body
+
+    Accepted payloads:
+        - application/json: a list of lead objects, or {"leads": [...]}
+        - multipart/form-data with a CSV file in the "file" field
+        - text/csv body with a header row
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('leads')
+        if not isinstance(payload, list):
+            raise LeadParseError("Expected a JSON array of leads.")
+        rows = payload
+    else:
+        upload = request.files.get('file')
+        if upload is not None:
+            text = upload.read().decode('utf-8-sig')
+        elif request.mimetype in ('text/csv', 'text/plain'):
+            text = request.get_data(as_text=True)
+        else:
+            raise LeadParseError("Send a JSON array or a CSV file.")
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise LeadParseError("CSV upload has no header row.")
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        rows = list(reader)
+
+    return [_normalise_lead(row) for row in rows]
+
+async def fan_out(leads, dispatch_one, results, concurrency):
+    """Dispatch leads with at most `concurrency` in flight
+
+    `dispatch_one(index, lead)` is awaited for every lead and must return a
+    result dict. Each result is put on the thread-safe `results` queue as soon
+    as it is ready, followed by a final end-of-stream marker.
+    """
+    pending = iter(enumerate(leads))
+
+    async def worker():
+        for index, lead in pending:
+            try:
+                result = await dispatch_one(index, lead)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Bulk dispatch failed for lead {index}: {e}")
+                result = {"index": index, "success": False, "message": str(e)}
+            results.put(result)
+
+    try:
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(leads))))]
+        await asyncio.gather(*workers)
+    finally:
+        results.put(_DONE)
+
+def stream_results(results, future, total):
+    """Yield NDJSON lines from the results queue, ending with a summary line
+
+    If the dispatch ends without its end marker (it was cancelled, or failed
+    before fan_out started), an error line is yielded before the summary.
+    """
+    succeeded = failed = 0
+    try:
+        while True:
+            try:
+                result = results.get(timeout=RESULT_WAIT)
+            except queue.Empty:
+                if not future.done():
+                    continue
+                try:
+                    result = results.get_nowait()
+                except queue.Empty:
+                    error = "cancelled" if future.cancelled() else str(future.exception() or "ended early")
+                    logger.error(f"Bulk dispatch stopped before finishing: {error}")
+                    yield json.dumps({"error": f"Bulk dispatch stopped: {error}"}) + "\n"
+                    break
+            if result is _DONE:
+                break
+            if result.get("success"):
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"summary": {"total": total, "succeeded": succeeded, "failed": failed}}) + "\n"
+    finally:
+        # Stop dispatching if the client went away mid-stream
+        if not future.done():
+            future.cancel()
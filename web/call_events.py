@@ -0,0 +1,359 @@
+# web/call_events.py
+import datetime
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from sqlalchemy import bindparam, select, update
+from shared.database import db, CallRecord, apply_counter_deltas, begin_immediate
+from shared.rollups import RollupDeltas, call_outcome, prune_rollups
+from shared.call_events import ANSWERED, SIP_FAILED, HANGUP
+
+logger = logging.getLogger(__name__)
+
+# A normalised lifecycle event; `kind` is one of the shared.call_events kinds
+# or ROOM_FINISHED, `at` a naive UTC datetime
+CallEvent = namedtuple("CallEvent", "room_name kind at sip_status", defaults=(None,))
+
+ROOM_FINISHED = "room_finished"
+SELECT_CHUNK = 500
+
+# Old minute/hour rollups are pruned at most this often (seconds)
+ROLLUP_PRUNE_INTERVAL = 3600
+
+# LiveKit ParticipantInfo.Kind.SIP
+_SIP_PARTICIPANT_KIND = 3
+
+def _utc(timestamp):
+    return datetime.datetime.utcfromtimestamp(timestamp) if timestamp else datetime.datetime.utcnow()
+
+def events_from_webhook(event):
+    """CallEvents for a LiveKit WebhookEvent
+
+    Only the SIP participant leaving and the room closing are used. LiveKit
+    adds the SIP participant while the phone is still ringing, so its
+    participant_joined says nothing about pickup; that comes from the
+    agent's own `answered` event. LiveKit stamps webhooks in whole seconds.
+    """
+    room_name = event.room.name
+    if not room_name:
+        return []
+    at = _utc(event.created_at)
+    if event.event == "participant_left" and event.participant.kind == _SIP_PARTICIPANT_KIND:
+        return [CallEvent(room_name, HANGUP, at)]
+    if event.event == "room_finished":
+        return [CallEvent(room_name, ROOM_FINISHED, at)]
+    return []
+
+def events_from_agent(payload):
+    """CallEvents from the JSON body the agent posts: one event object or a list of them"""
+    items = payload if isinstance(payload, list) else [payload]
+    events = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get("room_name") or item.get("event") not in (ANSWERED, SIP_FAILED, HANGUP):
+            raise ValueError(f"Invalid call event: {item!r}")
+        try:
+            at = _utc(float(item["at"]) if item.get("at") is not None else None)
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise ValueError(f"Invalid call event time: {item.get('at')!r}") from None
+        events.append(CallEvent(item["room_name"], item["event"], at, item.get("sip_status")))
+    return events
+
+def _earliest(*times):
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+class _RoomUpdate:
+    """Everything learned about one room since the last flush
+
+    Events may arrive in any order and be split across batches, so only
+    order-independent facts are kept: the earliest pickup, the earliest
+    end (the hangup precedes the room closing) and sticky flags.
+    """
+    __slots__ = ("answered_at", "ended_at", "failed", "room_finished", "sip_status", "first_seen")
+
+    def __init__(self):
+        self.answered_at = self.ended_at = self.sip_status = None
+        self.failed = self.room_finished = False
+        self.first_seen = time.monotonic()
+
+    def add(self, event):
+        if event.kind == ANSWERED:
+            self.answered_at = _earliest(self.answered_at, event.at)
+            return
+        self.ended_at = _earliest(self.ended_at, event.at)
+        if event.kind == SIP_FAILED:
+            self.failed = True
+            self.sip_status = event.sip_status or self.sip_status
+        elif event.kind == ROOM_FINISHED:
+            self.room_finished = True
+
+    def merge(self, other):
+        self.answered_at = _earliest(self.answered_at, other.answered_at)
+        self.ended_at = _earliest(self.ended_at, other.ended_at)
+        self.failed = self.failed or other.failed
+        self.sip_status = other.sip_status or self.sip_status
+        self.room_finished = self.room_finished or other.room_finished
+        self.first_seen = min(self.first_seen, other.first_seen)
+
+class CallEventIngestor:
+    """Coalesces call lifecycle events per room and applies them in batches
+
+    `submit()` only merges events into an in-memory dict (a few dict
+    operations under a lock), so request handlers return immediately and a
+    burst of events for one call collapses into a single row update. One
+    background thread swaps the dict out every `flush_interval` seconds (or
+    once `max_pending` rooms are waiting) and writes the batch in one
+    transaction: one SELECT for the current rows, one executemany UPDATE.
+    Every web worker runs its own ingestor, and events for one call often
+    reach different workers, so the transaction takes the write lock before
+    the SELECT: each batch merges into the rows as the previous one left them.
+
+    Events for rooms whose CallRecord is not written yet (it may still sit
+    in the write-behind queue) are kept for up to `orphan_ttl` seconds.
+    """
+
+    def __init__(self, app=None, flush_interval=0.25, max_pending=5000, orphan_ttl=60, rollup_retention=None):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.orphan_ttl = orphan_ttl
+        self.rollup_retention = rollup_retention or {}  # granularity -> days
+        self._pruned_at = 0.0
+        self.stats = Counter()
+        self._pending = {}  # room_name -> _RoomUpdate
+        self._listeners = []
+        self._commit_listeners = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def init_app(self, app, flush_interval=None, max_pending=None, orphan_ttl=None, rollup_retention=None):
+        self.app = app
+        if rollup_retention is not None:
+            self.rollup_retention = rollup_retention
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if max_pending is not None:
+            self.max_pending = max_pending
+        if orphan_ttl is not None:
+            self.orphan_ttl = orphan_ttl
+
+    def add_listener(self, callback):
+        """Call `callback(event)` for every accepted event, on the submitting thread"""
+        self._listeners.append(callback)
+
+    def add_commit_listener(self, callback):
+        """Call `callback(calls, status_deltas)` on the ingestor thread after each applied batch
+
+        `calls` holds the new values of every changed row, with its id and room_name.
+        """
+        self._commit_listeners.append(callback)
+
+    def submit(self, events):
+        """Queue events for the next batch"""
+        with self._lock:
+            for event in events:
+                room = self._pending.get(event.room_name)
+                if room is None:
+                    room = self._pending[event.room_name] = _RoomUpdate()
+                room.add(event)
+            backlog = len(self._pending)
+        self.stats["events"] += len(events)
+
+        for event in events:
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Call event listener failed: {e}")
+
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        if backlog >= self.max_pending:
+            self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="call-event-ingestor", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=10):
+        """Apply everything still pending and stop the thread"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._stopping = True
+            self._wake.set()
+            thread.join(timeout)
+        elif self.app is not None and self._pending:
+            self.flush()
+
+    def reset_after_fork(self):
+        """Drop the pending batch and thread inherited from the parent process"""
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Apply the pending batch now (on the calling thread)"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if batch:
+            self._apply(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Applying call events failed: {e}")
+            if self._stopping:
+                return
+
+    def _apply(self, batch):
+        leftovers = dict(batch)
+        with self.app.app_context():
+            try:
+                begin_immediate(db.session)
+                rooms = list(batch)
+                rows = []
+                # Chunked to stay under SQLite's bound-parameter limit
+                for i in range(0, len(rooms), SELECT_CHUNK):
+                    rows.extend(db.session.execute(
+                        select(CallRecord.id, CallRecord.room_name, CallRecord.status,
+                               CallRecord.call_start, CallRecord.call_end, CallRecord.duration,
+                               CallRecord.sip_status, CallRecord.created_at)
+                        .where(CallRecord.room_name.in_(rooms[i:i + SELECT_CHUNK]))
+                    ).all())
+                changes, rooms_changed, deltas = [], [], Counter()
+                rollups = RollupDeltas()
+                for row in rows:
+                    change = self._resolve(row, leftovers.pop(row.room_name))
+                    if change is not None:
+                        changes.append(change)
+                        rooms_changed.append(row.room_name)
+                        rollups.change(
+                            row.created_at,
+                            call_outcome(row.status, row.call_start, row.duration, row.sip_status),
+                            call_outcome(change["status"], change["call_start"], change["duration"], change["sip_status"])
+                        )
+                        if change["status"] != row.status:
+                            deltas[row.status] -= 1
+                            deltas[change["status"]] += 1
+                if changes:
+                    db.session.execute(
+                        update(CallRecord.__table__).where(CallRecord.__table__.c.id == bindparam("row_id")),
+                        changes
+                    )
+                    apply_counter_deltas(db.session, deltas)
+                    rollups.apply(db.session)
+                    self._prune_rollups()
+                db.session.commit()
+                self.stats["rows_updated"] += len(changes)
+                self.stats["batches"] += 1
+                if changes and self._commit_listeners:
+                    self._committed(changes, rooms_changed, deltas)
+            except Exception:
+                db.session.rollback()
+                leftovers = batch  # retry the whole batch on the next flush
+                raise
+            finally:
+                db.session.remove()
+                self._requeue(leftovers)
+
+    def ended(self, room_names):
+        """The rooms among `room_names` whose call end has been recorded, by any process"""
+        room_names = list(room_names)
+        ended = set()
+        with self.app.app_context():
+            try:
+                for i in range(0, len(room_names), SELECT_CHUNK):
+                    ended.update(db.session.execute(
+                        select(CallRecord.room_name)
+                        .where(CallRecord.room_name.in_(room_names[i:i + SELECT_CHUNK]),
+                               CallRecord.call_end.is_not(None))
+                    ).scalars())
+            finally:
+                db.session.remove()
+        return ended
+
+    def _committed(self, changes, rooms, deltas):
+        calls = [
+            dict(change, id=change["row_id"], room_name=room_name)
+            for change, room_name in zip(changes, rooms)
+        ]
+        for callback in self._commit_listeners:
+            try:
+                callback(calls, deltas)
+            except Exception as e:
+                logger.error(f"Call event commit listener failed: {e}")
+
+    @staticmethod
+    def _resolve(row, room):
+        """The new column values for `row` after the room's events, or None if nothing changes
+
+        A late `answered` still turns a call that was closed as unanswered
+        into a completed one, so the result does not depend on which batch
+        each event landed in.
+        """
+        call_start = _earliest(row.call_start, room.answered_at)
+        sip_status = row.sip_status or (str(room.sip_status)[:10] if room.sip_status else None)
+        call_end = _earliest(row.call_end, room.ended_at)
+        answered = call_start is not None or row.status in ("connected", "completed")
+
+        status = row.status
+        if answered:
+            status = "completed" if call_end else "connected"
+        elif room.failed or (room.room_finished and call_end):
+            status = "failed"  # the dial failed, or the room closed without a pickup
+
+        if (status, call_start, call_end, sip_status) == (row.status, row.call_start, row.call_end, row.sip_status):
+            return None
+        duration = (call_end - call_start).total_seconds() if call_start and call_end else None
+        return {
+            "row_id": row.id,
+            "status": status,
+            "call_start": call_start,
+            "call_end": call_end,
+            "duration": max(duration, 0.0) if duration is not None else None,
+            "sip_status": sip_status,
+            "updated_at": datetime.datetime.utcnow(),
+        }
+
+    def _prune_rollups(self):
+        """Drop minute/hour rollups past their retention, at most once per ROLLUP_PRUNE_INTERVAL"""
+        now = time.monotonic()
+        if self.rollup_retention and now - self._pruned_at >= ROLLUP_PRUNE_INTERVAL:
+            self._pruned_at = now
+            deleted = prune_rollups(db.session, self.rollup_retention)
+            if deleted:
+                logger.info(f"Pruned {deleted} expired call rollup rows")
+
+    def _requeue(self, leftovers):
+        """Keep events whose CallRecord does not exist yet, until orphan_ttl runs out"""
+        now = time.monotonic()
+        dropped = 0
+        with self._lock:
+            for room_name, room in leftovers.items():
+                if now - room.first_seen > self.orphan_ttl:
+                    dropped += 1
+                    continue
+                existing = self._pending.get(room_name)
+                if existing is None:
+                    self._pending[room_name] = room
+                else:
+                    existing.merge(room)
+        if dropped:
+            self.stats["orphans_dropped"] += dropped
+            logger.warning(f"Dropped events for {dropped} rooms with no call record")
+
+call_events = CallEventIngestor()
@@ -0,0 +1,206 @@
+# web/call_writer.py
+import datetime
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from sqlalchemy import insert
+from shared.database import db, CallRecord, apply_counter_deltas
+from shared.rollups import RollupDeltas, call_outcome
+
+logger = logging.getLogger(__name__)
+
+# Sentinel that tells the writer thread to drain and exit
+_STOP = object()
+
+class _Deferred:
+    """A statement queued with defer(), run in the transaction of the next batch"""
+    __slots__ = ("statement",)
+
+    def __init__(self, statement):
+        self.statement = statement
+
+class CallRecordWriter:
+    """Write-behind queue for CallRecord rows
+
+    Request handlers call `record()`, which only enqueues the row. A single
+    background thread drains the queue and inserts rows in batched
+    transactions once `batch_size` rows are waiting or `flush_interval`
+    seconds have passed, so the request path never waits on a commit.
+    Small follow-up writes queued with `defer()` ride along in the same
+    transactions.
+    """
+
+    def __init__(self, app=None, batch_size=200, flush_interval=0.5):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._commit_listeners = []
+
+    def init_app(self, app, batch_size=None, flush_interval=None):
+        self.app = app
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+
+    def add_commit_listener(self, callback):
+        """Call `callback(rows, status_deltas)` on the writer thread after each committed batch"""
+        self._commit_listeners.append(callback)
+
+    def _committed(self, rows, deltas):
+        for callback in self._commit_listeners:
+            try:
+                callback(rows, deltas)
+            except Exception as e:
+                logger.error(f"Call record commit listener failed: {e}")
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="call-record-writer",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def record(self, **row):
+        """Queue a CallRecord row (keyword arguments are model attributes)"""
+        if self.app is None:
+            logger.warning("Call record writer is not initialised; dropping row")
+            return
+        row.setdefault('status', 'pending')
+        # Stamped when the call is requested, not when the batch is written
+        row.setdefault('created_at', datetime.datetime.utcnow())
+        self._enqueue(row)
+
+    def defer(self, statement):
+        """Queue a small write (a SQLAlchemy statement) for the next batch, after its inserts"""
+        if self.app is None:
+            logger.warning("Call record writer is not initialised; dropping statement")
+            return
+        self._enqueue(_Deferred(statement))
+
+    def _enqueue(self, item):
+        self._queue.put(item)
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        elif self.app is not None and not self._queue.empty():
+            # Thread never started (or died): flush on the calling thread
+            self._write(self._drain())
+
+    def reset_after_fork(self):
+        """Drop the queue and writer thread inherited from the parent process"""
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows
+            if item is not _STOP:
+                rows.append(item)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                batch.extend(self._drain())
+                self._write(batch)
+                return
+
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+    def _write(self, batch):
+        if not batch:
+            return
+        rows = [item for item in batch if not isinstance(item, _Deferred)]
+        deferred = [item.statement for item in batch if isinstance(item, _Deferred)]
+        with self.app.app_context():
+            try:
+                deltas = Counter(row['status'] for row in rows)
+                if rows:
+                    db.session.execute(insert(CallRecord), rows)
+                    apply_counter_deltas(db.session, deltas)
+                    self._rollups(rows).apply(db.session)
+                for statement in deferred:
+                    db.session.execute(statement)
+                db.session.commit()
+                logger.debug(f"Persisted {len(rows)} call records and {len(deferred)} deferred writes")
+                if rows:
+                    self._committed(rows, deltas)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Batched call record insert failed ({e}); retrying rows individually")
+                self._write_individually(rows)
+                self._run_individually(deferred)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _rollups(rows):
+        rollups = RollupDeltas()
+        for row in rows:
+            rollups.change(row['created_at'], None, call_outcome(
+                row['status'], row.get('call_start'), row.get('duration'), row.get('sip_status')
+            ))
+        return rollups
+
+    def _write_individually(self, rows):
+        for row in rows:
+            try:
+                db.session.execute(insert(CallRecord), [row])
+                apply_counter_deltas(db.session, {row['status']: 1})
+                self._rollups([row]).apply(db.session)
+                db.session.commit()
+                self._committed([row], {row['status']: 1})
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Dropping call record for room {row.get('room_name')}: {e}")
+
+    def _run_individually(self, statements):
+        for statement in statements:
+            try:
+                db.session.execute(statement)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Dropping deferred write: {e}")
+
+call_writer = CallRecordWriter()
@@ -1,14 +1,108 @@
 # web/config.py
 import os
-from dotenv import load_dotenv
-from shared.config import IS_PRODUCTION
-
-load_dotenv()
+from shared.config import env, IS_PRODUCTION, DEFAULT_PHONE_REGION, CALL_EVENTS_SECRET
 
 # LiveKit connection settings
-LIVEKIT_URL = os.getenv("LIVEKIT_URL")
-LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+LIVEKIT_URL = env.str("LIVEKIT_URL")
+LIVEKIT_API_KEY = env.str("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = env.str("LIVEKIT_API_SECRET")
 
 # Agent configuration
-AGENT_NAME = os.getenv("AGENT_NAME", "FRAN-TIGER")
\ No newline at end of file
+AGENT_NAME = env.str("AGENT_NAME", "FRAN-TIGER")
+
+# Serving: "dev" is Flask's single-process development server; "gunicorn" is
+# a pre-forked master with WEB_WORKERS worker processes of WEB_THREADS threads
+WEB_SERVER = env.choice("WEB_SERVER", "gunicorn" if IS_PRODUCTION else "dev", ("dev", "gunicorn"))
+WEB_WORKERS = env.int("WEB_WORKERS", os.cpu_count() or 1, minimum=1)
+WEB_WORKER_CLASS = env.choice("WEB_WORKER_CLASS", "gthread", ("gthread", "sync"))
+WEB_THREADS = env.int("WEB_THREADS", 8, minimum=1)
+# Seconds a stopping worker gets to finish in-flight requests and dispatches
+WEB_GRACEFUL_TIMEOUT = env.int("WEB_GRACEFUL_TIMEOUT", 30, minimum=0)
+
+# Static and widget assets: fingerprinted URLs are cached for a year; the
+# stable URLs embeds use (/widget/call-widget.js) for ASSET_MAX_AGE seconds
+ASSET_MAX_AGE = env.int("ASSET_MAX_AGE", 300, minimum=0)
+ASSET_BROTLI_QUALITY = env.int("ASSET_BROTLI_QUALITY", 11, minimum=0)
+
+# Live admin dashboard (Server-Sent Events). Every open stream holds a request
+# thread, so each process serves at most LIVE_MAX_STREAMS of them; streams end
+# after LIVE_STREAM_MAX_AGE seconds (browsers reconnect and resume), which
+# keeps them from holding a stopping worker past WEB_GRACEFUL_TIMEOUT.
+LIVE_MAX_STREAMS = env.int("LIVE_MAX_STREAMS", max(1, WEB_THREADS // 2), minimum=0)
+LIVE_STREAM_MAX_AGE = env.float("LIVE_STREAM_MAX_AGE", min(25.0, WEB_GRACEFUL_TIMEOUT * 0.8), minimum=1)
+LIVE_HISTORY = env.int("LIVE_HISTORY", 2000, minimum=1)
+# Seconds between reads of changes made by other workers
+LIVE_POLL_INTERVAL = env.float("LIVE_POLL_INTERVAL", 0.5, minimum=0.05)
+# Seconds without an open stream after which a process stops reading changes
+LIVE_IDLE_TIMEOUT = env.float("LIVE_IDLE_TIMEOUT", 60.0, minimum=1)
+
+# Admin login; set SECRET_KEY so sessions survive restarts
+SECRET_KEY = env.str("SECRET_KEY")
+ADMIN_USERNAME = env.str("ADMIN_USERNAME", "admin")
+ADMIN_PASSWORD = env.str("ADMIN_PASSWORD", "admin")
+
+# Dispatch settings
+# "persistent" runs every dispatch on one long-lived background event loop so the
+# LiveKit client and its HTTP connections are reused; "per_request" restores the
+# old behaviour of a fresh event loop (and client) for every request
+DISPATCH_LOOP_MODE = env.choice("DISPATCH_LOOP_MODE", "persistent", ("persistent", "per_request"))
+DISPATCH_TIMEOUT = env.float("DISPATCH_TIMEOUT", 30.0, minimum=0)
+
+# Bulk dispatch settings. /submit/bulk is for server-to-server use (CRM
+# syncs) and needs "Authorization: Bearer <BULK_API_TOKEN>"; it is disabled
+# while no token is set
+BULK_API_TOKEN = env.str("BULK_API_TOKEN", "")
+BULK_DISPATCH_CONCURRENCY = env.int("BULK_DISPATCH_CONCURRENCY", 50, minimum=1)
+BULK_MAX_LEADS = env.int("BULK_MAX_LEADS", 10000, minimum=1)
+
+# Write-behind persistence of call records
+CALL_WRITER_BATCH_SIZE = env.int("CALL_WRITER_BATCH_SIZE", 200, minimum=1)
+CALL_WRITER_FLUSH_INTERVAL = env.float("CALL_WRITER_FLUSH_INTERVAL", 0.5, minimum=0)
+
+# Set once LiveKit webhooks point at /events/livekit and/or the agents post to
+# /events/agent (CALL_EVENTS_URL): only then does the web service learn when
+# calls end
+CALL_EVENTS_ENABLED = env.bool("CALL_EVENTS_ENABLED", False)
+
+# Outbound trunk admission control (0 disables a limit). Limits apply per web
+# process and only in the persistent dispatch loop mode.
+SIP_OUTBOUND_TRUNK_ID = env.str("SIP_OUTBOUND_TRUNK_ID", "")
+TRUNK_CALLS_PER_SECOND = env.float("TRUNK_CALLS_PER_SECOND", 5.0, minimum=0)
+TRUNK_BURST = env.float("TRUNK_BURST", 0.0, minimum=0) or None
+# A concurrency slot is returned by the call's end event, so the limit needs
+# CALL_EVENTS_ENABLED; TRUNK_CALL_LEASE_SECONDS only reclaims slots whose end
+# event never arrived
+TRUNK_MAX_CONCURRENT_CALLS = env.int("TRUNK_MAX_CONCURRENT_CALLS", 0, minimum=0)
+TRUNK_CALL_LEASE_SECONDS = env.float("TRUNK_CALL_LEASE_SECONDS", 600.0, minimum=1)
+if TRUNK_MAX_CONCURRENT_CALLS and not CALL_EVENTS_ENABLED:
+    env.errors.append(
+        "TRUNK_MAX_CONCURRENT_CALLS needs CALL_EVENTS_ENABLED=true (and a configured event source): "
+        "without call end events slots only come back when their lease expires"
+    )
+DISPATCH_QUEUE_LIMIT = env.int("DISPATCH_QUEUE_LIMIT", 1000, minimum=0)
+DISPATCH_QUEUE_TIMEOUT = env.float("DISPATCH_QUEUE_TIMEOUT", 20.0, minimum=0)
+
+# Repeat dial requests for the same number within the window are merged into
+# the first call ("merge") or refused ("reject"); 0 disables the check
+DUPLICATE_DIAL_WINDOW = env.float("DUPLICATE_DIAL_WINDOW", 300.0, minimum=0)
+DUPLICATE_DIAL_POLICY = env.choice("DUPLICATE_DIAL_POLICY", "merge", ("merge", "reject"))
+# Each process remembers the claims it made or saw for up to this long
+# (seconds) before asking the shared table again
+DUPLICATE_DIAL_CACHE_TTL = env.float("DUPLICATE_DIAL_CACHE_TTL", 30.0, minimum=0)
+DUPLICATE_DIAL_CACHE_SIZE = env.int("DUPLICATE_DIAL_CACHE_SIZE", 100000, minimum=1)
+
+# Call lifecycle events (LiveKit webhooks at /events/livekit, agent events at
+# /events/agent) are merged per room and applied every CALL_EVENT_FLUSH_INTERVAL
+# seconds, or sooner once CALL_EVENT_MAX_PENDING rooms are waiting. Events for
+# rooms with no call record yet are kept for CALL_EVENT_ORPHAN_TTL seconds.
+CALL_EVENT_FLUSH_INTERVAL = env.float("CALL_EVENT_FLUSH_INTERVAL", 0.25, minimum=0.01)
+CALL_EVENT_MAX_PENDING = env.int("CALL_EVENT_MAX_PENDING", 5000, minimum=1)
+CALL_EVENT_ORPHAN_TTL = env.float("CALL_EVENT_ORPHAN_TTL", 60.0, minimum=0)
+# Call analytics rollups: minute and hour buckets are kept this many days
+# (0 keeps them forever); day buckets are always kept
+ROLLUP_MINUTE_RETENTION_DAYS = env.int("ROLLUP_MINUTE_RETENTION_DAYS", 7, minimum=0)
+ROLLUP_HOUR_RETENTION_DAYS = env.int("ROLLUP_HOUR_RETENTION_DAYS", 90, minimum=0)
+# Seconds new dispatches are held back after a call fails with a congestion SIP status
+TRUNK_CONGESTION_PAUSE = env.float("TRUNK_CONGESTION_PAUSE", 5.0, minimum=0)
+
+env.validate()
@@ -0,0 +1,197 @@
+# web/dedupe.py
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from shared.database import db, CallRecord, DialClaim, begin_immediate
+from .call_writer import call_writer
+
+logger = logging.getLogger(__name__)
+
+# Expired claims are deleted at most this often (seconds)
+PRUNE_INTERVAL = 60
+
+class DialDeduplicator:
+    """Suppresses repeat dial requests for the same E.164 number within a window
+
+    A claim is a `dial_claims` row keyed on the number, so every web worker
+    (and a restarted process) sees it the moment it is committed, before the
+    call record leaves the write-behind queue. The check and the claim run
+    in one BEGIN IMMEDIATE transaction, so two workers cannot both claim a
+    number. A claim whose call has since failed (busy, rejected, no answer)
+    does not block a retry.
+
+    In front of the table sits an in-memory TTL cache (a dict, so lookups are
+    O(1)) of the claims this process made or saw, so a repeat request served
+    by the same process never touches the database. Entries live for at most
+    `cache_ttl` seconds, after which the table is asked again and a failed
+    call is noticed. Confirmations go through the call record writer.
+    """
+
+    def __init__(self, app=None, window=300, cache_ttl=30, max_entries=100000, writer=None):
+        self.app = app
+        self.window = window
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.writer = writer if writer is not None else call_writer
+        self._claims = OrderedDict()  # phone -> (expires_at, room_name, dispatch_id, pending)
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def init_app(self, app, window=None, cache_ttl=None, max_entries=None, writer=None):
+        self.app = app
+        if window is not None:
+            self.window = window
+        if cache_ttl is not None:
+            self.cache_ttl = cache_ttl
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if writer is not None:
+            self.writer = writer
+
+    def reset_after_fork(self):
+        """Drop the cache inherited from the parent process"""
+        self._claims = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, phone, room_name):
+        """Reserve `phone` for `room_name`
+
+        Returns None when the caller may dial, or a dict describing the call
+        already made to this number within the window; its `pending` is True
+        while that call's dispatch has not succeeded yet.
+        """
+        if not self.window or self.app is None:
+            return None
+        cached = self._cached(phone)
+        if cached is not None:
+            return cached
+
+        existing, remaining = self._claim_in_db(phone, room_name)
+        if existing is None:
+            self._cache(phone, remaining, room_name, None, True)
+        elif not existing["pending"]:
+            # A dispatch still in flight may fail: only settled claims are cached
+            self._cache(phone, remaining, existing["room_name"], existing["dispatch_id"], False)
+        return existing
+
+    def confirm(self, phone, room_name, dispatch_id):
+        """Attach the dispatch id to a claim once the dispatch succeeded (written behind)"""
+        if not self.window or self.app is None:
+            return
+        with self._lock:
+            claim = self._claims.get(phone)
+            if claim is not None and claim[1] == room_name:
+                self._claims[phone] = (claim[0], room_name, dispatch_id, False)
+        self.writer.defer(
+            update(DialClaim)
+            .where(DialClaim.phone_e164 == phone, DialClaim.room_name == room_name)
+            .values(dispatch_id=dispatch_id, dispatched_at=datetime.datetime.utcnow())
+        )
+
+    def release(self, phone, room_name):
+        """Drop a claim whose dispatch failed, so the number can be retried"""
+        if not self.window or self.app is None:
+            return
+        with self._lock:
+            claim = self._claims.get(phone)
+            if claim is not None and claim[1] == room_name:
+                del self._claims[phone]
+        try:
+            with self.app.app_context():
+                try:
+                    db.session.execute(
+                        delete(DialClaim).where(DialClaim.phone_e164 == phone, DialClaim.room_name == room_name)
+                    )
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            logger.warning(f"Releasing a duplicate dial claim failed: {e}")
+
+    def forget(self, room_name):
+        """Drop the cached claim of a call that failed, so a retry asks the table again"""
+        with self._lock:
+            for phone, claim in self._claims.items():
+                if claim[1] == room_name:
+                    del self._claims[phone]
+                    return
+
+    def _cached(self, phone):
+        now = time.monotonic()
+        with self._lock:
+            claim = self._claims.get(phone)
+            if claim is None:
+                return None
+            if claim[0] <= now:
+                del self._claims[phone]
+                return None
+            return {"room_name": claim[1], "dispatch_id": claim[2], "pending": claim[3]}
+
+    def _cache(self, phone, remaining, room_name, dispatch_id, pending):
+        now = time.monotonic()
+        with self._lock:
+            self._claims.pop(phone, None)
+            self._claims[phone] = (now + min(remaining, self.cache_ttl), room_name, dispatch_id, pending)
+            self._evict(now)
+
+    def _evict(self, now):
+        # Entries are appended roughly in expiry order, so the oldest come first
+        while self._claims:
+            phone, claim = next(iter(self._claims.items()))
+            if claim[0] > now and len(self._claims) <= self.max_entries:
+                break
+            del self._claims[phone]
+
+    def _claim_in_db(self, phone, room_name):
+        """(existing claim or None, seconds it has left): claims the number when it is free"""
+        now = datetime.datetime.utcnow()
+        try:
+            with self.app.app_context():
+                try:
+                    begin_immediate(db.session)
+                    existing = db.session.execute(
+                        select(DialClaim.room_name, DialClaim.dispatch_id, DialClaim.dispatched_at,
+                               DialClaim.expires_at, CallRecord.status)
+                        .outerjoin(CallRecord, CallRecord.room_name == DialClaim.room_name)
+                        .where(DialClaim.phone_e164 == phone, DialClaim.expires_at > now)
+                    ).first()
+                    if existing is not None and existing.status != "failed":
+                        db.session.rollback()
+                        return {
+                            "room_name": existing.room_name,
+                            "dispatch_id": existing.dispatch_id,
+                            "pending": existing.dispatched_at is None,
+                        }, (existing.expires_at - now).total_seconds()
+                    stmt = sqlite_insert(DialClaim).values(
+                        phone_e164=phone, room_name=room_name, dispatch_id=None, dispatched_at=None,
+                        expires_at=now + datetime.timedelta(seconds=self.window)
+                    )
+                    db.session.execute(stmt.on_conflict_do_update(
+                        index_elements=[DialClaim.phone_e164],
+                        set_={column: stmt.excluded[column]
+                              for column in ("room_name", "dispatch_id", "dispatched_at", "expires_at")}
+                    ))
+                    self._prune(now)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            logger.warning(f"Duplicate dial check failed, allowing the call: {e}")
+        return None, self.window
+
+    def _prune(self, now):
+        if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+            self._pruned_at = time.monotonic()
+            db.session.execute(delete(DialClaim).where(DialClaim.expires_at <= now))
+
+dial_dedupe = DialDeduplicator()
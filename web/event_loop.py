@@ -0,0 +1,93 @@
+# web/event_loop.py
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A single long-lived event loop, run on a daemon thread, that owns every
+# LiveKit API client and its HTTP connections for this process
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        loop.close()
+        logger.debug("Dispatch event loop closed")
+
+def get_event_loop():
+    """Get the background dispatch loop, starting its thread on first use"""
+    global _loop, _thread
+    if _loop is not None and _thread.is_alive():
+        return _loop
+
+    with _lock:
+        if _loop is None or not _thread.is_alive():
+            logger.debug("Starting background dispatch event loop")
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(
+                target=_run_loop,
+                args=(_loop,),
+                name="dispatch-loop",
+                daemon=True
+            )
+            _thread.start()
+    return _loop
+
+def run_coroutine(coro, timeout=None):
+    """Run a coroutine on the background loop and block until it finishes"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result(timeout)
+    except Exception:
+        future.cancel()
+        raise
+
+def submit_coroutine(coro):
+    """Schedule a coroutine on the background loop without waiting for it"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+def is_running():
+    """Whether the background loop has been started and is still alive"""
+    return _loop is not None and _thread is not None and _thread.is_alive()
+
+def reset_after_fork():
+    """Forget a loop inherited from the parent process; the child starts its own on first use"""
+    global _loop, _thread, _lock
+    _loop = _thread = None
+    _lock = threading.Lock()
+
+async def _drain(cleanup, timeout):
+    """Let in-flight dispatches finish (up to `timeout`), then run `cleanup`"""
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    if pending:
+        logger.info(f"Waiting for {len(pending)} in-flight dispatch tasks")
+        _, unfinished = await asyncio.wait(pending, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            logger.warning(f"Cancelled {len(unfinished)} dispatch tasks still running at shutdown")
+    if cleanup is not None:
+        await cleanup()
+
+def stop_event_loop(cleanup=None, timeout=10):
+    """Drain in-flight tasks, await an optional cleanup coroutine function on the loop, then stop it"""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+
+    if loop is None or thread is None or not thread.is_alive():
+        return
+
+    try:
+        asyncio.run_coroutine_threadsafe(_drain(cleanup, timeout), loop).result(timeout * 2)
+    except Exception as e:
+        logger.error(f"Error during dispatch loop cleanup: {e}")
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
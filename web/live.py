@@ -0,0 +1,272 @@
+# web/live.py
+import datetime
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy import select, tuple_
+from shared.database import db, CallRecord, get_call_counters
+
+logger = logging.getLogger(__name__)
+
+# Call fields pushed to live dashboards (never the large or personal-note fields)
+LIVE_CALL_FIELDS = ("id", "room_name", "customer_name", "customer_phone", "status",
+                    "call_start", "call_end", "duration", "created_at")
+
+# updated_at is stamped just before a commit, by any process, so a row can
+# become visible after newer ones: each poll looks back this far (seconds)
+COMMIT_LAG = 5.0
+# Rows read per query while catching up
+POLL_BATCH = 500
+
+class StreamLimitReached(Exception):
+    """Raised when this process already serves its maximum number of live streams"""
+
+def _jsonable(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+def _format(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, default=_jsonable)}\n\n"
+
+class ChangeFeed:
+    """Fan-out of call changes, made by any web worker, to this process's admins
+
+    Once a stream is open, one thread tails call_records on the
+    (updated_at, id) index every `poll_interval` seconds, or as soon as this
+    process's call record writer or call event ingestor commits. When no
+    stream has been open for `idle_timeout` seconds the thread parks until
+    the next one opens; browsers resuming across the pause get a `reset`. Each
+    changed row is encoded as an SSE message once, followed by the current
+    status counters, and appended to a bounded history. Each open stream
+    only remembers the id of the last message it sent and, when woken,
+    copies out whatever is newer, so N admins cost one query per poll, one
+    encode per change and N socket writes.
+
+    Ids are "<epoch>-<seq>" where the epoch is unique to this process. A
+    browser that reconnects (EventSource sends Last-Event-ID) to the same
+    process resumes from the history; otherwise it gets a `reset` and
+    re-reads the snapshot.
+    """
+
+    def __init__(self, app=None, history=2000, max_streams=4, max_age=25.0, heartbeat=10.0, poll_interval=0.5,
+                 idle_timeout=60.0):
+        self.app = app
+        self.history = history
+        self.max_streams = max_streams
+        self.max_age = max_age
+        self.heartbeat = heartbeat
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.streams = 0
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self._epoch = os.urandom(4).hex()
+        self._seq = itertools.count(1)
+        self._events = deque(maxlen=self.history)  # (seq, encoded message)
+        self._last_seq = 0
+        lock = threading.RLock()
+        self._cond = threading.Condition(lock)  # a new message, or the feed closed
+        self._demand = threading.Condition(lock)  # a stream opened, or the feed closed
+        self._closed = False
+        self._wake = threading.Event()
+        self._tailer = None
+        self.streams = 0
+
+    def init_app(self, app, history=None, max_streams=None, max_age=None, poll_interval=None, idle_timeout=None):
+        from .call_writer import call_writer
+        from .call_events import call_events
+
+        self.app = app
+        if history is not None:
+            self.history = history
+        if max_streams is not None:
+            self.max_streams = max_streams
+        if max_age is not None:
+            self.max_age = max_age
+        if poll_interval is not None:
+            self.poll_interval = poll_interval
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        self._reset()
+        call_writer.add_commit_listener(self.on_commit)
+        call_events.add_commit_listener(self.on_commit)
+
+    def reset_after_fork(self):
+        """Start an empty feed with its own epoch (and no tailing thread) in a forked worker"""
+        self._reset()
+
+    def close(self):
+        """End every open stream and stop tailing (the process is shutting down)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._demand.notify_all()
+        self._wake.set()
+
+    def on_commit(self, calls, deltas):
+        """Commit listener: this process changed calls, so poll now rather than at the next interval"""
+        self._wake.set()
+
+    def _start_tailing(self):
+        with self._cond:
+            if self.app is None or self._closed or (self._tailer is not None and self._tailer.is_alive()):
+                return
+            self._tailer = threading.Thread(target=self._tail, name="live-change-feed", daemon=True)
+            self._tailer.start()
+
+    def _tail(self):
+        while not self._closed:
+            # The first poll re-sends the last COMMIT_LAG seconds of changes, which
+            # covers anything committed between a stream's snapshot and this start
+            cursor = datetime.datetime.utcnow()
+            seen = {}  # (id, updated_at) published within COMMIT_LAG of the cursor
+            idle_since = time.monotonic()
+            while not self._closed:
+                try:
+                    cursor = self._poll(cursor, seen)
+                except Exception as e:
+                    logger.error(f"Reading call changes for the live feed failed: {e}")
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                with self._cond:
+                    if self.streams:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since >= self.idle_timeout:
+                        self._park()
+                        break
+
+    def _park(self):
+        """Wait for a stream to open (called with the lock held by the tailing thread)"""
+        # Changes made while parked are never published: leave a gap in the
+        # sequence so a stream resuming from before it is told to reset
+        self._events.clear()
+        self._last_seq = next(self._seq)
+        logger.debug("No live streams open, parking the change feed")
+        while not self.streams and not self._closed:
+            self._demand.wait()
+
+    def _poll(self, cursor, seen):
+        """Publish calls changed since `cursor` (less COMMIT_LAG) and not yet seen; returns the new cursor"""
+        after = (cursor - datetime.timedelta(seconds=COMMIT_LAG), 0)
+        columns = [getattr(CallRecord, field) for field in LIVE_CALL_FIELDS] + [CallRecord.updated_at]
+        fresh = []
+        with self.app.app_context():
+            try:
+                while True:
+                    rows = db.session.execute(
+                        select(*columns)
+                        .where(tuple_(CallRecord.updated_at, CallRecord.id) > after)
+                        .order_by(CallRecord.updated_at, CallRecord.id)
+                        .limit(POLL_BATCH)
+                    ).all()
+                    fresh.extend(row for row in rows if (row.id, row.updated_at) not in seen)
+                    if len(rows) < POLL_BATCH:
+                        break
+                    after = (rows[-1].updated_at, rows[-1].id)
+                counters = get_call_counters() if fresh else None
+            finally:
+                db.session.remove()
+
+        for row in fresh:
+            seen[(row.id, row.updated_at)] = row.updated_at
+            cursor = max(cursor, row.updated_at)
+        horizon = cursor - datetime.timedelta(seconds=COMMIT_LAG)
+        for key in [key for key, updated_at in seen.items() if updated_at <= horizon]:
+            del seen[key]
+
+        messages = [("call", {field: getattr(row, field) for field in LIVE_CALL_FIELDS}) for row in fresh]
+        if counters is not None:
+            messages.append(("counters", counters))
+        self.publish(messages)
+        return cursor
+
+    def publish(self, messages):
+        """Append (event, data) messages and wake every stream"""
+        if not messages:
+            return
+        with self._cond:
+            for kind, data in messages:
+                seq = next(self._seq)
+                self._events.append((seq, _format(f"{self._epoch}-{seq}", kind, data)))
+            self._last_seq = seq
+            self._cond.notify_all()
+
+    def resume_point(self, last_event_id):
+        """The sequence number to continue after, or None if the history cannot cover it"""
+        epoch, _, seq = (last_event_id or "").rpartition("-")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._cond:
+            if seq > self._last_seq or seq < self._oldest() - 1:
+                return None
+        return seq
+
+    def _oldest(self):
+        return self._events[0][0] if self._events else self._last_seq + 1
+
+    def current(self):
+        with self._cond:
+            return self._last_seq
+
+    def stream(self, after, snapshot=None):
+        """Generator of SSE text: an optional snapshot message, then every change after `after`
+
+        Raises StreamLimitReached before yielding anything when `max_streams`
+        streams are already open. Ends after `max_age` seconds (the browser
+        reconnects and resumes) or when the feed is closed.
+        """
+        if self.max_streams and self.streams >= self.max_streams:
+            raise StreamLimitReached(f"{self.streams} live streams already open")
+        self._start_tailing()
+        return self._stream(after, snapshot)
+
+    def _stream(self, after, snapshot):
+        # Counted from the first read: a response that is never iterated never
+        # runs the finally below
+        with self._cond:
+            self.streams += 1
+            self._demand.notify_all()
+        try:
+            # Browsers wait this long (ms) before reconnecting after the stream ends
+            yield "retry: 1000\n\n"
+            if snapshot is not None:
+                yield _format(f"{self._epoch}-{after}", "snapshot", snapshot)
+            ends_at = time.monotonic() + self.max_age
+            while True:
+                remaining = ends_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                with self._cond:
+                    if self._last_seq <= after and not self._closed:
+                        self._cond.wait(min(self.heartbeat, remaining))
+                    if self._closed:
+                        return
+                    missed = self._oldest() > after + 1
+                    pending = []
+                    if not missed:
+                        # Newest first, stopping at what this stream already sent
+                        for seq, message in reversed(self._events):
+                            if seq <= after:
+                                break
+                            pending.append(message)
+                        pending.reverse()
+                        after = self._last_seq
+                if missed:
+                    yield _format(f"{self._epoch}-{after}", "reset", {})
+                    return
+                if pending:
+                    yield "".join(pending)
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._cond:
+                self.streams -= 1
+
+change_feed = ChangeFeed()
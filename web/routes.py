@@ -1,57 +1,236 @@
 # web/routes.py
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, Response, stream_with_context
 import json
+import queue
 import logging
 import asyncio
-import aiohttp
-import traceback
 import atexit
+import hmac
 import signal
-from livekit import api as lkapi
+import sys
 from agent.utlis import generate_room_name, logging, setup_logging
-from .config import LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET, AGENT_NAME
+from .config import (
+    LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET, AGENT_NAME,
+    DISPATCH_LOOP_MODE, DISPATCH_TIMEOUT, BULK_API_TOKEN, BULK_DISPATCH_CONCURRENCY, BULK_MAX_LEADS,
+    SIP_OUTBOUND_TRUNK_ID, TRUNK_CALLS_PER_SECOND, TRUNK_BURST, TRUNK_MAX_CONCURRENT_CALLS,
+    TRUNK_CALL_LEASE_SECONDS, DISPATCH_QUEUE_LIMIT, DISPATCH_QUEUE_TIMEOUT,
+    DEFAULT_PHONE_REGION, DUPLICATE_DIAL_POLICY, CALL_EVENTS_SECRET, TRUNK_CONGESTION_PAUSE
+)
+from shared.admission import AdmissionController, AdmissionError, classify_sip_status
+from shared.call_events import SIGNATURE_HEADER, TIMESTAMP_HEADER, SIP_FAILED, HANGUP, SignatureError, verify
+from shared.phone import normalize_phone, InvalidPhoneNumber
+from shared.logging_config import bind_log_context
+from .dedupe import dial_dedupe
+from . import event_loop
+from .call_writer import call_writer
+from .bulk import parse_leads, fan_out, stream_results, LeadParseError
+from .call_events import call_events, events_from_agent, events_from_webhook, ROOM_FINISHED
+from .live import change_feed
 
 logger = logging.getLogger(__name__)
 
-# Create a global session that will be reused
-_session = None
+# The LiveKit client is created on (and bound to) the dispatch event loop
 _lk_client = None
+# Verifies LiveKit webhook signatures; built on the first webhook
+_webhook_receiver = None
+# Pending check of this worker's trunk leases against the database (dispatch loop)
+_reconcile_timer = None
+
+# How often a worker holding trunk leases looks up which of their calls ended
+LEASE_RECONCILE_INTERVAL = 2.0
+
+# The LiveKit SDK (and aiohttp under it) is imported on the first dispatch,
+# not at startup: health checks, the admin UI and static pages never need it
+def _new_livekit_client():
+    from livekit import api as lkapi
+    return lkapi.LiveKitAPI(
+        url=LIVEKIT_URL,
+        api_key=LIVEKIT_API_KEY,
+        api_secret=LIVEKIT_API_SECRET
+    )
 
 def get_livekit_client():
-    """Get or create a LiveKit API client with a shared session"""
-    global _session, _lk_client
+    """Get or create the shared LiveKit API client (bound to the dispatch loop)"""
+    global _lk_client
     if _lk_client is None:
         logger.debug("Creating LiveKit API client")
-        _lk_client = lkapi.LiveKitAPI(
-            url=LIVEKIT_URL,
-            api_key=LIVEKIT_API_KEY,
-            api_secret=LIVEKIT_API_SECRET
-        )
+        _lk_client = _new_livekit_client()
     return _lk_client
 
 async def cleanup_resources():
     """Clean up global resources"""
-    global _session
-    if _session:
-        await _session.close()
-        logger.debug("Closed global aiohttp session")
-        _session = None
+    global _lk_client, _reconcile_timer
+    if _reconcile_timer is not None:
+        _reconcile_timer.cancel()
+        _reconcile_timer = None
+    if _lk_client:
+        client, _lk_client = _lk_client, None
+        await client.aclose()
+        logger.debug("Closed LiveKit API client")
+
+def _build_admission(workers=1):
+    """Admission controller holding this process's share of the trunk limits"""
+    return AdmissionController(
+        calls_per_second=TRUNK_CALLS_PER_SECOND / workers,
+        burst=TRUNK_BURST / workers if TRUNK_BURST else None,
+        max_concurrent=-(-TRUNK_MAX_CONCURRENT_CALLS // workers),
+        max_queue=DISPATCH_QUEUE_LIMIT,
+        lease_seconds=TRUNK_CALL_LEASE_SECONDS
+    )
+
+# Per-trunk rate/concurrency limits in front of dispatch; lives on the dispatch loop
+admission = _build_admission()
+
+def init_worker(workers=1):
+    """Reset dispatch state in a worker forked from a preloaded app
+
+    The child gets its own dispatch loop and LiveKit client on first use,
+    and an equal share of the trunk limits, so `workers` processes together
+    stay within the configured limits.
+    """
+    global _lk_client, _reconcile_timer, admission
+    _lk_client = _reconcile_timer = None
+    event_loop.reset_after_fork()
+    admission = _build_admission(workers)
+
+async def admit_and_dispatch(room_name, metadata, queue_timeout=DISPATCH_QUEUE_TIMEOUT):
+    """Wait for trunk capacity, then create the dispatch
+
+    The trunk slot stays leased to the room for the length of the call and
+    is returned once the call's end is reported (see on_call_event and
+    _reconcile_leases), or here if the admission wait or the dispatch fails
+    or is cancelled.
+    """
+    # Runs as its own task on the dispatch loop, so the binding stays with this call
+    bind_log_context(room=room_name)
+    try:
+        await admission.acquire(SIP_OUTBOUND_TRUNK_ID, room_name, timeout=queue_timeout)
+        _schedule_lease_reconcile()
+        return await asyncio.wait_for(create_dispatch(room_name, metadata), DISPATCH_TIMEOUT)
+    except BaseException:
+        admission.release(SIP_OUTBOUND_TRUNK_ID, room_name)
+        raise
+
+def release_call_slot(room_name):
+    """Return a finished call's trunk slot (safe to call from any thread)"""
+    if event_loop.is_running():
+        event_loop.get_event_loop().call_soon_threadsafe(
+            admission.release, SIP_OUTBOUND_TRUNK_ID, room_name
+        )
+
+def _schedule_lease_reconcile():
+    global _reconcile_timer
+    if _reconcile_timer is None and TRUNK_MAX_CONCURRENT_CALLS:
+        _reconcile_timer = asyncio.get_running_loop().call_later(LEASE_RECONCILE_INTERVAL, _reconcile_leases)
+
+def _reconcile_leases():
+    """Return the leases of calls whose end was recorded by any worker
+
+    LiveKit and the agent report a call's end to whichever worker they
+    reach, which is usually not the one holding its lease. Every worker's
+    ingestor writes call_end to the shared database, so the holder looks
+    its leases up there while it has any. The query runs on the default
+    executor rather than in a task, so it never holds up a shutdown drain.
+    """
+    global _reconcile_timer
+    _reconcile_timer = None
+    leases = admission.leases()
+    if not leases:
+        return
+
+    def on_result(future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Checking trunk leases against call records failed: {future.exception()}")
+        else:
+            ended = future.result()
+            for trunk_id, room_name in leases:
+                if room_name in ended:
+                    admission.release(trunk_id, room_name)
+        _schedule_lease_reconcile()
+
+    asyncio.get_running_loop().run_in_executor(
+        None, call_events.ended, [room_name for _, room_name in leases]
+    ).add_done_callback(on_result)
+
+def pause_trunk(seconds):
+    """Hold back new dispatches on the trunk for `seconds` (safe to call from any thread)"""
+    if seconds and event_loop.is_running():
+        event_loop.get_event_loop().call_soon_threadsafe(
+            lambda: admission.limiter(SIP_OUTBOUND_TRUNK_ID).pause(seconds)
+        )
+
+def on_call_event(event):
+    """call_events listener: free the trunk slot of a finished call, back off on congestion
+
+    The release only frees a lease this worker holds; leases held by other
+    workers are returned by their _reconcile_leases once the event is applied.
+    """
+    if event.kind in (HANGUP, SIP_FAILED, ROOM_FINISHED):
+        release_call_slot(event.room_name)
+    if event.kind == SIP_FAILED:
+        dial_dedupe.forget(event.room_name)
+    if event.kind == SIP_FAILED and classify_sip_status(event.sip_status) == "congestion":
+        pause_trunk(TRUNK_CONGESTION_PAUSE)
+
+def get_webhook_receiver():
+    global _webhook_receiver
+    if _webhook_receiver is None:
+        from livekit import api as lkapi
+        _webhook_receiver = lkapi.WebhookReceiver(lkapi.TokenVerifier(LIVEKIT_API_KEY, LIVEKIT_API_SECRET))
+    return _webhook_receiver
+
+def dispatch_call(room_name, metadata):
+    """Create a dispatch from a request handler according to DISPATCH_LOOP_MODE"""
+    if DISPATCH_LOOP_MODE != "per_request":
+        return event_loop.run_coroutine(
+            admit_and_dispatch(room_name, metadata),
+            timeout=DISPATCH_QUEUE_TIMEOUT + DISPATCH_TIMEOUT
+        )
+
+    # Legacy mode: a fresh loop per request. A client cannot outlive the loop
+    # it was created on, so each request also pays for its own client.
+    async def _dispatch_with_own_client():
+        lk_client = _new_livekit_client()
+        try:
+            return await create_dispatch(room_name, metadata, lk_client=lk_client)
+        finally:
+            await lk_client.aclose()
 
-# Register cleanup on exit
-def cleanup_on_exit():
-    """Run cleanup in a new event loop when the application exits"""
     loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(cleanup_resources())
+        return loop.run_until_complete(
+            asyncio.wait_for(_dispatch_with_own_client(), DISPATCH_TIMEOUT)
+        )
     finally:
         loop.close()
 
+# Register cleanup on exit
+def cleanup_on_exit():
+    """End live streams, stop the dispatch loop, then flush queued call records and call events"""
+    change_feed.close()
+    event_loop.stop_event_loop(cleanup=cleanup_resources)
+    call_writer.stop()
+    call_events.stop()
+
 atexit.register(cleanup_on_exit)
 
-# Also handle SIGINT and SIGTERM for cleaner Docker shutdowns
-for sig in (signal.SIGINT, signal.SIGTERM):
-    signal.signal(sig, lambda signum, frame: (cleanup_on_exit(), signal.default_int_handler(signum, frame)))
+def _shutdown_on_signal(signum, frame):
+    """Drain dispatches and flush queued records, then exit
+
+    SIGINT still raises KeyboardInterrupt; SIGTERM exits cleanly instead of
+    being reported as an interrupt.
+    """
+    cleanup_on_exit()
+    if signum == signal.SIGINT:
+        signal.default_int_handler(signum, frame)
+    sys.exit(0)
+
+def install_signal_handlers():
+    """Handle SIGINT and SIGTERM for the development server (gunicorn installs its own)"""
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, _shutdown_on_signal)
 
 def register_routes(app):
     @app.route('/')
@@ -79,70 +258,262 @@ def register_routes(app):
                     "message": "Name and phone number are required."
                 }), 400
             
+            try:
+                phone_e164 = normalize_phone(phone, DEFAULT_PHONE_REGION)
+            except InvalidPhoneNumber:
+                return jsonify({
+                    "success": False,
+                    "message": "Please enter a valid phone number, including the country code."
+                }), 400
+            
             # Create random room name
             room_name = generate_room_name()
+            bind_log_context(room=room_name)
+            
+            # Merge (or refuse) repeat requests for a number that was just dialled
+            duplicate = dial_dedupe.claim(phone_e164, room_name)
+            if duplicate is not None:
+                return duplicate_response(phone_e164, duplicate)
             
             # Prepare metadata as a JSON string
-            metadata_dict = {
-                "phone_number": phone,
-                "name": name,
-                "email": email,
-                "query": query if query else None  # Only include query if it's not empty
-            }
-            metadata = json.dumps(metadata_dict)
-            logger.debug(f"Prepared metadata: {metadata}")
+            metadata = build_metadata(name, phone_e164, email, query)
+            # Only the shape: the metadata holds the customer's name, phone and email
+            logger.debug("Prepared metadata (%d bytes)", len(metadata))
             
             # Create the dispatch
-            logger.info(f"Creating dispatch for {name} at {phone}")
-            
-            # Use nest_asyncio to handle asyncio in Flask
-            import nest_asyncio
-            nest_asyncio.apply()
-            
-            # Create a new event loop for this request
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            logger.info("Creating dispatch for %s at %s", name, phone_e164)
             
             try:
-                # Run the async function
-                result = loop.run_until_complete(create_dispatch(room_name, metadata))
+                # Run the dispatch on the shared event loop
+                try:
+                    result = dispatch_call(room_name, metadata)
+                except BaseException:
+                    dial_dedupe.release(phone_e164, room_name)
+                    raise
+                dial_dedupe.confirm(phone_e164, room_name, result.get("dispatch_id"))
+                record_call(room_name, result.get("dispatch_id"), name, phone, email, query, metadata, phone_e164)
                 
                 return jsonify({
                     "success": True, 
                     "message": "Your call has been scheduled. Our agent will call you shortly.",
                     "details": {
                         "room_name": room_name,
-                        "dispatch_id": result.get("dispatch_id", "No dispatch ID returned")
+                        "dispatch_id": result.get("dispatch_id") or "No dispatch ID returned"
                     }
                 })
                 
+            except AdmissionError as busy:
+                logger.warning("Dispatch for %s not admitted: %s", room_name, busy)
+                return jsonify({
+                    "success": False,
+                    "message": "All our lines are busy right now. Please try again in a minute."
+                }), 503, {"Retry-After": "30"}
+                
             except Exception as inner_e:
-                logger.error(f"Error in async dispatch: {str(inner_e)}")
-                logger.error(traceback.format_exc())
+                logger.exception("Error in async dispatch: %s", inner_e)
                 return jsonify({
                     "success": False,
                     "message": f"Error creating dispatch: {str(inner_e)}"
                 }), 500
-            finally:
-                # Clean up the event loop
-                loop.close()
             
         except Exception as e:
-            logger.error(f"Error in form processing: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error in form processing: %s", e)
             return jsonify({
                 "success": False,
                 "message": f"Error processing your request: {str(e)}"
             }), 500
 
-async def create_dispatch(room_name, metadata):
+    @app.route('/submit/bulk', methods=['POST'])
+    def submit_bulk():
+        """Dispatch a batch of leads and stream per-lead results as NDJSON"""
+        denied = bulk_token_error()
+        if denied is not None:
+            return denied
+        try:
+            leads = parse_leads(request)
+        except LeadParseError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if not leads:
+            return jsonify({"success": False, "message": "No leads provided."}), 400
+        if len(leads) > BULK_MAX_LEADS:
+            return jsonify({
+                "success": False,
+                "message": f"Too many leads: {len(leads)} (max {BULK_MAX_LEADS})."
+            }), 413
+
+        concurrency = request.args.get('concurrency', BULK_DISPATCH_CONCURRENCY, type=int)
+        concurrency = max(1, min(concurrency, BULK_DISPATCH_CONCURRENCY))
+        logger.info("Bulk dispatch of %d leads with concurrency %d", len(leads), concurrency)
+
+        results = queue.Queue()
+        future = event_loop.submit_coroutine(
+            fan_out(leads, dispatch_lead, results, concurrency)
+        )
+        return Response(
+            stream_with_context(stream_results(results, future, len(leads))),
+            mimetype='application/x-ndjson'
+        )
+
+    @app.route('/events/livekit', methods=['POST'])
+    def livekit_webhook():
+        """LiveKit webhook receiver (signed with the API key and secret)"""
+        body = request.get_data(as_text=True)
+        auth_token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        try:
+            event = get_webhook_receiver().receive(body, auth_token)
+        except Exception as e:
+            logger.warning("Rejected LiveKit webhook: %s", e)
+            return jsonify({"success": False, "message": "Invalid webhook signature."}), 401
+
+        events = events_from_webhook(event)
+        if events:
+            call_events.submit(events)
+        return jsonify({"success": True, "accepted": len(events)})
+
+    @app.route('/events/agent', methods=['POST'])
+    def agent_events():
+        """Lifecycle events posted by the agent (one event or a list, HMAC-signed)"""
+        body = request.get_data()
+        try:
+            verify(CALL_EVENTS_SECRET, body,
+                   request.headers.get(TIMESTAMP_HEADER), request.headers.get(SIGNATURE_HEADER))
+        except SignatureError as e:
+            logger.warning("Rejected agent event: %s", e)
+            return jsonify({"success": False, "message": "Invalid event signature."}), 401
+
+        try:
+            events = events_from_agent(json.loads(body))
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        call_events.submit(events)
+        return jsonify({"success": True, "accepted": len(events)})
+
+def bulk_token_error():
+    """A 401/403 response unless the request carries BULK_API_TOKEN, else None"""
+    if not BULK_API_TOKEN:
+        return jsonify({"success": False, "message": "Bulk submission is disabled."}), 403
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(token.encode(), BULK_API_TOKEN.encode()):
+        logger.warning("Rejected bulk submission with a missing or wrong token")
+        return jsonify({"success": False, "message": "Invalid API token."}), 401, {"WWW-Authenticate": "Bearer"}
+    return None
+
+def duplicate_response(phone_e164, duplicate):
+    """Answer a repeat dial request according to DUPLICATE_DIAL_POLICY
+
+    A call whose dispatch is still in flight may yet fail, so a repeat
+    request for it is told to try again rather than that it was scheduled.
+    """
+    logger.info("Duplicate dial request for %s (call %s)", phone_e164, duplicate['room_name'])
+    if duplicate["pending"]:
+        return jsonify({
+            "success": False,
+            "duplicate": True,
+            "message": "We are already setting up a call to this number. Please try again in a moment."
+        }), 409, {"Retry-After": "5"}
+    if DUPLICATE_DIAL_POLICY == "reject":
+        return jsonify({
+            "success": False,
+            "message": "We are already calling this number. Please wait a few minutes before trying again."
+        }), 409
+    return jsonify({
+        "success": True,
+        "duplicate": True,
+        "message": "Your call has already been scheduled. Our agent will call you shortly.",
+        "details": {
+            "room_name": duplicate["room_name"],
+            "dispatch_id": duplicate["dispatch_id"] or "No dispatch ID returned"
+        }
+    })
+
+def build_metadata(name, phone, email, query):
+    """Build the JSON job metadata the agent reads its dial info from"""
+    return json.dumps({
+        "phone_number": phone,
+        "name": name,
+        "email": email,
+        "query": query if query else None  # Only include query if it's not empty
+    })
+
+def record_call(room_name, dispatch_id, name, phone, email, query, metadata, phone_e164=None):
+    """Queue a pending CallRecord for a dispatched call (written in batches)"""
+    call_writer.record(
+        room_name=room_name,
+        dispatch_id=dispatch_id,
+        customer_name=name,
+        customer_phone=phone,
+        customer_phone_e164=phone_e164,
+        customer_email=email or None,
+        customer_query=query or None,
+        call_metadata=metadata,
+        status='pending'
+    )
+
+async def dispatch_lead(index, lead):
+    """Validate and dispatch a single bulk lead, returning its result line"""
+    if lead is None:
+        return {"index": index, "success": False, "message": "Lead must be an object."}
+    if not lead['name'] or not lead['phone']:
+        return {"index": index, "success": False, "message": "Name and phone number are required."}
+
+    try:
+        phone_e164 = normalize_phone(lead['phone'], DEFAULT_PHONE_REGION)
+    except InvalidPhoneNumber:
+        return {"index": index, "success": False, "message": "Invalid phone number."}
+
+    room_name = generate_room_name()
+    # The claim may hit the database, so keep it off the dispatch loop
+    duplicate = await asyncio.to_thread(dial_dedupe.claim, phone_e164, room_name)
+    if duplicate is not None:
+        if duplicate["pending"]:
+            return {"index": index, "success": False, "duplicate": True, "room_name": duplicate["room_name"],
+                    "message": "A call to this number is still being dispatched."}
+        return {
+            "index": index,
+            "success": DUPLICATE_DIAL_POLICY != "reject",
+            "duplicate": True,
+            "room_name": duplicate["room_name"],
+            "dispatch_id": duplicate["dispatch_id"]
+        }
+
+    metadata = build_metadata(lead['name'], phone_e164, lead['email'], lead['query'])
+    dispatched = False
+    try:
+        # Bulk leads wait in the trunk queue for as long as the stream is open;
+        # the fan-out concurrency already bounds how many of them queue at once
+        result = await admit_and_dispatch(room_name, metadata, queue_timeout=None)
+        dispatched = True
+    except AdmissionError as e:
+        return {"index": index, "success": False, "room_name": room_name, "message": f"Not admitted: {e}"}
+    except asyncio.TimeoutError:
+        return {"index": index, "success": False, "room_name": room_name, "message": "Dispatch timed out."}
+    except Exception as e:
+        return {"index": index, "success": False, "room_name": room_name, "message": f"Error creating dispatch: {str(e)}"}
+    finally:
+        if not dispatched:
+            await asyncio.to_thread(dial_dedupe.release, phone_e164, room_name)
+
+    dial_dedupe.confirm(phone_e164, room_name, result.get("dispatch_id"))
+    record_call(room_name, result.get("dispatch_id"), lead['name'], lead['phone'],
+                lead['email'], lead['query'], metadata, phone_e164)
+    return {
+        "index": index,
+        "success": True,
+        "room_name": room_name,
+        "dispatch_id": result.get("dispatch_id")
+    }
+
+async def create_dispatch(room_name, metadata, lk_client=None):
     """Create a LiveKit agent dispatch"""
     try:
-        # Get the global LiveKit client
-        lk_client = get_livekit_client()
+        # Use the shared LiveKit client unless one was passed in
+        lk_client = lk_client or get_livekit_client()
         
         # Create dispatch request
-        logger.debug(f"Creating dispatch request for agent {AGENT_NAME}")
+        from livekit import api as lkapi
+        logger.debug("Creating dispatch request for agent %s", AGENT_NAME)
         dispatch_request = lkapi.CreateAgentDispatchRequest(
             agent_name=AGENT_NAME,
             room=room_name,
@@ -154,13 +525,12 @@ async def create_dispatch(room_name, metadata):
         response = await lk_client.agent_dispatch.create_dispatch(dispatch_request)
         
         # Extract dispatch_id safely
-        dispatch_id = getattr(response, 'dispatch_id', None) or getattr(response, 'id', 'Unknown')
+        dispatch_id = getattr(response, 'dispatch_id', None) or getattr(response, 'id', None)
         
         return {
             "dispatch_id": dispatch_id,
             "status": "success"
         }
     except Exception as e:
-        logger.error(f"LiveKit dispatch error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("LiveKit dispatch error: %s", e)
         raise
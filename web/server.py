@@ -0,0 +1,59 @@
+# web/server.py
+import logging
+from gunicorn.app.base import BaseApplication
+from shared.config import HOST, PORT
+from shared.logging_config import stop_logging, use_per_process_log_files
+from .config import WEB_WORKERS, WEB_WORKER_CLASS, WEB_THREADS, WEB_GRACEFUL_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+class WebServer(BaseApplication):
+    """Pre-forked gunicorn server for the web app
+
+    The app is loaded once in the master (so schema upgrades run once and
+    workers share its memory pages), then every worker re-creates the state
+    that cannot cross a fork in `post_fork` and logs to a file of its own
+    (`logs/web.<pid>.log`). On SIGTERM gunicorn stops
+    accepting connections and gives in-flight requests WEB_GRACEFUL_TIMEOUT
+    seconds; `worker_exit` then drains the dispatch loop and flushes the
+    write-behind queue before the worker goes away.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from .app import app
+        return app
+
+def post_fork(server, worker):
+    from .app import app, init_worker
+    # Workers must not rotate the master's log file under each other
+    use_per_process_log_files()
+    init_worker(app, server.cfg.workers)
+    logger.debug(f"Worker {worker.pid} initialised")
+
+def worker_exit(server, worker):
+    from .routes import cleanup_on_exit
+    cleanup_on_exit()
+    stop_logging()
+
+def serve(workers=WEB_WORKERS, host=HOST, port=PORT):
+    """Run the web app under gunicorn until the master is stopped"""
+    logger.info(f"Starting {workers} {WEB_WORKER_CLASS} workers on {host}:{port}")
+    WebServer({
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": WEB_WORKER_CLASS,
+        "threads": WEB_THREADS,
+        "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "accesslog": None,
+    }).run()
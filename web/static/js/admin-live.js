@@ -0,0 +1,103 @@
+// Live admin dashboard: applies call and counter changes pushed over
+// /admin/api/stream instead of reloading the page
+document.addEventListener('DOMContentLoaded', function() {
+    const dashboard = document.getElementById('liveDashboard');
+    if (!dashboard || !window.EventSource) {
+        return;
+    }
+
+    const recentBody = document.getElementById('recentCalls');
+    const indicator = document.getElementById('liveIndicator');
+    const maxRows = parseInt(dashboard.dataset.recentLimit, 10) || 10;
+    const detailsUrl = dashboard.dataset.callUrl;  // ends in a room name placeholder
+    const counters = {};
+
+    document.querySelectorAll('[data-counter]').forEach(el => {
+        counters[el.dataset.counter] = parseInt(el.textContent, 10) || 0;
+    });
+
+    function renderCounters() {
+        document.querySelectorAll('[data-counter]').forEach(el => {
+            el.textContent = counters[el.dataset.counter] || 0;
+        });
+    }
+
+    function formatTime(iso) {
+        if (!iso) {
+            return '';
+        }
+        // Stored times are naive UTC
+        return iso.slice(0, 16).replace('T', ' ');
+    }
+
+    function cell(text) {
+        const td = document.createElement('td');
+        td.textContent = text == null ? '' : text;
+        return td;
+    }
+
+    function buildRow(call) {
+        const row = document.createElement('tr');
+        row.dataset.room = call.room_name;
+        const name = document.createElement('td');
+        const link = document.createElement('a');
+        link.href = detailsUrl.replace('__room__', encodeURIComponent(call.room_name));
+        link.textContent = call.customer_name;
+        name.appendChild(link);
+        row.append(name, cell(call.customer_phone), cell(call.status), cell(formatTime(call.created_at)));
+        row.children[2].dataset.field = 'status';
+        return row;
+    }
+
+    function upsertCall(call) {
+        const existing = recentBody.querySelector(`tr[data-room="${CSS.escape(call.room_name)}"]`);
+        if (existing) {
+            if (call.status) {
+                existing.querySelector('[data-field="status"]').textContent = call.status;
+            }
+            return;
+        }
+        if (!call.customer_name) {
+            return;  // a status change for a call that is not on the dashboard
+        }
+        const placeholder = recentBody.querySelector('tr.empty-row');
+        if (placeholder) {
+            placeholder.remove();
+        }
+        recentBody.prepend(buildRow(call));
+        while (recentBody.children.length > maxRows) {
+            recentBody.lastElementChild.remove();
+        }
+    }
+
+    function connect() {
+        const source = new EventSource(dashboard.dataset.streamUrl);
+
+        source.addEventListener('snapshot', event => {
+            const snapshot = JSON.parse(event.data);
+            Object.keys(counters).forEach(key => { counters[key] = snapshot.counters[key] || 0; });
+            renderCounters();
+            recentBody.replaceChildren(...snapshot.recent_calls.map(buildRow));
+        });
+
+        source.addEventListener('call', event => upsertCall(JSON.parse(event.data)));
+
+        source.addEventListener('counters', event => {
+            const current = JSON.parse(event.data);
+            Object.keys(counters).forEach(key => { counters[key] = current[key] || 0; });
+            renderCounters();
+        });
+
+        // Fell too far behind the server's history: reconnect without
+        // Last-Event-ID, which starts over from a fresh snapshot
+        source.addEventListener('reset', () => {
+            source.close();
+            connect();
+        });
+
+        source.onopen = () => indicator && indicator.classList.replace('bg-secondary', 'bg-success');
+        source.onerror = () => indicator && indicator.classList.replace('bg-success', 'bg-secondary');
+    }
+
+    connect();
+});
@@ -9,24 +9,32 @@
         position: 'bottom-right',
         buttonColor: '#6366f1',
         buttonText: 'Get a Call',
-        widgetTitle: 'AI call assistant'
+        widgetTitle: 'AI call assistant',
+        // Load Inter from Google Fonts unless the page already does; the
+        // stylesheet falls back to the system font stack without it
+        loadFonts: true
+    };
+    let config = defaultConfig;
+
+    // Inline icons, so the widget does not pull in an icon font
+    const ICONS = {
+        phone: '<svg class="lk-icon" viewBox="0 0 512 512" aria-hidden="true"><path d="M164.9 24.6c-7.7-18.6-28-28.5-47.4-23.2l-88 24C12.1 30.2 0 46 0 64c0 247.4 200.6 448 448 448 18 0 33.8-12.1 38.6-29.5l24-88c5.3-19.4-4.6-39.7-23.2-47.4l-96-40c-16.3-6.8-35.2-2.1-46.3 11.6L304.7 368c-70.4-33.3-127.4-90.3-160.7-160.7l49.3-40.3c13.7-11.2 18.4-30 11.6-46.3l-40-96z"/></svg>',
+        close: '<svg class="lk-icon" viewBox="0 0 384 512" aria-hidden="true"><path d="M342.6 150.6c12.5-12.5 12.5-32.8 0-45.3s-32.8-12.5-45.3 0L192 210.7 86.6 105.4c-12.5-12.5-32.8-12.5-45.3 0s-12.5 32.8 0 45.3L146.7 256 41.4 361.4c-12.5 12.5-12.5 32.8 0 45.3s32.8 12.5 45.3 0L192 301.3l105.4 105.3c12.5 12.5 32.8 12.5 45.3 0s12.5-32.8 0-45.3L237.3 256l105.3-105.4z"/></svg>'
     };
 
     // Create and inject CSS
     function injectStyles() {
-        const styleTag = document.createElement('link');
-        styleTag.rel = 'stylesheet';
-        styleTag.href = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css';
-        document.head.appendChild(styleTag);
-        
-        const fontTag = document.createElement('link');
-        fontTag.rel = 'stylesheet';
-        fontTag.href = 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600&display=swap';
-        document.head.appendChild(fontTag);
+        if (config.loadFonts && !document.querySelector('link[href*="fonts.googleapis.com"][href*="Inter"]')) {
+            const fontTag = document.createElement('link');
+            fontTag.rel = 'stylesheet';
+            fontTag.href = 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600&display=swap';
+            document.head.appendChild(fontTag);
+        }
         
+        // The web service rewrites this path to the fingerprinted, long-cached stylesheet
         const widgetStyles = document.createElement('link');
         widgetStyles.rel = 'stylesheet';
-        widgetStyles.href = `${config.serverUrl}/widget/styles.css`;
+        widgetStyles.href = `${config.serverUrl}/widget/style.css`;
         document.head.appendChild(widgetStyles);
     }
 
@@ -34,13 +42,13 @@
     function createWidget(config) {
         // Container
         const container = document.createElement('div');
-        container.id = 'lk-call-widget-container';
+        container.id = 'livekit-call-assistant-container';
         
         // Call Button
         const callBtn = document.createElement('div');
         callBtn.className = 'lk-floating-call-btn';
         callBtn.id = 'lkCallBtn';
-        callBtn.innerHTML = '<i class="fas fa-phone"></i>';
+        callBtn.innerHTML = `<i>${ICONS.phone}</i>`;
         
         // Form Container
         const formContainer = document.createElement('div');
@@ -53,7 +61,7 @@
         formHeader.innerHTML = `
             <h4>${config.widgetTitle}</h4>
             <span class="lk-close-btn" id="lkCloseBtn">
-                <i class="fas fa-times"></i>
+                <i>${ICONS.close}</i>
             </span>
         `;
         
@@ -87,7 +95,7 @@
                 </div>
                 
                 <button type="submit" class="lk-btn-primary">
-                    <i class="fas fa-phone"></i>
+                    <i>${ICONS.phone}</i>
                     <span>${config.buttonText}</span>
                 </button>
             </form>
@@ -155,7 +163,7 @@
                 }
                 
                 submitButton.disabled = false;
-                submitButton.innerHTML = `<i class="fas fa-phone"></i><span>${config.buttonText}</span>`;
+                submitButton.innerHTML = `<i>${ICONS.phone}</i><span>${config.buttonText}</span>`;
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -164,7 +172,7 @@
                 responseDiv.innerHTML = '<strong>Error!</strong> Something went wrong. Please try again later.';
                 
                 submitButton.disabled = false;
-                submitButton.innerHTML = `<i class="fas fa-phone"></i><span>${config.buttonText}</span>`;
+                submitButton.innerHTML = `<i>${ICONS.phone}</i><span>${config.buttonText}</span>`;
             });
         });
     }
@@ -189,4 +197,4 @@
     window.LiveKitCallWidget = {
         init: init
     };
-})();
\ No newline at end of file
+})();
\ No newline at end of file